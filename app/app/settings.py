@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its total covers the other middleware too; not loaded unless REQUEST_METRICS
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,11 +82,60 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite unless DATABASE_ENGINE=postgresql, which reads the POSTGRES_* variables. POSTGRES_REPLICA_HOST adds a
+# read replica that the list/retrieve API actions read from (core.routers.PrimaryReplicaRouter).
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite')
+
+if DATABASE_ENGINE == 'postgresql':
+    # psycopg 3 connection pool per process (needs psycopg[pool]), pooled connections cannot also be persistent
+    DATABASE_POOL = os.environ.get('DATABASE_POOL', '') == '1'
+    _postgres = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('POSTGRES_DB', 'reservation'),
+        'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': 0 if DATABASE_POOL else int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+            },
+        } if DATABASE_POOL else {},
+    }
+    DATABASES = {'default': _postgres}
+    if os.environ.get('POSTGRES_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **_postgres,
+            'HOST': os.environ['POSTGRES_REPLICA_HOST'],
+            'PORT': os.environ.get('POSTGRES_REPLICA_PORT', _postgres['PORT']),
+            'TEST': {'MIRROR': 'default'},
+        }
+elif DATABASE_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        }
     }
+else:
+    raise ImproperlyConfigured(f'Unknown DATABASE_ENGINE "{DATABASE_ENGINE}", expected sqlite or postgresql.')
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
+# SQLITE_PERFORMANCE_MODE=1 applies SQLITE_PRAGMAS on every new connection (core.sqlite). With WAL,
+# readers no longer wait for the writer; synchronous=NORMAL can lose the last commits on power loss, not
+# on a crash of the app. WAL stays on for the database file once set.
+SQLITE_PERFORMANCE_MODE = os.environ.get('SQLITE_PERFORMANCE_MODE', '') == '1'
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # negative: in KiB
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
 }
 
 # Password validation
@@ -102,6 +156,24 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# PASSWORD_HASHER_PROFILE=fast in the environment hashes with core.hashers' PBKDF2, a tenth of the iterations of
+# Django's ('default'). Both stay accepted, passwords are rehashed with the current profile at their next login.
+PASSWORD_HASHER_PROFILES = {
+    'default': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'fast': 'core.hashers.FastPBKDF2PasswordHasher',
+}
+PASSWORD_HASHER_PROFILE = os.environ.get('PASSWORD_HASHER_PROFILE', 'default')
+if PASSWORD_HASHER_PROFILE not in PASSWORD_HASHER_PROFILES:
+    raise ImproperlyConfigured(f'Unknown PASSWORD_HASHER_PROFILE "{PASSWORD_HASHER_PROFILE}", expected default or fast.')
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_PROFILES[PASSWORD_HASHER_PROFILE],
+    *(hasher for profile, hasher in PASSWORD_HASHER_PROFILES.items() if profile != PASSWORD_HASHER_PROFILE),
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -126,8 +198,97 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+    # orjson when installed, otherwise the same as JSONRenderer
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # create_token, per client address and per email
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_email': '10/min',
+    },
+    # reverse proxies in front of the app. The client address is X-Forwarded-For's entry this many hops back,
+    # REMOTE_ADDR with none, so a client cannot pick its own address by sending the header
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
 }
 
+# API tokens expire this many seconds after they are issued (None: never), the login view then issues a new one.
+# Resolved tokens are cached per process for AUTH_TOKEN_CACHE_TTL seconds.
+AUTH_TOKEN_EXPIRY = 60 * 60 * 24 * 7
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TTL = 60
+# Group permissions are cached per process as well, a change made in another process applies here within
+# PERMISSION_CACHE_TTL seconds.
+PERMISSION_CACHE_TTL = 60
+
+# Per-request SQL and timing metrics: Server-Timing headers and Prometheus histograms at /api/metrics/.
+# The endpoint has no authentication, it only answers the comma separated METRICS_ALLOWED_IPS (the scraper's
+# address as the app sees it, behind a proxy that is the proxy's), 403 for everyone else. Nobody by default:
+# behind a proxy on the same host, loopback is every client.
+REQUEST_METRICS = os.environ.get('REQUEST_METRICS', '') == '1'
+METRICS_ALLOWED_IPS = [ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip]
+
+# List actions read rows with .values() instead of running the ModelSerializer per row (core.views.ValuesListMixin)
+LIST_VALUES_SERIALIZERS = True
+
+# Name search: serve typeahead from an in-memory prefix trie instead of the database.
+# Each process keeps its own trie, so only enable it where writes go through a single process.
+NAME_SEARCH_TRIE = False
+NAME_SEARCH_TYPEAHEAD_LIMIT = 20
+
+# Patient import jobs run on a local thread pool; eager mode runs them inside the request (tests)
+IMPORT_JOB_WORKERS = 2
+IMPORT_JOB_CHUNK_SIZE = 5000
+IMPORT_JOBS_EAGER = False
+
+# Doctors without WorkingHours rows are available these hours, weekday (Monday = 0) -> [(start, end)]
+DEFAULT_WORKING_HOURS = {weekday: [('09:00', '17:00')] for weekday in range(5)}
+AVAILABILITY_MAX_DAYS = 31
+
+# Largest batch accepted by the bulk reservation endpoint
+RESERVATION_BULK_MAX_ITEMS = 500
+RESERVATION_SERIES_MAX_OCCURRENCES = 200
+
+# Reminder scheduler (manage.py send_reminders): delivery backend, seconds of reminders kept in memory,
+# and how late a reminder missed while no scheduler ran may still be sent
+REMINDER_BACKEND = 'reservation.reminders.ConsoleBackend'
+REMINDER_FILE_PATH = BASE_DIR / 'reminders.log'
+REMINDER_WINDOW = 60
+REMINDER_MAX_DELAY = 60 * 60
+# seconds the scheduler waits after a database error before trying again
+REMINDER_RETRY_DELAY = 30
+
+# The locmem cache is per process. Deployments with several worker processes set REDIS_URL (needs the redis
+# package), so the login throttles and the reservation list cache below are shared between them.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+
+# Cache alias for the daily reservation list responses, None disables the cache. Every reservation save and
+# delete invalidates its day, but only in the cache it was made against, so it is only on with a cache shared
+# by all the processes: on a per-process (locmem) cache the others would serve the old list for up to
+# RESERVATION_LIST_CACHE_TIMEOUT seconds (check --deploy warns when it is set that way).
+RESERVATION_LIST_CACHE = 'default' if os.environ.get('REDIS_URL') else None
+RESERVATION_LIST_CACHE_TIMEOUT = 5 * 60
+
+# Live reservation events (/api/reservations/events/): seconds between keep-alive comments,
+# and events buffered per listener before it is told to reload instead
+RESERVATION_EVENTS_KEEPALIVE = 15
+RESERVATION_EVENTS_QUEUE_SIZE = 100
+
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True
 }
@@ -18,10 +18,13 @@ from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
+from core.metrics import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
     path('api/docs', SpectacularSwaggerView.as_view(url_name='api-schema'), name='api-docs'),
+    path('api/metrics/', metrics, name='metrics'),
     path('api/users/', include('user.urls')),
     path('api/patients/', include('patient.urls')),
     path('api/reservations/', include('reservation.urls'))
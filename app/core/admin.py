@@ -3,6 +3,16 @@ from core.models import *
 
 admin.site.register(User)
 admin.site.register(Patient)
-admin.site.register(Reservation)
+
+
+@admin.register(Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'doctor', 'date', 'time')
+    list_select_related = ('patient', 'doctor')
+    raw_id_fields = ('patient', 'doctor')
+
+
+admin.site.register(WorkingHours)
+admin.site.register(ReservationSeries)
 
 
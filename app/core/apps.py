@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core import authentication, permissions, roles, sqlite  # noqa: F401 (connects their signal receivers)
+        from core.models import Patient, User
+        from core.search import register_name_index
+
+        register_name_index(Patient)
+        register_name_index(User)
@@ -0,0 +1,61 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework.exceptions import APIException, AuthenticationFailed
+from rest_framework.request import Request
+
+from core.authentication import aauthenticate_credentials
+from core.permissions import get_group_codenames
+from core.renderers import FastJSONRenderer
+
+
+def json_response(data, status=200):
+    # rendered like the DRF views, so both paths return the same bytes
+    return HttpResponse(FastJSONRenderer().render(data), content_type='application/json', status=status)
+
+
+async def authenticate_token(request, query_token=False):
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    if keyword != 'Token':
+        key = request.GET.get('token', '') if query_token else ''
+    if not key:
+        return None
+    user, _token = await aauthenticate_credentials(key)
+    return user
+
+
+def async_api_view(view=None, *, query_token=False):
+    """
+    Async, read-only counterpart of the DRF views: token authentication, the request's permission
+    codenames for core.permissions.has_permission, and DRF exceptions rendered as JSON errors.
+    The view gets a DRF Request wrapping the Django one, for query_params and the paginators.
+
+    query_token=True also accepts the token as ?token=, for browsers' EventSource, which cannot send
+    headers. Other views leave it off, query strings end up in access logs.
+    """
+    if view is None:
+        return lambda view: async_api_view(view, query_token=query_token)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return json_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+        try:
+            user = await authenticate_token(request, query_token)
+        except AuthenticationFailed as exc:
+            return json_response({'detail': exc.detail}, status=exc.status_code)
+        if user is None:
+            return json_response({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+        request = Request(request)
+        request.user = user
+        request._group_codenames = await sync_to_async(get_group_codenames)(user)
+        try:
+            return await view(request, *args, **kwargs)
+        except APIException as exc:
+            detail = {'detail': exc.detail} if isinstance(exc.detail, str) else exc.detail
+            return json_response(detail, status=exc.status_code)
+
+    return wrapper
@@ -0,0 +1,150 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.models import User
+from core.permissions import get_group_codenames
+
+
+class TokenCache:
+    """
+    Token key -> (user, token creation time), bounded LRU whose entries are trusted for
+    AUTH_TOKEN_CACHE_TTL seconds. Token and user changes drop the entries of this process only,
+    the TTL bounds how long other processes keep serving them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[2] > settings.AUTH_TOKEN_CACHE_TTL:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key, user, created):
+        entry = (user, created, time.monotonic())
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.AUTH_TOKEN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[0].pk == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+def token_expires_at(created):
+    if settings.AUTH_TOKEN_EXPIRY is None:
+        return None
+    return created + timedelta(seconds=settings.AUTH_TOKEN_EXPIRY)
+
+
+def is_expired(token):
+    expires_at = token_expires_at(token.created)
+    return expires_at is not None and expires_at <= timezone.now()
+
+
+def rotate_token(user, force=False):
+    """The user's token, replaced by a new one when it has expired or force is set."""
+    token, created = Token.objects.get_or_create(user=user)
+    if not created and (force or is_expired(token)):
+        token.delete()
+        token = Token.objects.create(user=user)
+    return token
+
+
+def resolve_token(key, entry):
+    """(user, token) for a cache entry, the user is a copy so a request cannot change the cached one."""
+    user, created, _cached_at = entry
+    expires_at = token_expires_at(created)
+    if expires_at is not None and expires_at <= timezone.now():
+        raise exceptions.AuthenticationFailed(_('Token has expired.'))
+    if not user.is_active:
+        raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+    return copy.copy(user), Token(key=key, user_id=user.pk, created=created)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication with expiring tokens, resolving cached tokens without any query.
+    The user's permission codenames are attached to the request for core.permissions.has_permission.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            request._group_codenames = get_group_codenames(result[0])
+        return result
+
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        if entry is None:
+            try:
+                token = Token.objects.select_related('user').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            entry = token_cache.set(key, token.user, token.created)
+        return resolve_token(key, entry)
+
+
+async def aauthenticate_credentials(key):
+    entry = token_cache.get(key)
+    if entry is None:
+        token = await Token.objects.select_related('user').filter(key=key).afirst()
+        if token is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        entry = token_cache.set(key, token.user, token.created)
+    return resolve_token(key, entry)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def _token_changed(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _user_changed(sender, instance, **kwargs):
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def _sign_out_on_password_change(sender, instance, created, **kwargs):
+    # wherever the password changes (API, admin, changepassword), the user is signed out everywhere.
+    # set_password() keeps the raw password in _password until the save is done, unlike the rehash at
+    # login, which keeps the same password and the tokens.
+    if not created and instance._password is not None:
+        Token.objects.filter(user=instance).delete()
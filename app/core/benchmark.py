@@ -0,0 +1,76 @@
+import os
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core.models import Patient, Role, RoleCode, User
+from core.seeding import PASSWORD
+
+
+@contextmanager
+def benchmark_database(**seed_options):
+    # benchmarks never touch the configured database, they run on a throwaway test database. On SQLite
+    # a file instead of the in-memory default, which threads and the seeder's workers can share
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict['TEST']
+    old_test_name = test_settings['NAME']
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if connection.vendor == 'sqlite':
+            test_settings['NAME'] = os.path.join(tmp_dir, 'benchmark.sqlite3')
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            call_command('seeder', **seed_options)
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            test_settings['NAME'] = old_test_name
+
+
+def measure(func, repeat, warmup=1):
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return summarize(timings)
+
+
+def summarize(timings):
+    timings = sorted(timings)
+
+    def percentile(p):
+        return timings[min(len(timings) - 1, int(round(p / 100 * (len(timings) - 1))))]
+
+    return {
+        'count': len(timings),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'p50_ms': round(percentile(50), 3),
+        'p95_ms': round(percentile(95), 3),
+        'p99_ms': round(percentile(99), 3),
+        'max_ms': round(timings[-1], 3),
+    }
+
+
+def create_admin():
+    # create_user adds the role's group, whose permissions the requests are checked against
+    return User.objects.create_user(
+        email='admin@example.com', password=PASSWORD, name='Admin', role=Role.objects.get(code=RoleCode.ADMIN)
+    )
+
+
+def seeded_ids():
+    """The ids of the seeded doctors and patients, in creation order."""
+    doctor_ids = list(User.objects.filter(role__code=RoleCode.DOCTOR).order_by('id').values_list('id', flat=True))
+    patient_ids = list(Patient.objects.order_by('id').values_list('id', flat=True))
+    return doctor_ids, patient_ids
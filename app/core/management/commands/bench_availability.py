@@ -0,0 +1,48 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from core.benchmark import benchmark_database, create_admin, measure, seeded_ids
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the doctor availability endpoint on a large reservation table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservations', type=int, default=300000)
+        parser.add_argument('--doctors', type=int, default=20)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--patients', type=int, default=2000)
+        parser.add_argument('--window', type=int, default=14, help='Days searched per request.')
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with benchmark_database(
+            patients=options['patients'], doctors=options['doctors'], reservations=options['reservations'],
+            days=options['days'],
+        ):
+            doctor_ids, _ = seeded_ids()
+
+            client = APIClient()
+            client.force_authenticate(create_admin())
+
+            params = {
+                'from': date.today().isoformat(),
+                'to': (date.today() + timedelta(days=options['window'] - 1)).isoformat(),
+                'duration': 30,
+            }
+            scenarios = {
+                'all doctors': params,
+                'one doctor': {**params, 'doctor': doctor_ids[0]},
+            }
+            results = {
+                name: measure(lambda: client.get('/api/reservations/availability/', scenario), options['repeat'])
+                for name, scenario in scenarios.items()
+            }
+
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<12} {options['window']} days: p50={result['p50_ms']}ms "
+                f"p95={result['p95_ms']}ms p99={result['p99_ms']}ms"
+            )
@@ -0,0 +1,106 @@
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.benchmark import benchmark_database
+from core.models import Patient
+from patient.importer import PatientImporter, import_patients
+from patient.readers import read_chunks
+
+
+def build_frame(rows, first=0, seed=0):
+    rng = random.Random(seed)
+    # a few duplicates and invalid phone numbers so the rejection path is exercised too
+    names = [f'Patient {first + i if rng.random() > 0.01 else first}' for i in range(rows)]
+    phones = [f'09{rng.randrange(10 ** 8):08d}' if rng.random() > 0.01 else '123' for _ in range(rows)]
+    return pd.DataFrame({
+        'patient name': names,
+        'relative': ['mother'] * rows,
+        'relative name': [f'Relative {i}' for i in range(rows)],
+        'phone number': phones,
+        'birth date': [f'{rng.randrange(1940, 2020)}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}'
+                       for _ in range(rows)],
+    }, dtype=str)
+
+
+def write_file(df, file_format, directory):
+    path = os.path.join(directory, f'patients.{file_format}')
+    if file_format == 'csv':
+        df.to_csv(path, index=False)
+    elif file_format == 'xlsx':
+        df.to_excel(path, engine='openpyxl', index=False)
+    else:
+        df.to_excel(path, engine='odf', index=False)
+    return path
+
+
+def import_file(path, chunk_size):
+    importer = PatientImporter()
+    for chunk in read_chunks(path, chunk_size):
+        importer.feed(chunk)
+    return importer.finish()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the bulk patient import pipeline and the per-format streaming readers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--existing', type=int, default=10000)
+        parser.add_argument(
+            '--formats', default='csv,xlsx',
+            help='Comma separated file formats to benchmark (csv, xlsx, ods); writing large ods files is slow.'
+        )
+        parser.add_argument('--chunk-size', type=int, default=settings.IMPORT_JOB_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        df = build_frame(rows)
+        existing = build_frame(options['existing'], first=-options['existing'] // 2, seed=1)
+        formats = [file_format for file_format in options['formats'].split(',') if file_format]
+
+        with benchmark_database():
+            import_patients(existing)
+
+            start = time.perf_counter()
+            result = import_patients(df)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"pipeline: {rows} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s), "
+                f"{result['inserted']} inserted, {len(result['rejected'])} rejected"
+            )
+
+            with tempfile.TemporaryDirectory() as directory:
+                for file_format in formats:
+                    path = write_file(df, file_format, directory)
+                    self.stdout.write(f'{file_format}: {self._measure(path, existing, options["chunk_size"])}')
+
+    def _measure(self, path, existing, chunk_size):
+        def reset():
+            Patient.objects.all().delete()
+            import_patients(existing)
+
+        reset()
+        start = time.perf_counter()
+        result = import_file(path, chunk_size)
+        elapsed = time.perf_counter() - start
+
+        # a second, traced run: tracemalloc slows the import down too much to time it
+        reset()
+        tracemalloc.start()
+        import_file(path, chunk_size)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        size = os.path.getsize(path)
+        return (
+            f"{size / 2 ** 20:.1f} MiB file, {elapsed:.2f}s ({result['inserted'] + len(result['rejected'])} rows, "
+            f"{(result['inserted'] + len(result['rejected'])) / elapsed:,.0f} rows/s), "
+            f"peak Python memory {peak / 2 ** 20:.1f} MiB"
+        )
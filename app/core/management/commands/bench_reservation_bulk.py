@@ -0,0 +1,68 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from core.benchmark import benchmark_database, create_admin, seeded_ids
+from core.models import Reservation
+
+
+def build_payload(count, doctor_ids, patient_ids):
+    # 30 minute slots after the seeded reservations, so none of them conflict
+    first_day = date.today() + timedelta(days=400)
+    payload = []
+    for i in range(count):
+        slot, doctor = divmod(i, len(doctor_ids))
+        day, minutes = divmod(slot * 30, 24 * 60)
+        payload.append({
+            'patient': patient_ids[i % len(patient_ids)],
+            'doctor': doctor_ids[doctor],
+            'date': (first_day + timedelta(days=day)).isoformat(),
+            'time': f'{minutes // 60:02d}:{minutes % 60:02d}',
+            'duration': 30,
+            'description': 'treatment session',
+        })
+    return payload
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the bulk reservation endpoint against one request per reservation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservations', type=int, default=100000, help='Reservations seeded beforehand.')
+        parser.add_argument('--rows', type=int, default=2000, help='Reservations created by each path.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        rows, batch_size = options['rows'], options['batch_size']
+
+        with benchmark_database(patients=2000, doctors=20, reservations=options['reservations']):
+            doctor_ids, patient_ids = seeded_ids()
+            payload = build_payload(rows, doctor_ids, patient_ids)
+
+            client = APIClient()
+            client.force_authenticate(create_admin())
+            existing = Reservation.objects.count()
+
+            start = time.perf_counter()
+            for item in payload:
+                res = client.post('/api/reservations/', item, format='json')
+                assert res.status_code == 201, res.data
+            single = time.perf_counter() - start
+
+            Reservation.objects.filter(date__gte=payload[0]['date']).delete()
+
+            start = time.perf_counter()
+            for offset in range(0, rows, batch_size):
+                res = client.post('/api/reservations/bulk/', payload[offset:offset + batch_size], format='json')
+                assert res.status_code == 201, res.data
+            bulk = time.perf_counter() - start
+
+            assert Reservation.objects.count() == existing + rows
+
+        self.stdout.write(f'single: {rows} rows in {single:.2f}s ({rows / single:,.0f} rows/s)')
+        self.stdout.write(
+            f'bulk:   {rows} rows in {bulk:.2f}s ({rows / bulk:,.0f} rows/s, batches of {batch_size}), '
+            f'{single / bulk:.1f}x faster'
+        )
@@ -0,0 +1,57 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIClient
+
+from core.benchmark import benchmark_database, create_admin, measure, seeded_ids
+from core.models import Reservation
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the reservation list endpoint with and without the day view indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservations', type=int, default=300000)
+        parser.add_argument('--doctors', type=int, default=20)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--patients', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with benchmark_database(
+            patients=options['patients'], doctors=options['doctors'], reservations=options['reservations'],
+            days=options['days'],
+        ):
+            doctor_ids, _ = seeded_ids()
+
+            client = APIClient()
+            client.force_authenticate(create_admin())
+
+            scenarios = {
+                'day view': {'date': date.today().isoformat()},
+                'day view (doctor)': {'date': date.today().isoformat(), 'doctor': doctor_ids[0]},
+            }
+            indexes = Reservation._meta.indexes
+
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.remove_index(Reservation, index)
+            before = self._run(client, scenarios, options['repeat'])
+
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.add_index(Reservation, index)
+            after = self._run(client, scenarios, options['repeat'])
+
+        for name in scenarios:
+            self.stdout.write(
+                f"{name:<20} before p50={before[name]['p50_ms']}ms p95={before[name]['p95_ms']}ms | "
+                f"after p50={after[name]['p50_ms']}ms p95={after[name]['p95_ms']}ms"
+            )
+
+    def _run(self, client, scenarios, repeat):
+        return {
+            name: measure(lambda: client.get('/api/reservations/', params), repeat)
+            for name, params in scenarios.items()
+        }
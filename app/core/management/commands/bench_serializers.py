@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core.benchmark import benchmark_database, measure
+from core.models import Patient, Reservation, User
+from core.renderers import FastJSONRenderer
+from core.serializers import values_serializer
+from patient.serializers import PatientSerializer
+from reservation.serializers import ReservationSerializer
+from user.serializers import UserSerializer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark list serialization rows/sec: ModelSerializer against the .values() fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        # the doctors are the user rows
+        with benchmark_database(patients=rows, doctors=rows, reservations=rows):
+            cases = [
+                ('reservation', ReservationSerializer, Reservation.objects.order_by('id')[:rows]),
+                ('patient', PatientSerializer, Patient.objects.order_by('id')[:rows]),
+                ('user', UserSerializer, User.objects.order_by('id')[:rows]),
+            ]
+            for name, serializer_class, queryset in cases:
+                instances = list(queryset)
+                fast = values_serializer(serializer_class)
+                values = list(fast.values(queryset))
+
+                scenarios = {
+                    'ModelSerializer': lambda: serializer_class(instances, many=True).data,
+                    'values': lambda: fast.serialize(values),
+                    'ModelSerializer + JSONRenderer': lambda: JSONRenderer().render(
+                        serializer_class(instances, many=True).data
+                    ),
+                    'values + FastJSONRenderer': lambda: FastJSONRenderer().render(fast.serialize(values)),
+                }
+                for scenario, func in scenarios.items():
+                    stats = measure(func, options['repeat'])
+                    self.stdout.write(
+                        f"{name:<12} {scenario:<32} {len(instances) / stats['p50_ms'] * 1000:>12,.0f} rows/s "
+                        f"p50={stats['p50_ms']}ms"
+                    )
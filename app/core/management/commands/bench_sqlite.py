@@ -0,0 +1,115 @@
+import threading
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from core.benchmark import benchmark_database, create_admin, seeded_ids, summarize
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent reservation reads and writes on SQLite with and without SQLITE_PERFORMANCE_MODE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservations', type=int, default=50000)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=10, help='seconds per mode')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Only meaningful on SQLite.')
+
+        with benchmark_database(patients=2000, doctors=20, reservations=options['reservations']):
+            doctor_ids, patient_ids = seeded_ids()
+            admin = create_admin()
+
+            # rollback journal first, WAL stays on for the file once set
+            for offset, mode in enumerate((False, True)):
+                with override_settings(SQLITE_PERFORMANCE_MODE=mode, RESERVATION_LIST_CACHE=None):
+                    connections.close_all()
+                    reads, writes, errors = self._run(admin, doctor_ids, patient_ids, options, offset)
+                    connections.close_all()
+
+                label = 'performance mode' if mode else 'default'
+                line = f'{label:<17}'
+                for name, timings in (('reads', reads), ('writes', writes)):
+                    if timings:
+                        stats = summarize(timings)
+                        line += (
+                            f" {name} {len(timings) / options['duration']:.1f}/s "
+                            f"p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms"
+                        )
+                self.stdout.write(f'{line} errors={errors}')
+
+    def _run(self, admin, doctor_ids, patient_ids, options, offset):
+        reads, writes, errors = [], [], []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['duration']
+        today = date.today().isoformat()
+
+        def run(request):
+            client = APIClient()
+            client.force_authenticate(admin)
+            timings, failures = [], 0
+            try:
+                count = 0
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        ok = request(client, count)
+                    except Exception:
+                        ok = False
+                    if ok:
+                        timings.append((time.perf_counter() - start) * 1000)
+                    else:
+                        failures += 1
+                    count += 1
+            finally:
+                connection.close()
+            return timings, failures
+
+        def read(client, count):
+            if count % 2:
+                res = client.get('/api/reservations/availability/', {'from': today, 'to': today})
+            else:
+                res = client.get('/api/reservations/', {'date': today})
+            return res.status_code == 200
+
+        def writer(index):
+            # each writer books one doctor's 15 minute slots on days nobody else uses
+            first_day = date.today() + timedelta(days=1000 + 1000 * offset)
+
+            def write(client, count):
+                day, minutes = divmod(count * 15, 24 * 60)
+                res = client.post('/api/reservations/', {
+                    'patient': patient_ids[count % len(patient_ids)],
+                    'doctor': doctor_ids[index % len(doctor_ids)],
+                    'date': (first_day + timedelta(days=day + 100 * (index // len(doctor_ids)))).isoformat(),
+                    'time': f'{minutes // 60:02d}:{minutes % 60:02d}',
+                    'duration': 15,
+                    'description': 'checkup',
+                })
+                return res.status_code == 201
+
+            return write
+
+        def worker(request, results):
+            timings, failures = run(request)
+            with lock:
+                results.extend(timings)
+                errors.append(failures)
+
+        threads = [threading.Thread(target=worker, args=(read, reads)) for _ in range(options['readers'])]
+        threads += [
+            threading.Thread(target=worker, args=(writer(index), writes)) for index in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return reads, writes, sum(errors)
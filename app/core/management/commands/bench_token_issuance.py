@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from core.benchmark import benchmark_database, measure
+from core.models import Role, User
+
+
+class Command(BaseCommand):
+    help = 'Benchmark create_token logins per second on one core for each password hasher profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        no_throttling = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+        with benchmark_database(), override_settings(REST_FRAMEWORK=no_throttling):
+            role = Role.objects.get(name='Receptionist')
+            users = [
+                User.objects.create_user(
+                    email=f'user{i}@example.com', password='testpass123', name=f'User {i}', role=role
+                )
+                for i in range(options['users'])
+            ]
+            client = APIClient()
+
+            for profile, hasher in settings.PASSWORD_HASHER_PROFILES.items():
+                others = [other for other in settings.PASSWORD_HASHERS if other != hasher]
+                with override_settings(PASSWORD_HASHERS=[hasher] + others):
+                    logins = iter(range(options['repeat'] + len(users)))
+
+                    def login():
+                        user = users[next(logins) % len(users)]
+                        client.post('/api/users/create_token/', {'email': user.email, 'password': 'testpass123'})
+
+                    # the warmup logins rehash every password with this profile
+                    stats = measure(login, options['repeat'], warmup=len(users))
+                self.stdout.write(
+                    f"{profile:<10} {1000 / stats['mean_ms']:>8.1f} tokens/s per core "
+                    f"p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms"
+                )
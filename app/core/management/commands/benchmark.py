@@ -0,0 +1,197 @@
+import itertools
+import json
+import subprocess
+import threading
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.benchmark import benchmark_database, summarize
+from core.metrics import RequestTimer
+from core.models import Patient, Reservation, Role, User
+from core.seeding import FIRST_NAMES, LAST_NAMES
+
+PASSWORD = 'benchpass123'
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def import_file(index, rows):
+    lines = ['patient name,relative,relative name,phone number,birth date']
+    lines += [f'Imported {index} {i},mother,Relative {i},0987654321,1990-01-01' for i in range(rows)]
+    return SimpleUploadedFile(f'patients-{index}.csv', '\n'.join(lines).encode(), content_type='text/csv')
+
+
+def build_scenarios(admin, doctor_ids, patient_ids, reservation_ids, options):
+    """name -> (request(client, index), expected status), index counts the scenario's requests across clients."""
+    today = date.today().isoformat()
+    # bookings go to days after the seeded ones, a slot per request
+    first_free_day = date.today() + timedelta(days=options['days'])
+
+    def book(client, index):
+        day, slot = divmod(index // len(doctor_ids), 40)
+        return client.post('/api/reservations/', {
+            'patient': patient_ids[index % len(patient_ids)],
+            'doctor': doctor_ids[index % len(doctor_ids)],
+            'date': (first_free_day + timedelta(days=day)).isoformat(),
+            'time': f'{8 + slot // 4:02d}:{slot % 4 * 15:02d}',
+            'duration': 15,
+            'description': 'checkup',
+        })
+
+    return {
+        'users-list': (lambda client, index: client.get('/api/users/'), 200),
+        'users-search': (lambda client, index: client.get(
+            '/api/users/', {'q': FIRST_NAMES[index % len(FIRST_NAMES)]}
+        ), 200),
+        'users-typeahead': (lambda client, index: client.get(
+            '/api/users/typeahead/', {'q': FIRST_NAMES[index % len(FIRST_NAMES)][:2]}
+        ), 200),
+        'users-token': (lambda client, index: client.post(
+            '/api/users/create_token/', {'email': admin.email, 'password': PASSWORD}
+        ), 200),
+        'patients-list': (lambda client, index: client.get('/api/patients/'), 200),
+        'patients-search': (lambda client, index: client.get('/api/patients/', {
+            'q': f'{FIRST_NAMES[index % len(FIRST_NAMES)]} {LAST_NAMES[index % len(LAST_NAMES)]}'
+        }), 200),
+        'patients-typeahead': (lambda client, index: client.get(
+            '/api/patients/typeahead/', {'q': FIRST_NAMES[index % len(FIRST_NAMES)][:3]}
+        ), 200),
+        'patients-detail': (lambda client, index: client.get(
+            f'/api/patients/{patient_ids[index % len(patient_ids)]}/'
+        ), 200),
+        'patients-import': (lambda client, index: client.post(
+            '/api/patients/import_patient/', {'file': import_file(index, options['import_rows'])}, format='multipart'
+        ), 202),
+        'reservations-list': (lambda client, index: client.get('/api/reservations/', {'date': today}), 200),
+        'reservations-detail': (lambda client, index: client.get(
+            f'/api/reservations/{reservation_ids[index % len(reservation_ids)]}/'
+        ), 200),
+        'reservations-availability': (lambda client, index: client.get(
+            '/api/reservations/availability/', {'from': today, 'to': today}
+        ), 200),
+        'reservations-create': (book, 201),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database and drive the API with concurrent clients, reporting throughput, '
+        'latency percentiles and queries per request of every scenario as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=10000)
+        parser.add_argument('--doctors', type=int, default=20)
+        parser.add_argument('--reservations', type=int, default=100000)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--seed-workers', type=int, default=1, help='seeder processes')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+        parser.add_argument('--import-rows', type=int, default=50, help='rows per uploaded patient file')
+        parser.add_argument('--scenarios', help='Comma separated scenario names, all of them by default.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        if min(options['patients'], options['doctors'], options['reservations'], options['days']) < 1:
+            raise CommandError('Volumes must be at least 1.')
+        seed_options = {
+            name: options[name] for name in ('patients', 'doctors', 'reservations', 'days', 'seed')
+        }
+        # quiet, the seeder's summary would land in the middle of the report
+        seeder_options = {**seed_options, 'workers': options['seed_workers'], 'verbosity': 0}
+
+        with benchmark_database(**seeder_options), override_settings(
+            IMPORT_JOBS_EAGER=True,
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+        ):
+            admin = User.objects.create_user(
+                email='bench@example.com', password=PASSWORD, name='Bench', role=Role.objects.get(name='Admin')
+            )
+            token = Token.objects.create(user=admin)
+            doctor_ids = list(User.objects.filter(role__name='Doctor').values_list('id', flat=True))
+            patient_ids = list(Patient.objects.values_list('id', flat=True)[:1000])
+            reservation_ids = list(Reservation.objects.values_list('id', flat=True)[:1000])
+
+            scenarios = build_scenarios(admin, doctor_ids, patient_ids, reservation_ids, options)
+            names = options['scenarios'].split(',') if options['scenarios'] else list(scenarios)
+            unknown = set(names) - set(scenarios)
+            if unknown:
+                raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+            results = {}
+            for name in names:
+                self.stderr.write(f'{name}...')
+                results[name] = self._run(*scenarios[name], token.key, options)
+
+        report = json.dumps({
+            'commit': git_commit(),
+            'database': connection.vendor,
+            'seed': seed_options,
+            'concurrency': options['concurrency'],
+            'scenarios': results,
+        }, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(report + '\n')
+        else:
+            self.stdout.write(report)
+
+    def _run(self, request, expected_status, token, options):
+        timings, queries = [], []
+        errors = 0
+        lock = threading.Lock()
+        counter = itertools.count()
+
+        def worker():
+            nonlocal errors
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+            try:
+                while (index := next(counter)) < options['requests']:
+                    timer = RequestTimer()
+                    start = time.perf_counter()
+                    try:
+                        with connection.execute_wrapper(timer):
+                            ok = request(client, index).status_code == expected_status
+                    except Exception:
+                        ok = False
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with lock:
+                        if ok:
+                            timings.append(elapsed)
+                            queries.append(timer.queries)
+                        else:
+                            errors += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['concurrency'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        result = {'requests': options['requests'], 'errors': errors, 'throughput_rps': round(len(timings) / elapsed, 1)}
+        if timings:
+            result.update(summarize(timings))
+            result['queries_mean'] = round(sum(queries) / len(queries), 2)
+            result['queries_max'] = max(queries)
+        return result
@@ -0,0 +1,73 @@
+import threading
+import time
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import summarize
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test running deployments, e.g. the WSGI app under gunicorn and the ASGI app under uvicorn: '
+        '--target wsgi=http://127.0.0.1:8000/api/reservations/?date=2024-07-23 '
+        '--target asgi=http://127.0.0.1:8001/api/reservations/async/?date=2024-07-23'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True, help='name=url, repeatable')
+        parser.add_argument('--token', help='API token sent as "Authorization: Token <token>"')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--duration', type=float, default=10, help='seconds per target')
+        parser.add_argument('--timeout', type=float, default=10)
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            name, _, url = target.partition('=')
+            if not url:
+                raise CommandError(f'Expected name=url, got "{target}".')
+            targets.append((name, url))
+
+        headers = {'Authorization': f"Token {options['token']}"} if options['token'] else {}
+        for name, url in targets:
+            timings, errors, elapsed = self._run(
+                url, headers, options['concurrency'], options['duration'], options['timeout']
+            )
+            if not timings:
+                self.stdout.write(f'{name:<10} no successful requests, {errors} errors')
+                continue
+            stats = summarize(timings)
+            self.stdout.write(
+                f"{name:<10} {stats['count'] / elapsed:.1f} req/s p50={stats['p50_ms']}ms "
+                f"p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms errors={errors}"
+            )
+
+    def _run(self, url, headers, concurrency, duration, timeout):
+        timings, errors = [], []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def worker():
+            local_timings, local_errors = [], 0
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    with urlopen(Request(url, headers=headers), timeout=timeout) as response:
+                        response.read()
+                    local_timings.append((time.perf_counter() - start) * 1000)
+                except (URLError, OSError):
+                    local_errors += 1
+            with lock:
+                timings.extend(local_timings)
+                errors.append(local_errors)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return timings, sum(errors), time.perf_counter() - started
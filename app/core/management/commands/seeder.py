@@ -1,18 +1,61 @@
+import time
+from datetime import date
+
 from django.contrib.contenttypes.models import ContentType
-from django.core.management.base import BaseCommand
-from core.models import Role, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core import seeding
+from core.models import Patient, Role, RoleCode, User
+from core.search import get_name_index
 from django.contrib.auth.models import Group, Permission
 from django.db.models import Q
+from reservation.cache import invalidate_all
 
 
 class Command(BaseCommand):
     help = 'Seed Data into Database'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=0, help='tops the patients up to this many')
+        parser.add_argument('--doctors', type=int, default=0)
+        parser.add_argument('--reservations', type=int, default=0)
+        parser.add_argument('--days', type=int, default=365, help='spread of the reservations, centered on today')
+        parser.add_argument(
+            '--start-date', type=date.fromisoformat,
+            help='First day of the reservations (YYYY-MM-DD). Without it the window moves with today, '
+                 'so reruns on another day add reservations.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Processes generating the patient and reservation rows (forked, so not on Windows).'
+        )
+
     def handle(self, *args, **options):
+        if min(options['patients'], options['doctors'], options['reservations']) < 0:
+            raise CommandError('Volumes cannot be negative.')
+        if options['reservations']:
+            if not (options['patients'] and options['doctors']):
+                raise CommandError('Reservations need --patients and --doctors.')
+            if options['days'] < 1:
+                raise CommandError('--days must be at least 1.')
+            capacity = seeding.reservation_capacity(options['doctors'], options['days'])
+            if options['reservations'] > capacity:
+                raise CommandError(f"{options['doctors']} doctors have {capacity} slots in {options['days']} days.")
+        if options['workers'] > 1 and connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # the connections are closed before forking, which would drop it
+            raise CommandError('--workers needs a file backed SQLite database.')
+
         # create roles
-        Role.objects.get_or_create(name='Admin')
-        Role.objects.get_or_create(name='Doctor')
-        Role.objects.get_or_create(name='Receptionist')
+        for code in (RoleCode.ADMIN, RoleCode.DOCTOR, RoleCode.RECEPTIONIST):
+            name = code.label
+            # roles seeded before they had a code are matched by name, instead of getting a duplicate
+            legacy = Role.objects.filter(code__isnull=True, name=name).order_by('id').first()
+            if legacy is not None and not Role.objects.filter(code=code).exists():
+                legacy.code = code
+                legacy.save(update_fields=['code'])
+            Role.objects.update_or_create(code=code, defaults={'name': name})
 
         # create groups with its permission
         self.admins_group, created = Group.objects.get_or_create(name='admins_group')
@@ -24,15 +67,40 @@ class Command(BaseCommand):
         self.add_reservations_api_permissions()
 
         # create super_user
-        User.objects.create_superuser(
-            email='superadmin123@example.com',
-            password='goodpass123',
-            name='Admin Name',
-            role=Role.objects.get(name='Admin'),
-            address='test address',
-            phone_number='1234567890',
+        if not User.objects.filter(email='superadmin123@example.com').exists():
+            User.objects.create_superuser(
+                email='superadmin123@example.com',
+                password='goodpass123',
+                name='Admin Name',
+                role=Role.objects.get(code=RoleCode.ADMIN),
+                address='test address',
+                phone_number='1234567890',
+            )
+
+        if options['patients'] or options['doctors']:
+            self.seed_volumes(options)
+
+    def seed_volumes(self, options):
+        start = time.perf_counter()
+        doctor_ids = seeding.seed_doctors(options['doctors'], options['seed'])
+        patient_ids = seeding.seed_patients(
+            options['patients'], options['seed'], options['batch_size'], options['workers']
+        )
+        seeding.seed_reservations(
+            options['reservations'], doctor_ids, patient_ids, options['days'], options['seed'],
+            options['batch_size'], options['workers'], options['start_date'],
         )
 
+        # bulk_create skips the signals that keep these in step
+        get_name_index(Patient).reset()
+        get_name_index(User).reset()
+        invalidate_all()
+        if options['verbosity']:
+            self.stdout.write(
+                f"Seeded {options['doctors']} doctors, {options['patients']} patients and "
+                f"{options['reservations']} reservations in {time.perf_counter() - start:.1f}s"
+            )
+
     def add_user_api_permissions(self):
         user_content_type = ContentType.objects.filter(app_label='core', model='user').first()
         user_permissions = Permission.objects.filter(content_type_id=user_content_type.id)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from reservation.reminders import ReminderScheduler, get_backend
+
+
+class Command(BaseCommand):
+    help = 'Send patient and doctor reservation reminders when they are due'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send the reminders due now and exit.')
+        parser.add_argument('--backend', help='Dotted path of the delivery backend, defaults to REMINDER_BACKEND.')
+        parser.add_argument('--window', type=int, help='Seconds of upcoming reminders loaded at a time.')
+
+    def handle(self, *args, **options):
+        scheduler = ReminderScheduler(backend=get_backend(options['backend']), window=options['window'])
+        if options['once']:
+            self.stdout.write(f'{scheduler.run_pending()} reminders sent')
+            return
+
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,189 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {round(self.sum, 6)}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+# name, help, buckets, index in the values passed to MetricsRegistry.observe
+HISTOGRAMS = (
+    ('http_request_duration_seconds', 'Time from the request entering to the response leaving the app.',
+     DURATION_BUCKETS, 0),
+    ('http_request_db_queries', 'SQL queries run per request.', QUERY_BUCKETS, 1),
+    ('http_request_db_duration_seconds', 'Time spent in SQL queries per request.', DURATION_BUCKETS, 2),
+    ('http_request_render_duration_seconds', 'Time spent rendering the response body.', DURATION_BUCKETS, 3),
+)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """Per-process histograms by view and method, and request counts by status."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._requests = {}
+
+    def observe(self, view, method, status, values):
+        with self._lock:
+            histograms = self._histograms.get((view, method))
+            if histograms is None:
+                histograms = self._histograms[(view, method)] = [
+                    Histogram(buckets) for _, _, buckets, _ in HISTOGRAMS
+                ]
+            for histogram, (_, _, _, index) in zip(histograms, HISTOGRAMS):
+                histogram.observe(values[index])
+            self._requests[(view, method, status)] = self._requests.get((view, method, status), 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._requests.clear()
+
+    def prometheus(self):
+        lines = [
+            '# HELP http_requests_total Requests by view, method and status.',
+            '# TYPE http_requests_total counter',
+        ]
+        with self._lock:
+            for (view, method, status), count in sorted(self._requests.items()):
+                lines.append(
+                    f'http_requests_total{{view="{_label(view)}",method="{method}",status="{status}"}} {count}'
+                )
+            for position, (name, description, _, _) in enumerate(HISTOGRAMS):
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+                for (view, method), histograms in sorted(self._histograms.items()):
+                    lines.extend(histograms[position].samples(name, f'view="{_label(view)}",method="{method}"'))
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class RequestTimer:
+    def __init__(self):
+        self.queries = 0
+        self.db = 0
+        self.render = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+
+def _count_queries(timer):
+    # connections are per thread, the wrappers go on the calling thread's
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(timer))
+    return stack
+
+
+class MetricsMiddleware:
+    """
+    Records the SQL query count and time, rendering time and total time of each request into the registry
+    and the Server-Timing response header. Removed from the middleware chain unless REQUEST_METRICS is set.
+
+    Sync and async: under ASGI the chain stays async up to the views that are, and the queries are counted
+    in the request's sync_to_async thread, where the ORM runs them with that thread's connections.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timer = request._metrics_timer = RequestTimer()
+        start = time.perf_counter()
+        with _count_queries(timer):
+            response = self.get_response(request)
+        return self._finish(request, response, timer, start)
+
+    async def __acall__(self, request):
+        timer = request._metrics_timer = RequestTimer()
+        start = time.perf_counter()
+        stack = await sync_to_async(_count_queries)(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self._finish(request, response, timer, start)
+
+    def _finish(self, request, response, timer, start):
+        total = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unmatched'
+        if view != 'metrics':
+            values = (total, timer.queries, timer.db, timer.render)
+            registry.observe(view, request.method, response.status_code, values)
+        response['Server-Timing'] = (
+            f'db;dur={timer.db * 1000:.1f};desc="{timer.queries} queries", '
+            f'render;dur={timer.render * 1000:.1f}, total;dur={total * 1000:.1f}'
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns, this brackets the renderer
+        timer = request._metrics_timer
+        start = time.perf_counter()
+
+        def rendered(response):
+            timer.render += time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def metrics(request):
+    """Prometheus text exposition of this process's request metrics, for the addresses in METRICS_ALLOWED_IPS."""
+    if not settings.REQUEST_METRICS:
+        raise Http404
+    # the view names and traffic are not for the public, scrapers are let in by address
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise PermissionDenied
+    return HttpResponse(registry.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
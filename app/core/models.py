@@ -1,28 +1,31 @@
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
-    PermissionsMixin, Group,
+    PermissionsMixin,
 )
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
+from core.search import normalize_name
+
 
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
             raise ValueError('User must have an email address.')
 
+        from core.roles import role_cache
+
         user = self.model(email=self.normalize_email(email), **extra_fields)
         user.set_password(password)
         user.save(using=self._db)
 
-        if user.role.name == "Admin":
-            group = Group.objects.get(name='admins_group')
-        elif user.role.name == "Doctor":
-            group = Group.objects.get(name='doctors_group')
-        else:
-            group = Group.objects.get(name='receptionist_group')  # Create a default group if needed
-
-        user.groups.add(group)
+        user.groups.add(role_cache.group_id_for_role(user.role_id))
 
         return user
 
@@ -35,25 +38,44 @@ class UserManager(BaseUserManager):
         return user
 
 
-class Patient(models.Model):
+class SearchNameMixin:
+    # keeps the normalized, indexed search_name in step with name
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_name(self.name)[:self._meta.get_field('search_name').max_length]
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'search_name'}
+        super().save(*args, **kwargs)
+
+
+class Patient(SearchNameMixin, models.Model):
     name = models.CharField(max_length=100)
     relative = models.CharField(max_length=100, blank=True, null=True)
     relative_name = models.CharField(max_length=100, blank=True, null=True)
     phone_number = models.CharField(max_length=20)
     birth_date = models.DateField()
+    search_name = models.CharField(max_length=100, db_index=True, editable=False, default='')
 
     def __str__(self):
         return self.name
 
 
+class RoleCode(models.TextChoices):
+    ADMIN = 'admin', 'Admin'
+    DOCTOR = 'doctor', 'Doctor'
+    RECEPTIONIST = 'receptionist', 'Receptionist'
+
+
 class Role(models.Model):
     name = models.CharField(max_length=255)
+    # stable key for code paths, the name is free to change
+    code = models.CharField(max_length=32, choices=RoleCode.choices, unique=True, blank=True, null=True)
 
     def __str__(self):
         return self.name
 
 
-class User(AbstractBaseUser, PermissionsMixin):
+class User(SearchNameMixin, AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(max_length=255, unique=True)
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
@@ -61,6 +83,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     role = models.ForeignKey(Role, on_delete=models.CASCADE)
     address = models.CharField(max_length=255, default='')
     phone_number = models.CharField(max_length=20, default='')
+    search_name = models.CharField(max_length=255, db_index=True, editable=False, default='')
 
     objects = UserManager()
 
@@ -70,6 +93,109 @@ class User(AbstractBaseUser, PermissionsMixin):
         return self.email
 
 
+# upper bound on a reservation's length, it bounds the range scanned by the slot conflict check
+MAX_RESERVATION_DURATION = 8 * 60
+
+
+def validate_weekdays(value):
+    if not isinstance(value, list) or not value or not all(
+        isinstance(day, int) and not isinstance(day, bool) and 0 <= day <= 6 for day in value
+    ):
+        raise ValidationError('Enter a non-empty list of weekdays from 0 (Monday) to 6 (Sunday).')
+
+
+class ReservationSeries(models.Model):
+    """
+    A weekly recurring booking, on the given weekdays from start_date for count occurrences or until a date.
+
+    Occurrences are computed for the windows that are read and become Reservation rows only once
+    edited, see reservation.series.pending_occurrences.
+    """
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE)
+    description = models.TextField()
+    requirements = models.TextField(blank=True, null=True)
+    patient_reminder = models.TimeField(blank=True, null=True)
+    doctor_reminder = models.TimeField(blank=True, null=True)
+    time = models.TimeField()
+    duration = models.PositiveIntegerField(
+        default=30,
+        validators=[MinValueValidator(1), MaxValueValidator(MAX_RESERVATION_DURATION)],
+    )
+    # Monday = 0
+    weekdays = models.JSONField(validators=[validate_weekdays])
+    start_date = models.DateField()
+    count = models.PositiveIntegerField(blank=True, null=True)
+    until = models.DateField(blank=True, null=True)
+    # last occurrence, derived from count or until
+    end_date = models.DateField(editable=False)
+    # ISO dates of cancelled occurrences, they are not expanded again
+    cancelled_dates = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['end_date', 'start_date'], name='series_window_idx'),
+        ]
+
+    def occurrence_dates(self, date_from=None, date_to=None):
+        weekdays = set(self.weekdays) & set(range(7))
+        day = self.start_date
+        found = 0
+        # every week holds an occurrence, so a series ends within count weeks, or within the occurrence cap's
+        # weeks for one that ends on a date. Bounds the loop whatever was saved.
+        weeks = self.count if self.count is not None else settings.RESERVATION_SERIES_MAX_OCCURRENCES
+        last = min(
+            value for value in (self.start_date + timedelta(weeks=weeks, days=-1), self.until, date_to)
+            if value is not None
+        )
+        while weekdays and (self.count is None or found < self.count) and day <= last:
+            if day.weekday() in weekdays:
+                found += 1
+                if date_from is None or day >= date_from:
+                    yield day
+            day += timedelta(days=1)
+
+    def build_occurrence(self, day):
+        return Reservation(
+            series=self,
+            series_date=day,
+            date=day,
+            time=self.time,
+            duration=self.duration,
+            patient=self.patient,
+            doctor=self.doctor,
+            description=self.description,
+            requirements=self.requirements,
+            patient_reminder=self.patient_reminder,
+            doctor_reminder=self.doctor_reminder,
+        )
+
+    def clean(self):
+        if (self.count is None) == (self.until is None):
+            raise ValidationError('A series ends either after count occurrences or on the until date.')
+        try:
+            validate_weekdays(self.weekdays)
+        except ValidationError:
+            # reported on the field
+            return
+        limit = settings.RESERVATION_SERIES_MAX_OCCURRENCES
+        if self.count is not None and self.count > limit:
+            raise ValidationError({'count': f'At most {limit} occurrences per series.'})
+        # occurrence_dates() stops after the cap's weeks, an until past them would be cut short
+        if self.until is not None and (
+            self.until >= self.start_date + timedelta(weeks=limit)
+            or len(list(islice(self.occurrence_dates(), limit + 1))) > limit
+        ):
+            raise ValidationError({'until': f'At most {limit} occurrences per series.'})
+
+    def save(self, *args, **kwargs):
+        self.end_date = max(self.occurrence_dates(), default=self.start_date)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.patient.name + ', ' + self.description
+
+
 class Reservation(models.Model):
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
     doctor = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -79,9 +205,100 @@ class Reservation(models.Model):
     requirements = models.TextField(blank=True, null=True)
     patient_reminder = models.TimeField(blank=True, null=True)
     doctor_reminder = models.TimeField(blank=True, null=True)
+    # minutes
+    duration = models.PositiveIntegerField(
+        default=30,
+        validators=[MinValueValidator(1), MaxValueValidator(MAX_RESERVATION_DURATION)],
+    )
+    # occurrences of a series keep their original date in series_date when they are moved
+    series = models.ForeignKey(
+        ReservationSeries, on_delete=models.SET_NULL, blank=True, null=True, related_name='occurrences'
+    )
+    series_date = models.DateField(blank=True, null=True, editable=False)
+    # set by the reminder scheduler when it claims the reminder
+    patient_reminder_sent_at = models.DateTimeField(blank=True, null=True, editable=False)
+    doctor_reminder_sent_at = models.DateTimeField(blank=True, null=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'date', 'time'], name='reservation_unique_doctor_slot'),
+            models.UniqueConstraint(fields=['series', 'series_date'], name='reservation_unique_series_date'),
+        ]
+        indexes = [
+            # front desk day view: date (+ doctor), ordered by time
+            models.Index(fields=['date', 'doctor', 'time'], name='reservation_day_view_idx'),
+            # doctor calendar: one doctor across a range of dates
+            models.Index(fields=['doctor', 'date'], name='reservation_doctor_date_idx'),
+            # reminder scheduler: only the reminders still to send
+            models.Index(
+                fields=['date', 'patient_reminder'], name='reservation_patient_remind_idx',
+                condition=models.Q(patient_reminder__isnull=False, patient_reminder_sent_at__isnull=True),
+            ),
+            models.Index(
+                fields=['date', 'doctor_reminder'], name='reservation_doctor_remind_idx',
+                condition=models.Q(doctor_reminder__isnull=False, doctor_reminder_sent_at__isnull=True),
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # the date as read, so a save knows the day it moves the reservation away from without a query
+        instance.loaded_date = instance.__dict__.get('date')
+        return instance
 
     def __str__(self):
         return self.patient.name + ', ' + self.description
 
 
+class ImportJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+    ]
+
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True)
+    file_name = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=1024)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    rows_processed = models.PositiveIntegerField(default=0)
+    inserted = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f'{self.file_name} ({self.status})'
+
+
+class WorkingHours(models.Model):
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='working_hours')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start = models.TimeField()
+    end = models.TimeField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', 'weekday', 'start'], name='working_hours_doctor_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.doctor} {self.get_weekday_display()} {self.start}-{self.end}'
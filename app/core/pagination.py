@@ -0,0 +1,203 @@
+import json
+from base64 import b64decode, b64encode
+from datetime import date, datetime, time
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on the queryset's own ordering, which must end with a unique field (e.g. id).
+
+    Unlike DRF's CursorPagination the cursor holds the full ordering tuple, so pages are
+    fetched with a single range condition no matter how many rows share the leading fields.
+    """
+    ordering = ('id',)
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self._set_page(list(self._page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # same page through the async ORM, for async views
+        return self._set_page([item async for item in self._page_queryset(queryset, request)])
+
+    def _page_queryset(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.limit = self.get_page_size(request)
+
+        ordering = tuple(queryset.query.order_by) or self.ordering
+        queryset = queryset.order_by(*ordering)
+        self.fields = [field.lstrip('-') for field in ordering]
+        self.descending = [field.startswith('-') for field in ordering]
+        self.model_fields = [self._model_field(queryset, field) for field in self.fields]
+
+        self.position, self.reverse = self.decode_cursor(request)
+        if self.reverse:
+            queryset = queryset.reverse()
+        if self.position is not None:
+            queryset = queryset.filter(self._after(self.position, self.reverse))
+        return queryset[:self.limit + 1]
+
+    def _set_page(self, results):
+        has_more = len(results) > self.limit
+        # the row before the page: the previous page's last, or the extra one fetched when paging back
+        extra = self.ordering_values(results[self.limit]) if has_more else None
+        results = results[:self.limit]
+        if self.reverse:
+            results.reverse()
+
+        if self.reverse:
+            self.has_next, self.has_previous = self.position is not None, has_more
+            self.before = extra
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+            self.before = self.position
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        page_size = self.page_size
+        if self.page_size_query_param in request.query_params:
+            try:
+                page_size = int(request.query_params[self.page_size_query_param])
+            except ValueError:
+                pass
+        return max(1, min(page_size or self.max_page_size, self.max_page_size))
+
+    @staticmethod
+    def _model_field(queryset, path):
+        if path in queryset.query.annotations:
+            return queryset.query.annotations[path].output_field
+        opts = queryset.model._meta
+        *relations, name = path.split('__')
+        try:
+            for relation in relations:
+                opts = opts.get_field(relation).related_model._meta
+            return opts.get_field(name)
+        except (FieldDoesNotExist, AttributeError):
+            return None
+
+    def _after(self, position, reverse):
+        # (a, b, c) > (x, y, z)  ==  a > x  or  (a = x and b > y)  or  (a = x and b = y and c > z)
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            greater = self.descending[i] == reverse
+            lookup = {f'{field}__gt' if greater else f'{field}__lt': position[i]}
+            lookup.update({self.fields[j]: position[j] for j in range(i)})
+            condition |= Q(**lookup)
+        return condition
+
+    def ordering_values(self, item):
+        return [item[field] if isinstance(item, dict) else getattr(item, field) for field in self.fields]
+
+    def page_includes(self, values):
+        """
+        Whether an item from outside the queryset, with these values of the leading ordering fields, goes on
+        this page: the page of the first row that sorts at or after it, or the last one. Lets a view merge
+        computed items into the rows. The leading ordering fields must be ascending.
+        """
+        values = tuple(values)
+        if self.before is not None and values <= tuple(self.before[:len(values)]):
+            return False
+        if not self.has_next or not self.page:
+            return True
+        return values <= tuple(self.ordering_values(self.page[-1])[:len(values)])
+
+    def _position(self, item):
+        return [
+            value.isoformat() if isinstance(value, (date, datetime, time)) else value
+            for value in self.ordering_values(item)
+        ]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position, reverse = cursor['p'], bool(cursor['r'])
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            # a tampered cursor must not reach the query with values of the wrong type
+            position = [self._to_python(field, value) for field, value in zip(self.model_fields, position)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def _to_python(field, value):
+        if value is None:
+            raise ValueError('Cursor positions are never null.')
+        return value if field is None else field.to_python(value)
+
+    def encode_cursor(self, position, reverse):
+        encoded = b64encode(json.dumps({'p': position, 'r': int(reverse)}).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self._position(self.page[-1]), False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self._position(self.page[0]), True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
@@ -0,0 +1,102 @@
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import User
+
+# user id -> (frozenset of permission codenames granted through the user's groups, load time). Changes clear
+# the entries of this process only, PERMISSION_CACHE_TTL bounds how long other processes keep using them.
+_codenames_cache = {}
+_codenames_lock = threading.Lock()
+# bumped by every invalidation, a load that overlapped one is not stored
+_user_versions = {}
+_generation = 0
+
+
+def _load_group_codenames(user):
+    return frozenset(
+        Permission.objects.filter(group__user=user).values_list('codename', flat=True).distinct()
+    )
+
+
+def get_group_codenames(user):
+    if not user or not user.is_authenticated:
+        return frozenset()
+
+    with _codenames_lock:
+        entry = _codenames_cache.get(user.pk)
+        if entry is not None and time.monotonic() - entry[1] <= settings.PERMISSION_CACHE_TTL:
+            return entry[0]
+        version = (_generation, _user_versions.get(user.pk, 0))
+
+    loaded_at = time.monotonic()
+    codenames = _load_group_codenames(user)
+    with _codenames_lock:
+        if version == (_generation, _user_versions.get(user.pk, 0)):
+            _codenames_cache[user.pk] = (codenames, loaded_at)
+    return codenames
+
+
+def get_request_codenames(request):
+    # resolved once per request, the process-level cache covers the rest
+    codenames = getattr(request, '_group_codenames', None)
+    if codenames is None:
+        codenames = get_group_codenames(request.user)
+        request._group_codenames = codenames
+    return codenames
+
+
+def has_permission(request, code_name):
+    return code_name in get_request_codenames(request)
+
+
+def invalidate_user(user_id):
+    with _codenames_lock:
+        _codenames_cache.pop(user_id, None)
+        _user_versions[user_id] = _user_versions.get(user_id, 0) + 1
+
+
+def invalidate_all():
+    global _generation
+    with _codenames_lock:
+        _codenames_cache.clear()
+        _user_versions.clear()
+        _generation += 1
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def _user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+
+    if not reverse:
+        invalidate_user(instance.pk)
+    elif pk_set is None:
+        # group.user_set.clear() does not report which users were affected
+        invalidate_all()
+    else:
+        for user_id in pk_set:
+            invalidate_user(user_id)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def _group_permissions_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_all()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def _group_or_permission_deleted(sender, **kwargs):
+    invalidate_all()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _user_saved_or_deleted(sender, instance, **kwargs):
+    # primary keys can be reused (e.g. sqlite without AUTOINCREMENT)
+    invalidate_user(instance.pk)
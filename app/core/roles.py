@@ -0,0 +1,87 @@
+import threading
+import time
+
+from django.contrib.auth.models import Group
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Role, RoleCode
+
+ROLE_GROUPS = {
+    RoleCode.ADMIN: 'admins_group',
+    RoleCode.DOCTOR: 'doctors_group',
+    RoleCode.RECEPTIONIST: 'receptionist_group',
+}
+# users whose role has no group of its own
+DEFAULT_ROLE = RoleCode.RECEPTIONIST
+# seconds between reloads caused by unknown keys; changes made in this process clear the cache at once
+MISS_RELOAD_INTERVAL = 5
+
+
+class RoleCache:
+    """Role id <-> code <-> group id, loaded on first use and dropped whenever a role or group changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+        self._loaded_at = 0
+
+    def _load(self):
+        code_by_role = {}
+        role_by_code = {}
+        role_by_name = {}
+        for role_id, code, name in Role.objects.values_list('id', 'code', 'name'):
+            # roles created before codes existed fall back to their name
+            code = code or name.lower()
+            code_by_role[role_id] = code
+            role_by_code.setdefault(code, role_id)
+            role_by_name[name] = role_id
+
+        group_names = {name: code for code, name in ROLE_GROUPS.items()}
+        group_by_code = {
+            group_names[name]: group_id
+            for name, group_id in Group.objects.filter(name__in=group_names).values_list('name', 'id')
+        }
+        return code_by_role, role_by_code, role_by_name, group_by_code
+
+    def _get(self, index, key):
+        state = self._state
+        if state is None or (key not in state[index] and self._stale()):
+            # unknown keys may be roles created since the last load, by another process
+            with self._lock:
+                if self._state is None or self._state is state:
+                    self._state = self._load()
+                    self._loaded_at = time.monotonic()
+                state = self._state
+        return state[index].get(key)
+
+    def _stale(self):
+        return time.monotonic() - self._loaded_at >= MISS_RELOAD_INTERVAL
+
+    def code_for_role(self, role_id):
+        return self._get(0, role_id)
+
+    def role_id_for_code(self, code):
+        return self._get(1, code)
+
+    def role_id_for_name(self, name):
+        return self._get(2, name)
+
+    def group_id_for_role(self, role_id):
+        code = self.code_for_role(role_id)
+        return self._get(3, code if code in ROLE_GROUPS else DEFAULT_ROLE)
+
+    def clear(self):
+        with self._lock:
+            self._state = None
+
+
+role_cache = RoleCache()
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def _roles_changed(sender, **kwargs):
+    role_cache.clear()
@@ -0,0 +1,38 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+
+REPLICA = 'replica'
+
+# set for the duration of a read-only request
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def use_replica(enabled=True):
+    token = replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Reads go to the 'replica' database while use_replica() is on (e.g. read-only API actions, see
+    core.views.ReplicaReadMixin), everything else to 'default'. Without a replica configured every
+    query goes to 'default'.
+    """
+
+    def db_for_read(self, model, **hints):
+        if replica_reads.get() and REPLICA in connections:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds a copy of the primary
+        return True
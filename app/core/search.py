@@ -0,0 +1,171 @@
+import heapq
+import threading
+import unicodedata
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.signals import post_delete, post_save
+
+# upper bound appended to a prefix to turn it into an indexable range
+_RANGE_END = '\uffff'
+
+
+def normalize_name(value):
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def filter_by_name(queryset, query):
+    """Prefix match on search_name, exact matches ranked first."""
+    key = normalize_name(query)
+    if not key:
+        return queryset.none()
+
+    # the range lets every backend use the search_name index, startswith keeps it exact
+    return queryset.filter(
+        search_name__gte=key,
+        search_name__lt=key + _RANGE_END,
+        search_name__startswith=key,
+    ).annotate(
+        name_rank=Case(When(search_name=key, then=Value(0)), default=Value(1), output_field=IntegerField())
+    ).order_by('name_rank', 'id')
+
+
+class _TrieNode:
+    __slots__ = ('children', 'ids')
+
+    def __init__(self):
+        self.children = {}
+        self.ids = {}
+
+
+class PrefixTrie:
+    def __init__(self):
+        self._root = _TrieNode()
+        self._keys = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def insert(self, pk, key, name):
+        self.remove(pk)
+        node = self._root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+        node.ids[pk] = name
+        self._keys[pk] = key
+
+    def remove(self, pk):
+        key = self._keys.pop(pk, None)
+        if key is None:
+            return
+
+        path = [self._root]
+        for char in key:
+            path.append(path[-1].children[char])
+        del path[-1].ids[pk]
+
+        # prune branches that no longer lead to any entry
+        for depth in range(len(key), 0, -1):
+            node = path[depth]
+            if node.ids or node.children:
+                break
+            del path[depth - 1].children[key[depth - 1]]
+
+    def search(self, prefix, limit=None):
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+
+        exact = sorted(node.ids.items())
+        if limit is not None and len(exact) >= limit:
+            return exact[:limit]
+
+        others = []
+        stack = list(node.children.values())
+        while stack:
+            current = stack.pop()
+            others.extend(current.ids.items())
+            stack.extend(current.children.values())
+
+        remaining = None if limit is None else limit - len(exact)
+        others = sorted(others) if remaining is None else heapq.nsmallest(remaining, others)
+        return exact + others
+
+
+class NameIndex:
+    """In-memory typeahead index over a model's search_name, built lazily and kept in sync on save/delete."""
+
+    def __init__(self, model):
+        self.model = model
+        self._trie = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'NAME_SEARCH_TRIE', False)
+
+    def _get_trie(self):
+        with self._lock:
+            if self._trie is None:
+                trie = PrefixTrie()
+                for pk, key, name in self.model.objects.values_list('id', 'search_name', 'name').iterator():
+                    trie.insert(pk, key, name)
+                self._trie = trie
+            return self._trie
+
+    def search(self, query, limit=None):
+        key = normalize_name(query)
+        if not key:
+            return []
+
+        if not self.enabled:
+            rows = filter_by_name(self.model.objects.all(), key).values_list('id', 'name')
+            return list(rows[:limit] if limit is not None else rows)
+
+        trie = self._get_trie()
+        with self._lock:
+            return trie.search(key, limit)
+
+    def update(self, instance):
+        with self._lock:
+            if self._trie is not None:
+                self._trie.insert(instance.pk, instance.search_name, instance.name)
+
+    def remove(self, pk):
+        with self._lock:
+            if self._trie is not None:
+                self._trie.remove(pk)
+
+    def reset(self):
+        # used after bulk writes that bypass the model signals
+        with self._lock:
+            self._trie = None
+
+
+_indexes = {}
+
+
+def get_name_index(model):
+    return _indexes[model]
+
+
+def register_name_index(model):
+    index = _indexes[model] = NameIndex(model)
+
+    def _saved(sender, instance, **kwargs):
+        transaction.on_commit(lambda: index.update(instance))
+
+    def _deleted(sender, instance, **kwargs):
+        pk = instance.pk
+        transaction.on_commit(lambda: index.remove(pk))
+
+    post_save.connect(_saved, sender=model, weak=False)
+    post_delete.connect(_deleted, sender=model, weak=False)
+    return index
@@ -0,0 +1,210 @@
+import multiprocessing
+import random
+from datetime import date, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import connections, router, transaction
+from django.db.models.constants import OnConflict
+
+from core.models import Patient, Reservation, Role, RoleCode, User
+from core.search import normalize_name
+
+FIRST_NAMES = (
+    'Adam', 'Ahmad', 'Ali', 'Amal', 'Amir', 'Anna', 'Bilal', 'Dana', 'David', 'Elias', 'Emma', 'Fadi', 'Farah',
+    'Hadi', 'Hana', 'Hassan', 'Ibrahim', 'Jad', 'Karim', 'Lara', 'Laman', 'Layla', 'Lina', 'Maya', 'Mira',
+    'Mohammad', 'Nadia', 'Nour', 'Omar', 'Rami', 'Rana', 'Rita', 'Sami', 'Sara', 'Tarek', 'Yara', 'Youssef', 'Zein',
+)
+LAST_NAMES = (
+    'Aoun', 'Awad', 'Azar', 'Bitar', 'Chami', 'Daher', 'Fares', 'Gemayel', 'Haddad', 'Hamdan', 'Harb', 'Issa',
+    'Jaber', 'Karam', 'Khalil', 'Khoury', 'Maalouf', 'Mansour', 'Nassar', 'Rizk', 'Saad', 'Saleh', 'Sayegh',
+    'Touma', 'Youssef', 'Zein',
+)
+RELATIVES = ('father', 'mother', 'brother', 'sister', 'husband', 'wife', 'son', 'daughter')
+DESCRIPTIONS = ('checkup', 'follow up', 'consultation', 'vaccination', 'lab results', 'prescription renewal')
+REQUIREMENTS = ('fasting', 'bring previous reports', 'x-ray')
+
+PASSWORD = 'goodpass123'
+# 15 minute slots from 08:00 to 20:00
+SLOT_MINUTES = 15
+FIRST_SLOT = 8 * 60
+SLOTS_PER_DAY = 48
+
+
+def _name(rng):
+    return f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+
+
+def _phone_number(rng):
+    return f'09{rng.randrange(10 ** 8):08d}'
+
+
+def seed_doctors(count, seed=0):
+    """Doctors doctor0@example.com onwards, the ones that exist already are kept. Returns their ids in order."""
+    rng = random.Random(f'{seed}:doctors')
+    emails = [f'doctor{i}@example.com' for i in range(count)]
+    existing = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+    role = Role.objects.get(code=RoleCode.DOCTOR)
+    # hashed once, every doctor shares the password
+    password = make_password(PASSWORD)
+
+    doctors = []
+    for email in emails:
+        # drawn whether or not the doctor exists, so the others get the same data as on a first run
+        name, phone_number, address = _name(rng), _phone_number(rng), f'{rng.randrange(1, 200)} Main Street'
+        if email not in existing:
+            doctors.append(User(
+                email=email, name=name, search_name=normalize_name(name), role=role, password=password,
+                phone_number=phone_number, address=address,
+            ))
+    # bulk_create skips create_user, which adds the role's group
+    Group.objects.get(name='doctors_group').user_set.add(*User.objects.bulk_create(doctors))
+
+    ids = dict(User.objects.filter(email__in=emails).values_list('email', 'id'))
+    return [ids[email] for email in emails]
+
+
+PATIENT_FIELDS = ('name', 'search_name', 'relative', 'relative_name', 'phone_number', 'birth_date')
+RESERVATION_FIELDS = ('patient', 'doctor', 'date', 'time', 'duration', 'description', 'requirements')
+
+
+def insert_rows(model, field_names, rows):
+    """
+    bulk_create(ignore_conflicts=True) for rows of database values: one INSERT run for all the rows,
+    skipping the model instances and the per row SQL compilation that dominate bulk_create at this volume.
+    """
+    connection = connections[router.db_for_write(model)]
+    ops = connection.ops
+    fields = [model._meta.get_field(name) for name in field_names]
+    sql = '%s %s (%s) VALUES (%s) %s' % (
+        ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        ops.quote_name(model._meta.db_table),
+        ', '.join(ops.quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+        ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None),
+    )
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def _patient_rows(seed, start, stop):
+    # one generator per batch, so a batch's rows don't depend on the ones before it
+    rng = random.Random(f'{seed}:patients:{start}')
+    ops = connections[router.db_for_write(Patient)].ops
+    first_birth_date = date(1940, 1, 1)
+    for _ in range(start, stop):
+        name = _name(rng)
+        yield (
+            name,
+            normalize_name(name),
+            rng.choice(RELATIVES),
+            _name(rng),
+            _phone_number(rng),
+            ops.adapt_datefield_value(first_birth_date + timedelta(days=rng.randrange(80 * 365))),
+        )
+
+
+def _reservation_rows(seed, start, slots, first_day, doctor_ids, patient_ids):
+    rng = random.Random(f'{seed}:reservations:{start}')
+    ops = connections[router.db_for_write(Reservation)].ops
+    slots_per_day = len(doctor_ids) * SLOTS_PER_DAY
+    # a slot's date and time are a handful of values, adapted once
+    dates = {}
+    times = [
+        ops.adapt_timefield_value(time(*divmod(FIRST_SLOT + slot * SLOT_MINUTES, 60))) for slot in range(SLOTS_PER_DAY)
+    ]
+    for slot in slots:
+        # slots are numbered by day, then doctor, then time of day
+        day, slot = divmod(slot, slots_per_day)
+        doctor, slot = divmod(slot, SLOTS_PER_DAY)
+        if day not in dates:
+            dates[day] = ops.adapt_datefield_value(first_day + timedelta(days=day))
+        yield (
+            rng.choice(patient_ids),
+            doctor_ids[doctor],
+            dates[day],
+            times[slot],
+            SLOT_MINUTES,
+            rng.choice(DESCRIPTIONS),
+            rng.choice(REQUIREMENTS) if rng.random() < 0.1 else None,
+        )
+
+
+# set in the parent before the pool forks, the workers inherit it instead of receiving it with every batch
+_worker_context = None
+
+
+def _batch_rows(batch):
+    kind, start, stop = batch
+    if kind == 'patients':
+        return list(_patient_rows(_worker_context['seed'], start, stop))
+    return list(_reservation_rows(
+        _worker_context['seed'], start, _worker_context['slots'][start:stop], _worker_context['first_day'],
+        _worker_context['doctor_ids'], _worker_context['patient_ids'],
+    ))
+
+
+def _run_batches(model, field_names, batches, workers, context):
+    """
+    Generates the batches' rows, in worker processes when workers > 1, and inserts them in batch order.
+    Writes stay in this process, so ids come out the same whatever the number of workers.
+    """
+    global _worker_context
+    _worker_context = context
+    try:
+        if workers <= 1:
+            for batch in batches:
+                insert_rows(model, field_names, _batch_rows(batch))
+            return
+        # the forked workers only generate rows, they must not use the connections they inherit
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            for rows in pool.imap(_batch_rows, batches):
+                insert_rows(model, field_names, rows)
+    finally:
+        _worker_context = None
+
+
+def seed_patients(count, seed=0, batch_size=5000, workers=1):
+    """Adds patients until there are count of them. Returns the ids of the first count patients."""
+    existing = Patient.objects.count()
+    # batches are cut at the same rows on every run, so topping up continues the first run's data
+    first = existing - existing % batch_size
+    batches = [
+        ('patients', start, min(start + batch_size, count)) for start in range(first, count, batch_size)
+    ]
+    if batches and existing > first:
+        # the partly written batch is regenerated from its start, minus the rows already there
+        insert_rows(Patient, PATIENT_FIELDS, list(_patient_rows(seed, first, batches[0][2]))[existing - first:])
+        batches = batches[1:]
+    _run_batches(Patient, PATIENT_FIELDS, batches, workers, {'seed': seed})
+    return list(Patient.objects.order_by('id').values_list('id', flat=True)[:count])
+
+
+def reservation_capacity(doctors, days):
+    return doctors * days * SLOTS_PER_DAY
+
+
+def seed_reservations(count, doctor_ids, patient_ids, days=365, seed=0, batch_size=5000, workers=1, first_day=None):
+    """
+    count reservations in distinct slots of the doctors over days days from first_day, by default centered
+    on today so the day views have data. The slots and their patients depend on the seed only.
+
+    A rerun adds nothing as long as the window stays put: with the default first_day only on the same day,
+    a later run lands the same slots on moved dates and adds the ones that are free there.
+    """
+    if first_day is None:
+        first_day = date.today() - timedelta(days=days // 2)
+    slots = random.Random(f'{seed}:slots').sample(range(reservation_capacity(len(doctor_ids), days)), count)
+    # in index order, which keeps the inserts appending to the day view index
+    slots.sort()
+    context = {
+        'seed': seed,
+        'slots': slots,
+        'first_day': first_day,
+        'doctor_ids': doctor_ids,
+        'patient_ids': patient_ids,
+    }
+    batches = [('reservations', start, min(start + batch_size, count)) for start in range(0, count, batch_size)]
+    # conflicts are ignored, a rerun finds the same slots taken and adds nothing
+    _run_batches(Reservation, RESERVATION_FIELDS, batches, workers, context)
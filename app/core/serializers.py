@@ -0,0 +1,78 @@
+from functools import lru_cache
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
+
+# fields whose to_representation() returns database values unchanged
+_IDENTITY_FIELDS = (serializers.IntegerField, serializers.CharField, serializers.BooleanField)
+
+
+def _converter(field):
+    if isinstance(field, (serializers.ManyRelatedField, serializers.BaseSerializer, serializers.SerializerMethodField)):
+        raise ImproperlyConfigured(f'{field.field_name} cannot be read with .values().')
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        return field.pk_field.to_representation if field.pk_field else None
+    if isinstance(field, _IDENTITY_FIELDS):
+        return None
+    if isinstance(field, serializers.DateField):
+        output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+    elif isinstance(field, serializers.TimeField):
+        output_format = getattr(field, 'format', api_settings.TIME_FORMAT)
+    else:
+        output_format = None
+    if isinstance(output_format, str) and output_format.lower() == ISO_8601:
+        return _isoformat
+    return field.to_representation
+
+
+def _isoformat(value):
+    return value if isinstance(value, str) else value.isoformat()
+
+
+class ValuesSerializer:
+    """
+    Read-only fast path for a ModelSerializer's list output.
+
+    Rows are fetched with .values() for exactly the serializer's readable fields and turned into dicts by
+    converters worked out once per serializer class, skipping the per-row field machinery. The output is the
+    same as serializer_class(queryset, many=True).data. expand embeds related objects as
+    ((field, (nested fields...)), ...), the way ReservationSerializer's ?expand= does.
+    """
+
+    def __init__(self, serializer_class, expand=()):
+        self.fields = []
+        self.columns = []
+        expand = dict(expand)
+        for field in serializer_class()._readable_fields:
+            column = field.source.replace('.', '__')
+            if field.field_name in expand:
+                nested = [(name, f'{column}__{name}') for name in expand[field.field_name]]
+                self.fields.append((field.field_name, None, nested))
+                self.columns.extend(nested_column for _, nested_column in nested)
+            else:
+                self.fields.append((field.field_name, column, _converter(field)))
+                self.columns.append(column)
+
+    def values(self, queryset):
+        # the ordering columns too, keyset pagination reads the cursor position from them
+        ordering = [field.lstrip('-') for field in queryset.query.order_by if field.lstrip('-') not in self.columns]
+        return queryset.values(*self.columns, *ordering)
+
+    def to_representation(self, row):
+        data = {}
+        for name, column, convert in self.fields:
+            if column is None:
+                data[name] = {nested_name: row[nested_column] for nested_name, nested_column in convert}
+                continue
+            value = row[column]
+            data[name] = value if convert is None or value is None else convert(value)
+        return data
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+@lru_cache(maxsize=None)
+def values_serializer(serializer_class, expand=()):
+    return ValuesSerializer(serializer_class, expand)
@@ -0,0 +1,87 @@
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.metrics import registry
+from core.models import Role, User
+
+PATIENT_URL = reverse('patient:patient-list')
+METRICS_URL = reverse('metrics')
+
+
+@override_settings(REQUEST_METRICS=True, METRICS_ALLOWED_IPS=['127.0.0.1'])
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        call_command('seeder')
+        registry.clear()
+        # the middleware chain is built on the client's first request, after the override applies
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='testpass123', name='Admin', role=Role.objects.get(name='Admin')
+        )
+        self.client.force_authenticate(self.admin)
+
+    def test_server_timing_header(self):
+        with self.assertNumQueries(2):
+            res = self.client.get(PATIENT_URL)
+
+        self.assertRegex(
+            res['Server-Timing'], r'^db;dur=[\d.]+;desc="2 queries", render;dur=[\d.]+, total;dur=[\d.]+$'
+        )
+
+    async def test_async_request(self):
+        token = await Token.objects.acreate(user=self.admin)
+
+        res = await self.async_client.get(
+            reverse('reservation:reservation-async-list'), headers={'Authorization': f'Token {token.key}'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # the token and the page, run in the request's sync thread
+        self.assertRegex(res['Server-Timing'], r'^db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn(
+            'http_requests_total{view="reservation:reservation-async-list",method="GET",status="200"} 1',
+            registry.prometheus(),
+        )
+
+    def test_metrics_endpoint(self):
+        self.client.get(PATIENT_URL)
+        self.client.get(PATIENT_URL)
+        self.client.get(reverse('patient:patient-detail', args=[0]))
+
+        res = self.client.get(METRICS_URL)
+        body = res.content.decode()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('http_requests_total{view="patient:patient-list",method="GET",status="200"} 2', body)
+        self.assertIn('http_requests_total{view="patient:patient-detail",method="GET",status="404"} 1', body)
+        self.assertIn(
+            'http_request_db_queries_bucket{view="patient:patient-list",method="GET",le="2"} 2', body
+        )
+        self.assertIn('http_request_duration_seconds_count{view="patient:patient-list",method="GET"} 2', body)
+        self.assertNotIn('view="metrics"', body)
+
+    def test_metrics_endpoint_allowed_ips(self):
+        self.assertEqual(self.client.get(METRICS_URL, REMOTE_ADDR='10.0.0.2').status_code, status.HTTP_403_FORBIDDEN)
+
+        with override_settings(METRICS_ALLOWED_IPS=['10.0.0.2']):
+            self.assertEqual(self.client.get(METRICS_URL, REMOTE_ADDR='10.0.0.2').status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get(METRICS_URL).status_code, status.HTTP_403_FORBIDDEN)
+
+        with override_settings(METRICS_ALLOWED_IPS=[]):
+            self.assertEqual(self.client.get(METRICS_URL).status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(REQUEST_METRICS=False)
+    def test_disabled(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(email='admin@example.com'))
+
+        res = client.get(PATIENT_URL)
+
+        self.assertNotIn('Server-Timing', res)
+        self.assertEqual(client.get(METRICS_URL).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIn('http_requests_total counter\n#', registry.prometheus())
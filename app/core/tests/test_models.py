@@ -1,11 +1,15 @@
 from datetime import date, time
 
+from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.core.management import call_command
 
 from core import models
-from core.models import Role
+from core.models import Role, RoleCode
+from core.roles import MISS_RELOAD_INTERVAL, role_cache
 
 
 class ModelTests(TestCase):
@@ -112,3 +116,84 @@ class ModelTests(TestCase):
 
         for key in payload.keys():
             self.assertEqual(payload[key], getattr(res, key))
+
+    def test_search_name_kept_in_step_with_name(self):
+        patient = models.Patient.objects.create(
+            name='  Émile   Zola ',
+            phone_number='0123456789',
+            birth_date=date(2015, 7, 23),
+        )
+        self.assertEqual(patient.search_name, 'emile zola')
+
+        patient.name = 'Nana'
+        patient.save(update_fields=['name'])
+        patient.refresh_from_db()
+        self.assertEqual(patient.search_name, 'nana')
+
+    def test_create_user_without_role_or_group_queries(self):
+        role = Role.objects.get(name='Doctor')
+        get_user_model().objects.create_user(email='first@example.com', password='testpass123', role=role)
+
+        with CaptureQueriesContext(connection) as queries:
+            user = get_user_model().objects.create_user(
+                email='second@example.com', password='testpass123', role=role
+            )
+
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('"core_role"', sql)
+        self.assertNotIn('"auth_group"', sql)
+        self.assertEqual(list(user.groups.values_list('name', flat=True)), ['doctors_group'])
+
+    def test_role_cache_refreshed_on_role_change(self):
+        role = Role.objects.get(code=RoleCode.DOCTOR)
+        self.assertEqual(role_cache.role_id_for_name('Doctor'), role.id)
+
+        role.name = 'Physician'
+        role.save()
+
+        self.assertEqual(role_cache.role_id_for_name('Physician'), role.id)
+        self.assertIsNone(role_cache.role_id_for_name('Doctor'))
+        self.assertEqual(role_cache.code_for_role(role.id), RoleCode.DOCTOR)
+
+    def test_role_cache_reloads_unknown_keys_once_per_interval(self):
+        role_cache.clear()
+        role_cache.code_for_role(0)
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                self.assertIsNone(role_cache.code_for_role(0))
+                self.assertIsNone(role_cache.role_id_for_name('Nurse'))
+
+        role_cache._loaded_at -= MISS_RELOAD_INTERVAL
+        with self.assertNumQueries(2):
+            self.assertIsNone(role_cache.code_for_role(0))
+
+    def test_series_validation_and_bounded_occurrences(self):
+        series = models.ReservationSeries(
+            patient=models.Patient.objects.create(
+                name='patient', phone_number='0123456789', birth_date=date(2015, 7, 23)
+            ),
+            doctor=get_user_model().objects.create_user(
+                email='doctor@example.com', password='testpass123', role=Role.objects.get(name='Doctor')
+            ),
+            description='physiotherapy',
+            time=time(10, 0),
+            start_date=date(2024, 7, 22),
+            count=3,
+        )
+
+        for weekdays in ([], [7], ['1'], 1):
+            series.weekdays = weekdays
+            with self.assertRaises(ValidationError):
+                series.full_clean()
+        # saved without validation, e.g. through a script, the occurrences still end
+        series.weekdays = [7]
+        series.save()
+        self.assertEqual(series.end_date, date(2024, 7, 22))
+
+        series.weekdays = [0]
+        series.count = 201
+        with self.assertRaises(ValidationError):
+            series.full_clean()
+        series.count, series.until = None, date(2028, 7, 22)
+        with self.assertRaises(ValidationError):
+            series.full_clean()
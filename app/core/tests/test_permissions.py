@@ -0,0 +1,82 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core import permissions
+from core.models import Role
+from core.permissions import get_group_codenames
+
+
+def create_user(**params):
+    user_details = {
+        'email': 'test@example.com',
+        'password': 'testpass123',
+        'name': 'Test name',
+        'role': Role.objects.get(name='Doctor'),
+    }
+    user_details.update(params)
+
+    return get_user_model().objects.create_user(**user_details)
+
+
+class GroupCodenamesCacheTests(TestCase):
+    def setUp(self):
+        call_command('seeder')
+        self.user = create_user()
+
+    def test_codenames_loaded_from_groups(self):
+        codenames = get_group_codenames(self.user)
+
+        self.assertIn('view_patient', codenames)
+        self.assertIn('view_his_reservations', codenames)
+        self.assertNotIn('add_patient', codenames)
+
+    def test_codenames_cached_after_first_lookup(self):
+        get_group_codenames(self.user)
+
+        with self.assertNumQueries(0):
+            get_group_codenames(self.user)
+
+    def test_cache_invalidated_on_group_membership_change(self):
+        self.assertNotIn('add_patient', get_group_codenames(self.user))
+
+        self.user.groups.add(Group.objects.get(name='receptionist_group'))
+        self.assertIn('add_patient', get_group_codenames(self.user))
+
+        self.user.groups.clear()
+        self.assertEqual(get_group_codenames(self.user), frozenset())
+
+    def test_cache_invalidated_on_group_permission_change(self):
+        group = Group.objects.get(name='doctors_group')
+        permission = Permission.objects.get(codename='add_patient')
+        get_group_codenames(self.user)
+
+        group.permissions.add(permission)
+        self.assertIn('add_patient', get_group_codenames(self.user))
+
+        group.permissions.remove(permission)
+        self.assertNotIn('add_patient', get_group_codenames(self.user))
+
+    def test_cached_codenames_expire(self):
+        get_group_codenames(self.user)
+
+        # another process changed the groups, this one only finds out from the database
+        with override_settings(PERMISSION_CACHE_TTL=-1), self.assertNumQueries(1):
+            get_group_codenames(self.user)
+
+    def test_load_overlapping_invalidation_not_stored(self):
+        load = permissions._load_group_codenames
+
+        def load_then_invalidate(user):
+            codenames = load(user)
+            permissions.invalidate_user(user.pk)
+            return codenames
+
+        with mock.patch.object(permissions, '_load_group_codenames', load_then_invalidate):
+            get_group_codenames(self.user)
+
+        with self.assertNumQueries(1):
+            get_group_codenames(self.user)
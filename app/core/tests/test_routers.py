@@ -0,0 +1,92 @@
+import os
+import tempfile
+from datetime import date
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Patient, Reservation, Role, User
+from core.routers import REPLICA, use_replica
+
+PATIENT_URL = reverse('patient:patient-list')
+
+
+def create_patient(name, using='default'):
+    return Patient.objects.using(using).create(
+        name=name, relative='father', relative_name='relative', phone_number='0987654321',
+        birth_date=date(2015, 7, 23),
+    )
+
+
+class PrimaryReplicaRouterTests(TestCase):
+    """A second SQLite database stands in for the replica, so what is read from where tells them apart."""
+    # resolved when the class is set up, after the replica alias exists
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_path = tempfile.mktemp(suffix='.sqlite3')
+        connections.settings[REPLICA] = {**connections.settings['default'], 'NAME': cls.replica_path}
+        call_command('migrate', database=REPLICA, run_syncdb=True, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        os.remove(cls.replica_path)
+
+    def setUp(self):
+        call_command('seeder')
+        self.user = User.objects.create_user(
+            email='admin@example.com', password='testpass123', name='Admin', role=Role.objects.get(name='Admin')
+        )
+        self.client = APIClient()
+        # a real token, so authentication runs against the primary where the user exists
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        self.primary_patient = create_patient('on primary')
+        self.replica_patient = create_patient('on replica', using=REPLICA)
+
+    def test_list_and_retrieve_read_replica(self):
+        res = self.client.get(PATIENT_URL)
+        detail = self.client.get(reverse('patient:patient-detail', args=[self.replica_patient.id]))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['name'] for item in res.data['results']], ['on replica'])
+        self.assertEqual(detail.data['name'], 'on replica')
+
+    def test_writes_go_to_primary(self):
+        res = self.client.post(PATIENT_URL, {
+            'name': 'new patient', 'relative': 'father', 'relative_name': 'relative', 'phone_number': '0987654321',
+            'birth_date': '2015-07-23',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Patient.objects.using('default').filter(name='new patient').exists())
+        self.assertFalse(Patient.objects.using(REPLICA).filter(name='new patient').exists())
+
+    def test_reads_outside_read_actions_use_primary(self):
+        self.client.get(PATIENT_URL)
+
+        self.assertEqual(list(Patient.objects.values_list('name', flat=True)), ['on primary'])
+        with use_replica():
+            self.assertEqual(list(Patient.objects.values_list('name', flat=True)), ['on replica'])
+
+    def test_cached_reservation_list_built_from_primary(self):
+        cache.clear()
+        Reservation.objects.create(
+            patient=self.primary_patient, doctor=self.user, date=date(2024, 7, 23), time='10:00', description='checkup'
+        )
+        url = reverse('reservation:reservation-list')
+
+        self.assertEqual(self.client.get(url, {'date': '2024-07-23'}).data['results'], [])
+        with override_settings(RESERVATION_LIST_CACHE='default'):
+            self.assertEqual(len(self.client.get(url, {'date': '2024-07-23'}).data['results']), 1)
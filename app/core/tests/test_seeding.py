@@ -0,0 +1,109 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from core.models import Patient, Reservation, Role, RoleCode, User
+
+
+def seed(**options):
+    call_command('seeder', verbosity=0, **options)
+
+
+def reservation_rows():
+    return sorted(Reservation.objects.values_list(
+        'doctor__email', 'date', 'time', 'patient__name', 'patient__phone_number', 'description', 'requirements'
+    ))
+
+
+class SeederTests(TestCase):
+
+    def test_rerun_keeps_the_superuser(self):
+        seed()
+        seed()
+
+        self.assertEqual(User.objects.filter(email='superadmin123@example.com').count(), 1)
+
+    def test_roles_without_code_are_reused(self):
+        # as created by the seeder before roles had a code
+        doctor = Role.objects.create(name='Doctor')
+
+        seed()
+        seed()
+
+        self.assertEqual(Role.objects.filter(name='Doctor').count(), 1)
+        self.assertEqual(Role.objects.get(code=RoleCode.DOCTOR), doctor)
+        self.assertEqual(Role.objects.count(), 3)
+
+    def test_volumes(self):
+        seed(patients=250, doctors=3, reservations=400, days=10, batch_size=100)
+
+        doctors = User.objects.filter(role__name='Doctor')
+        self.assertEqual(doctors.count(), 3)
+        self.assertTrue(all(doctor.groups.filter(name='doctors_group').exists() for doctor in doctors))
+        self.assertTrue(doctors[0].check_password('goodpass123'))
+        self.assertEqual(Patient.objects.count(), 250)
+        self.assertEqual(Patient.objects.filter(search_name='').count(), 0)
+        self.assertEqual(Reservation.objects.count(), 400)
+        first_day = date.today() - timedelta(days=5)
+        self.assertEqual(Reservation.objects.filter(date__lt=first_day).count(), 0)
+        self.assertEqual(Reservation.objects.filter(date__gte=first_day + timedelta(days=10)).count(), 0)
+
+    def test_same_seed_same_data(self):
+        seed(patients=250, doctors=3, reservations=400, days=10, batch_size=100)
+        rows = reservation_rows()
+        Reservation.objects.all().delete()
+        Patient.objects.all().delete()
+        User.objects.filter(role__name='Doctor').delete()
+
+        seed(patients=250, doctors=3, reservations=400, days=10, batch_size=100)
+        self.assertEqual(reservation_rows(), rows)
+
+        Reservation.objects.all().delete()
+        seed(patients=250, doctors=3, reservations=400, days=10, batch_size=100, seed=1)
+        self.assertNotEqual(reservation_rows(), rows)
+
+    def test_rerun_adds_nothing(self):
+        seed(patients=250, doctors=3, reservations=400, days=10, batch_size=100)
+        rows = reservation_rows()
+
+        seed(patients=250, doctors=3, reservations=400, days=10, batch_size=100)
+
+        self.assertEqual(User.objects.filter(role__name='Doctor').count(), 3)
+        self.assertEqual(Patient.objects.count(), 250)
+        self.assertEqual(reservation_rows(), rows)
+
+    def test_start_date_anchors_the_window(self):
+        options = {'patients': 250, 'doctors': 3, 'reservations': 400, 'days': 10, 'start_date': date(2024, 7, 1)}
+        seed(**options)
+        rows = reservation_rows()
+
+        with mock.patch('core.seeding.date', wraps=date) as fake_date:
+            fake_date.today.return_value = date.today() + timedelta(days=3)
+            seed(**options)
+
+        self.assertEqual(reservation_rows(), rows)
+        self.assertEqual(min(row[1] for row in rows), date(2024, 7, 1))
+        self.assertEqual(max(row[1] for row in rows), date(2024, 7, 10))
+
+    def test_patients_topped_up_like_a_first_run(self):
+        def patients():
+            return list(Patient.objects.order_by('id').values_list('name', 'phone_number', 'birth_date'))
+
+        seed(patients=150, batch_size=100)
+        seed(patients=320, batch_size=100)
+        topped_up = patients()
+        Patient.objects.all().delete()
+
+        seed(patients=320, batch_size=100)
+
+        self.assertEqual(patients(), topped_up)
+
+    def test_more_reservations_than_slots(self):
+        with self.assertRaises(CommandError):
+            seed(patients=10, doctors=1, reservations=49, days=1)
+
+    def test_reservations_need_patients_and_doctors(self):
+        with self.assertRaises(CommandError):
+            seed(doctors=1, reservations=1)
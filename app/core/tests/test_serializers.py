@@ -0,0 +1,104 @@
+from datetime import date, time
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import ImportJob, Patient, Reservation, Role, User
+from core.renderers import FastJSONRenderer
+from core.serializers import values_serializer
+from patient.serializers import ImportJobSerializer, PatientDetailSerializer, PatientSerializer
+from reservation.serializers import ReservationDetailSerializer, ReservationSerializer
+from user.serializers import UserDetailSerializer, UserSerializer
+
+
+class ValuesSerializerTests(TestCase):
+    def setUp(self):
+        call_command('seeder')
+        self.doctor = User.objects.create_user(
+            email='doctor@example.com', password='testpass123', name='Dóctor \u2028 "quoted"',
+            role=Role.objects.get(name='Doctor'),
+        )
+        User.objects.create_user(
+            email='admin@example.com', password='testpass123', name='Admin', role=Role.objects.get(name='Admin'),
+            phone_number='1234567890',
+        )
+        patients = [
+            Patient.objects.create(name='patient name', relative='father', phone_number='0987654321',
+                                   birth_date=date(2015, 7, 23)),
+            Patient.objects.create(name='Ünïcode', phone_number='0987654321', birth_date=date(1990, 1, 1)),
+        ]
+        for hour, patient in enumerate(patients, start=9):
+            Reservation.objects.create(
+                patient=patient, doctor=self.doctor, date=date(2024, 7, 23), time=time(hour, 30, 15),
+                description='checkup', patient_reminder=time(8, 0) if hour == 9 else None,
+            )
+        ImportJob.objects.create(file_name='patients.ods', file_path='', finished_at=timezone.now())
+
+    def assertSameOutput(self, serializer_class, queryset, expand=(), context=()):
+        fast = values_serializer(serializer_class, expand)
+        expected = serializer_class(queryset, many=True, context=dict(context)).data
+
+        data = fast.serialize(fast.values(queryset))
+
+        self.assertEqual(JSONRenderer().render(data), JSONRenderer().render(expected))
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(expected))
+
+    def test_matches_model_serializers(self):
+        cases = [
+            (ReservationSerializer, Reservation.objects.order_by('id')),
+            (ReservationDetailSerializer, Reservation.objects.order_by('id')),
+            (PatientSerializer, Patient.objects.order_by('id')),
+            (PatientDetailSerializer, Patient.objects.order_by('id')),
+            (UserSerializer, User.objects.order_by('id')),
+            (UserDetailSerializer, User.objects.order_by('id')),
+            (ImportJobSerializer, ImportJob.objects.order_by('id')),
+        ]
+        for serializer_class, queryset in cases:
+            with self.subTest(serializer_class.__name__):
+                self.assertSameOutput(serializer_class, queryset)
+
+    def test_expand(self):
+        expanded = ReservationSerializer.EXPANDED_FIELDS
+        request = Request(APIRequestFactory().get('/', {'expand': 'patient,doctor'}))
+
+        self.assertSameOutput(
+            ReservationSerializer, Reservation.objects.select_related('patient', 'doctor').order_by('id'),
+            (('patient', expanded), ('doctor', expanded)), {'request': request},
+        )
+
+    def test_single_query(self):
+        fast = values_serializer(ReservationSerializer, (('patient', ReservationSerializer.EXPANDED_FIELDS),))
+
+        with self.assertNumQueries(1):
+            fast.serialize(fast.values(Reservation.objects.order_by('id')))
+
+    def test_keeps_ordering_columns(self):
+        fast = values_serializer(PatientSerializer)
+
+        rows = list(fast.values(Patient.objects.order_by('phone_number', 'id')))
+
+        self.assertIn('phone_number', rows[0])
+        self.assertNotIn('phone_number', fast.to_representation(rows[0]))
+
+
+class FastJSONRendererTests(TestCase):
+    def test_matches_json_renderer(self):
+        data = {
+            'text': 'é \u2028 \u2029 "quoted" </script>', 'none': None, 'bool': True, 'int': 2 ** 70,
+            'float': 1.5, 'nested': [{'date': date(2024, 7, 23)}, time(9, 30)],
+            'datetime': timezone.now(),
+        }
+
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indent_falls_back(self):
+        data = {'results': [1, 2]}
+
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4'),
+        )
@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+
+
+class SQLitePerformanceModeTests(SimpleTestCase):
+    def pragmas(self):
+        # a throwaway database, WAL would otherwise stick to the test database file
+        path = tempfile.mktemp(suffix='.sqlite3')
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': path}, alias='pragmas')
+        try:
+            with wrapper.cursor() as cursor:
+                values = {}
+                for name in ('journal_mode', 'synchronous', 'cache_size', 'busy_timeout'):
+                    cursor.execute(f'PRAGMA {name}')
+                    values[name] = cursor.fetchone()[0]
+                return values
+        finally:
+            wrapper.close()
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    @override_settings(SQLITE_PERFORMANCE_MODE=True)
+    def test_pragmas_applied_to_new_connections(self):
+        self.assertEqual(self.pragmas(), {
+            'journal_mode': 'wal', 'synchronous': 1, 'cache_size': -64 * 1024, 'busy_timeout': 5000,
+        })
+
+    @override_settings(SQLITE_PERFORMANCE_MODE=False)
+    def test_off_by_default(self):
+        self.assertEqual(self.pragmas()['journal_mode'], 'delete')
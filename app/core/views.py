@@ -1,3 +1,48 @@
-from django.shortcuts import render
+from django.conf import settings
+from rest_framework.response import Response
 
-# Create your views here.
+from core.routers import replica_reads
+from core.serializers import values_serializer
+
+
+class ValuesListMixin:
+    """
+    Serves the list action through core.serializers.ValuesSerializer instead of instantiating the
+    list serializer for every row. The response is the same, LIST_VALUES_SERIALIZERS = False turns it off.
+    """
+
+    def get_values_serializer(self):
+        return values_serializer(self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        if not settings.LIST_VALUES_SERIALIZERS:
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.get_values_serializer()
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
+
+
+class ReplicaReadMixin:
+    """
+    Runs the replica_actions against the read replica (core.routers.PrimaryReplicaRouter). Authentication
+    happens before and still reads the primary, so a token issued a moment ago is found.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions:
+            self._replica_token = replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # worker threads serve one request after another, the flag must not outlive this one
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            self._replica_token = None
+            replica_reads.reset(token)
+        return super().finalize_response(request, response, *args, **kwargs)
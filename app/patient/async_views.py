@@ -0,0 +1,26 @@
+from rest_framework.exceptions import NotFound
+
+from core.async_views import async_api_view, json_response
+from core.pagination import KeysetPagination
+from core.serializers import values_serializer
+from patient.serializers import PatientSerializer, PatientDetailSerializer
+from patient.views import PatientViewSet, _check_permissions, filter_patients
+
+
+@async_api_view
+async def patient_list(request):
+    _check_permissions(request, 'view_patient')
+    serializer = values_serializer(PatientSerializer)
+    paginator = KeysetPagination()
+    queryset = serializer.values(filter_patients(request, PatientViewSet.queryset))
+    page = await paginator.apaginate_queryset(queryset, request)
+    return json_response(paginator.get_paginated_response(serializer.serialize(page)).data)
+
+
+@async_api_view
+async def patient_detail(request, pk):
+    _check_permissions(request, 'view_patient')
+    patient = await PatientViewSet.queryset.filter(pk=pk).afirst()
+    if patient is None:
+        raise NotFound('No Patient matches the given query.')
+    return json_response(PatientDetailSerializer(patient).data)
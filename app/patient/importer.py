@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+from django.db import transaction
+
+from core.models import Patient
+from core.search import get_name_index, normalize_name
+
+BATCH_SIZE = 1000
+
+# spreadsheet header -> Patient field
+COLUMNS = {
+    'patient name': 'name',
+    'relative': 'relative',
+    'relative name': 'relative_name',
+    'phone number': 'phone_number',
+    'birth date': 'birth_date',
+}
+REQUIRED_COLUMNS = ['patient name', 'phone number', 'birth date']
+
+NAME_MAX_LENGTH = Patient._meta.get_field('name').max_length
+RELATIVE_MAX_LENGTH = Patient._meta.get_field('relative').max_length
+
+
+def _text_column(column):
+    text = column.astype('string').str.strip()
+    return text.replace('', pd.NA)
+
+
+def _phone_column(column):
+    # phone numbers typed as numbers come back as floats
+    return _text_column(column).str.replace(r'\.0$', '', regex=True)
+
+
+def prepare_frame(df):
+    df = df.rename(columns=lambda column: ' '.join(str(column).lower().split()))
+
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    for column in COLUMNS:
+        if column not in df.columns:
+            df[column] = pd.NA
+
+    frame = pd.DataFrame(index=df.index)
+    for column, field in COLUMNS.items():
+        if field == 'birth_date':
+            frame[field] = pd.to_datetime(df[column], errors='coerce')
+        elif field == 'phone_number':
+            frame[field] = _phone_column(df[column])
+        else:
+            frame[field] = _text_column(df[column])
+    return frame
+
+
+def find_rejections(frame, existing_names, seen_names=()):
+    name = frame['name']
+    phone = frame['phone_number'].fillna('')
+    relative_too_long = (
+        (frame['relative'].str.len() > RELATIVE_MAX_LENGTH).fillna(False)
+        | (frame['relative_name'].str.len() > RELATIVE_MAX_LENGTH).fillna(False)
+    )
+
+    # the first matching reason wins
+    conditions = [
+        name.isna(),
+        (name.str.len() > NAME_MAX_LENGTH).fillna(False),
+        ~(phone.str.isdigit() & (phone.str.len() >= 10)).fillna(False),
+        frame['birth_date'].isna(),
+        relative_too_long,
+        (name.duplicated(keep='first') | name.isin(seen_names)) & name.notna(),
+        name.isin(existing_names),
+    ]
+    reasons = [
+        'Missing patient name.',
+        f'Patient name is longer than {NAME_MAX_LENGTH} characters.',
+        'Please enter a valid phone number.',
+        'Missing or invalid birth date.',
+        f'Relative is longer than {RELATIVE_MAX_LENGTH} characters.',
+        'Duplicate patient name in file.',
+        'Patient already exists.',
+    ]
+    conditions = [np.asarray(condition, dtype=bool) for condition in conditions]
+    return pd.Series(np.select(conditions, reasons, default=''), index=frame.index)
+
+
+class PatientImporter:
+    """Imports a file fed chunk by chunk; the frame index of each chunk is its row offset in the file."""
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.seen_names = set()
+        self.rows_processed = 0
+        self.inserted = 0
+        self.rejected = []
+
+    def feed(self, df):
+        frame = prepare_frame(df)
+
+        # one query per chunk instead of one per row, memory stays flat whatever the size of the table
+        names = frame['name'].dropna().unique().tolist()
+        existing_names = set(Patient.objects.filter(name__in=names).values_list('name', flat=True))
+
+        rejections = find_rejections(frame, existing_names, self.seen_names)
+        accepted = frame[rejections == '']
+        rejected = rejections[rejections != '']
+
+        birth_dates = accepted['birth_date'].dt.date
+        accepted = accepted.astype(object).where(accepted.notna(), None)
+        accepted['birth_date'] = birth_dates
+
+        patients = [
+            Patient(
+                name=row.name,
+                search_name=normalize_name(row.name),
+                relative=row.relative,
+                relative_name=row.relative_name,
+                phone_number=row.phone_number,
+                birth_date=row.birth_date,
+            )
+            for row in accepted.itertuples(index=False)
+        ]
+
+        with transaction.atomic():
+            Patient.objects.bulk_create(patients, batch_size=self.batch_size)
+
+        self.seen_names.update(frame['name'].dropna())
+        self.rows_processed += len(frame)
+        self.inserted += len(patients)
+        # row numbers as shown in the spreadsheet, the header being row 1
+        self.rejected.extend({'row': int(index) + 2, 'reason': reason} for index, reason in rejected.items())
+
+    def finish(self):
+        get_name_index(Patient).reset()
+        return {
+            'inserted': self.inserted,
+            'rejected': self.rejected,
+        }
+
+
+def import_patients(df, batch_size=BATCH_SIZE):
+    importer = PatientImporter(batch_size)
+    importer.feed(df)
+    return importer.finish()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from core.models import ImportJob
+from patient.importer import PatientImporter
+from patient.readers import read_chunks
+
+# errors stored with the progress of a running job
+PROGRESS_ERRORS = 100
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMPORT_JOB_WORKERS, thread_name_prefix='patient-import'
+            )
+        return _executor
+
+
+def create_import_job(uploaded_file, user):
+    suffix = os.path.splitext(uploaded_file.name)[1]
+    fd, path = tempfile.mkstemp(prefix='patient-import-', suffix=suffix)
+    with os.fdopen(fd, 'wb') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+
+    return ImportJob.objects.create(created_by=user, file_name=uploaded_file.name, file_path=path)
+
+
+def submit_import_job(job):
+    if settings.IMPORT_JOBS_EAGER:
+        run_import_job(job.id)
+    else:
+        _get_executor().submit(_run_in_worker, job.id)
+
+
+def _run_in_worker(job_id):
+    close_old_connections()
+    try:
+        run_import_job(job_id)
+    finally:
+        connection.close()
+
+
+def run_import_job(job_id):
+    job = ImportJob.objects.get(id=job_id)
+    job.status = ImportJob.RUNNING
+    job.save(update_fields=['status'])
+
+    importer = PatientImporter()
+    try:
+        for chunk in read_chunks(job.file_path, settings.IMPORT_JOB_CHUNK_SIZE, job.file_name):
+            importer.feed(chunk)
+            job.rows_processed = importer.rows_processed
+            job.inserted = importer.inserted
+            job.skipped = len(importer.rejected)
+            update_fields = ['rows_processed', 'inserted', 'skipped']
+            # progress shows the first errors only, rewriting the whole list every chunk grows quadratically;
+            # the full list is written once the job ends
+            if len(job.errors) < PROGRESS_ERRORS:
+                job.errors = importer.rejected[:PROGRESS_ERRORS]
+                update_fields.append('errors')
+            job.save(update_fields=update_fields)
+
+        importer.finish()
+        job.status = ImportJob.COMPLETED
+    except Exception as e:
+        job.status = ImportJob.FAILED
+        job.message = str(e)
+    finally:
+        job.errors = importer.rejected
+        job.finished_at = timezone.now()
+        job.save()
+        if os.path.exists(job.file_path):
+            os.remove(job.file_path)
+
+    return job
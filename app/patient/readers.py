@@ -0,0 +1,98 @@
+import os
+import zipfile
+from datetime import date, datetime
+
+import pandas as pd
+from openpyxl import load_workbook
+
+CSV = 'csv'
+XLSX = 'xlsx'
+ODS = 'ods'
+
+EXTENSIONS = {
+    '.csv': CSV,
+    '.txt': CSV,
+    '.xlsx': XLSX,
+    '.xlsm': XLSX,
+    '.ods': ODS,
+}
+
+
+def detect_format(path, file_name=None):
+    extension = os.path.splitext(file_name or path)[1].lower()
+    if extension in EXTENSIONS:
+        return EXTENSIONS[extension]
+
+    # no usable extension: both spreadsheet formats are zip containers
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            names = archive.namelist()
+            if 'mimetype' in names and b'opendocument.spreadsheet' in archive.read('mimetype'):
+                return ODS
+            if '[Content_Types].xml' in names:
+                return XLSX
+        raise ValueError('Unsupported spreadsheet format.')
+    return CSV
+
+
+def _cell_text(value):
+    if value is None:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def read_csv_chunks(path, chunk_size):
+    # the chunk index keeps counting across chunks, so it stays the row offset in the file
+    yield from pd.read_csv(
+        path, dtype=str, chunksize=chunk_size, skipinitialspace=True, encoding='utf-8-sig'
+    )
+
+
+def read_xlsx_chunks(path, chunk_size):
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(column) if column is not None else '' for column in header]
+        width = len(columns)
+
+        batch = []
+        index = []
+        for position, row in enumerate(rows):
+            if all(value is None for value in row):
+                continue
+            values = [_cell_text(value) for value in row[:width]]
+            batch.append(values + [None] * (width - len(values)))
+            index.append(position)
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame(batch, columns=columns, index=index)
+                batch = []
+                index = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns, index=index)
+    finally:
+        workbook.close()
+
+
+def read_ods_chunks(path, chunk_size):
+    # odfpy has no streaming reader, the document is loaded once and then fed in chunks
+    df = pd.read_excel(path, engine='odf', dtype=str)
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+READERS = {
+    CSV: read_csv_chunks,
+    XLSX: read_xlsx_chunks,
+    ODS: read_ods_chunks,
+}
+
+
+def read_chunks(path, chunk_size, file_name=None):
+    return READERS[detect_format(path, file_name)](path, chunk_size)
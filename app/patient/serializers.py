@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from core.models import Patient
+from core.models import Patient, ImportJob
 
 
 class PatientSerializer(serializers.ModelSerializer):
@@ -26,3 +26,12 @@ class PatientDetailSerializer(PatientSerializer):
 class ImportPatientSerializer(serializers.Serializer):
     file = serializers.FileField()
 
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'file_name', 'status', 'rows_processed', 'inserted', 'skipped', 'errors', 'message',
+            'created_at', 'finished_at',
+        ]
+        read_only_fields = fields
@@ -1,19 +1,33 @@
+import json
+import os
+from base64 import b64encode
 from datetime import date
+from io import BytesIO
+from unittest.mock import patch
+
+import pandas as pd
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient
 
-from core.models import Role, Patient
+from core.models import Role, Patient, ImportJob
+from core.search import get_name_index
 
 from django.core.management import call_command
 
 from patient.serializers import PatientSerializer, PatientDetailSerializer
 
 PATIENT_URL = reverse('patient:patient-list')
+PATIENT_TYPEAHEAD_URL = reverse('patient:patient-typeahead')
+IMPORT_PATIENT_URL = reverse('patient:import-patient')
+PATIENT_ASYNC_URL = reverse('patient:patient-async-list')
 
 
 def patient_detail_url(patient_id):
@@ -34,6 +48,32 @@ def create_user(**params):
     return get_user_model().objects.create_user(**user_details)
 
 
+def import_job_url(job_id):
+    return reverse('patient:import-patient-job', args=[job_id])
+
+
+def create_ods_file(rows):
+    buffer = BytesIO()
+    pd.DataFrame(rows).to_excel(buffer, engine='odf', index=False)
+    buffer.seek(0)
+    buffer.name = 'patients.ods'
+    return buffer
+
+
+def create_xlsx_file(rows):
+    buffer = BytesIO()
+    pd.DataFrame(rows).to_excel(buffer, engine='openpyxl', index=False)
+    buffer.seek(0)
+    buffer.name = 'patients.xlsx'
+    return buffer
+
+
+def create_csv_file(content):
+    buffer = BytesIO(content.encode())
+    buffer.name = 'patients.csv'
+    return buffer
+
+
 def create_patient(**params):
     patient_details = {
         'name': 'patient name',
@@ -154,13 +194,60 @@ class PrivatePatientTest(TestCase):
 
         res = self.client.get(PATIENT_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 2)
+        self.assertEqual(len(res.data['results']), 2)
 
         serializer1 = PatientSerializer(patient1)
         serializer2 = PatientSerializer(patient2)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+
+    def test_page_through_all_patients(self):
+        Patient.objects.bulk_create([
+            Patient(name=f'Patient {i}', phone_number='0987654321', birth_date=date(2015, 7, 23))
+            for i in range(10000)
+        ])
+        expected_ids = list(Patient.objects.order_by('id').values_list('id', flat=True))
+
+        ids = []
+        pages = 0
+        res = self.client.get(PATIENT_URL, {'page_size': 1000})
+        while True:
+            pages += 1
+            ids.extend(patient['id'] for patient in res.data['results'])
+            if res.data['next'] is None:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(pages, 10)
+        self.assertEqual(ids, expected_ids)
+
+        previous = self.client.get(res.data['previous'])
+        self.assertEqual([patient['id'] for patient in previous.data['results']], expected_ids[8000:9000])
+
+    def test_patients_search_paginated_by_rank(self):
+        alice_smith = create_patient(name='Alice Smith')
+        alice_jones = create_patient(name='Alice Jones')
+        alice = create_patient(name='Alice')
+
+        res = self.client.get(PATIENT_URL, {'q': 'alice', 'page_size': 2})
+        self.assertEqual([patient['id'] for patient in res.data['results']], [alice.id, alice_smith.id])
+
+        res = self.client.get(res.data['next'])
+        self.assertEqual([patient['id'] for patient in res.data['results']], [alice_jones.id])
+        self.assertIsNone(res.data['next'])
+
+    def test_invalid_cursor(self):
+        res = self.client.get(PATIENT_URL, {'cursor': 'not a cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_wrong_value_types(self):
+        for position in (['abc'], [None], [[1]]):
+            cursor = b64encode(json.dumps({'p': position, 'r': 0}).encode()).decode()
+            res = self.client.get(PATIENT_URL, {'cursor': cursor})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_get_patients_based_on_name(self):
         create_patient(name='Alma')
@@ -169,7 +256,57 @@ class PrivatePatientTest(TestCase):
 
         res = self.client.get(PATIENT_URL, {'name': 'Al'})
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 2)
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_search_patients_exact_match_first(self):
+        alice_smith = create_patient(name='Alice Smith')
+        alice = create_patient(name='ALICE')
+        create_patient(name='Bob')
+
+        res = self.client.get(PATIENT_URL, {'q': 'alice'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([patient['id'] for patient in res.data['results']], [alice.id, alice_smith.id])
+
+    def test_search_patients_ignores_accents_and_spacing(self):
+        patient = create_patient(name='Zoë   Álvarez')
+
+        res = self.client.get(PATIENT_URL, {'q': 'zoe alv'})
+
+        self.assertEqual([p['id'] for p in res.data['results']], [patient.id])
+
+    def test_typeahead_from_database(self):
+        alma = create_patient(name='Alma')
+        create_patient(name='Bob')
+
+        res = self.client.get(PATIENT_TYPEAHEAD_URL, {'q': 'al'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{'id': alma.id, 'name': 'Alma'}])
+
+    @override_settings(NAME_SEARCH_TRIE=True)
+    def test_typeahead_from_trie_without_queries(self):
+        index = get_name_index(Patient)
+        index.reset()
+        self.addCleanup(index.reset)
+
+        alma = create_patient(name='Alma')
+        self.client.get(PATIENT_TYPEAHEAD_URL, {'q': 'al'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            al = create_patient(name='Al')
+            renamed = create_patient(name='Bob')
+            renamed.name = 'Albert'
+            renamed.save()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(PATIENT_TYPEAHEAD_URL, {'q': 'AL'})
+
+        self.assertEqual(res.data, [
+            {'id': al.id, 'name': 'Al'},
+            {'id': alma.id, 'name': 'Alma'},
+            {'id': renamed.id, 'name': 'Albert'},
+        ])
 
     def test_get_patient_details(self):
         patient = create_patient()
@@ -268,3 +405,211 @@ class PrivatePatientTest(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Patient.objects.all().count(), 0)
+
+    def _import(self, rows):
+        res = self.client.post(IMPORT_PATIENT_URL, {'file': create_ods_file(rows)}, format='multipart')
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        return self.client.get(import_job_url(res.data['job_id']))
+
+    @override_settings(IMPORT_JOBS_EAGER=True)
+    def test_import_patients_with_rejections(self):
+        create_patient(name='Existing')
+        rows = [
+            {'patient name': 'Alma', 'relative': 'mother', 'relative name': 'Rita',
+             'phone number': '0987654321', 'birth date': '2015-07-23'},
+            {'patient name': 'Existing', 'relative': None, 'relative name': None,
+             'phone number': '0987654321', 'birth date': '2015-07-23'},
+            {'patient name': 'Alma', 'relative': None, 'relative name': None,
+             'phone number': '0987654321', 'birth date': '2015-07-23'},
+            {'patient name': 'Bob', 'relative': None, 'relative name': None,
+             'phone number': '123', 'birth date': '2015-07-23'},
+            {'patient name': 'Carl', 'relative': None, 'relative name': None,
+             'phone number': '0987654321', 'birth date': 'not a date'},
+            {'patient name': None, 'relative': None, 'relative name': None,
+             'phone number': '0987654321', 'birth date': '2015-07-23'},
+        ]
+
+        res = self._import(rows)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], ImportJob.COMPLETED)
+        self.assertEqual(res.data['rows_processed'], 6)
+        self.assertEqual(res.data['inserted'], 1)
+        self.assertEqual(res.data['skipped'], 5)
+        self.assertEqual(res.data['errors'], [
+            {'row': 3, 'reason': 'Patient already exists.'},
+            {'row': 4, 'reason': 'Duplicate patient name in file.'},
+            {'row': 5, 'reason': 'Please enter a valid phone number.'},
+            {'row': 6, 'reason': 'Missing or invalid birth date.'},
+            {'row': 7, 'reason': 'Missing patient name.'},
+        ])
+
+        patient = Patient.objects.get(name='Alma')
+        self.assertEqual(patient.relative_name, 'Rita')
+        self.assertEqual(patient.phone_number, '0987654321')
+        self.assertEqual(patient.birth_date, date(2015, 7, 23))
+        self.assertEqual(patient.search_name, 'alma')
+
+    @override_settings(IMPORT_JOBS_EAGER=True, IMPORT_JOB_CHUNK_SIZE=2)
+    def test_import_patients_in_chunks(self):
+        rows = [
+            {'patient name': name, 'relative': None, 'relative name': None,
+             'phone number': '0987654321', 'birth date': '2015-07-23'}
+            for name in ['Alma', 'Bob', 'Carl', 'Alma', 'Dana']
+        ]
+
+        res = self._import(rows)
+
+        self.assertEqual(res.data['inserted'], 4)
+        self.assertEqual(res.data['errors'], [{'row': 5, 'reason': 'Duplicate patient name in file.'}])
+
+    @override_settings(IMPORT_JOBS_EAGER=True, IMPORT_JOB_CHUNK_SIZE=2)
+    def test_import_job_errors_written_in_full_at_the_end(self):
+        rows = [
+            {'patient name': name, 'relative': None, 'relative name': None,
+             'phone number': '123', 'birth date': '2015-07-23'}
+            for name in ['Alma', 'Bob', 'Carl', 'Dana', 'Emil']
+        ]
+
+        with patch('patient.jobs.PROGRESS_ERRORS', 1), CaptureQueriesContext(connection) as queries:
+            res = self._import(rows)
+
+        self.assertEqual(res.data['skipped'], 5)
+        self.assertEqual([error['row'] for error in res.data['errors']], [2, 3, 4, 5, 6])
+        job_updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "core_importjob"')]
+        self.assertEqual(sum('"errors"' in sql for sql in job_updates), 2)
+
+    @override_settings(IMPORT_JOBS_EAGER=True, IMPORT_JOB_CHUNK_SIZE=2)
+    def test_import_patients_from_csv(self):
+        upload = create_csv_file(
+            'patient name,relative,relative name,phone number,birth date\n'
+            'Alma,mother,Rita,0987654321,2015-07-23\n'
+            'Bob,,,0987654321,2001-01-02\n'
+            'Alma,,,0987654321,2015-07-23\n'
+        )
+
+        res = self.client.post(IMPORT_PATIENT_URL, {'file': upload}, format='multipart')
+        res = self.client.get(import_job_url(res.data['job_id']))
+
+        self.assertEqual(res.data['status'], ImportJob.COMPLETED)
+        self.assertEqual(res.data['inserted'], 2)
+        self.assertEqual(res.data['errors'], [{'row': 4, 'reason': 'Duplicate patient name in file.'}])
+        self.assertEqual(Patient.objects.get(name='Bob').birth_date, date(2001, 1, 2))
+
+    @override_settings(IMPORT_JOBS_EAGER=True, IMPORT_JOB_CHUNK_SIZE=2)
+    def test_import_patients_from_xlsx(self):
+        rows = [
+            {'patient name': 'Alma', 'relative': 'mother', 'relative name': 'Rita',
+             'phone number': '0987654321', 'birth date': date(2015, 7, 23)},
+            {'patient name': 'Bob', 'relative': None, 'relative name': None,
+             'phone number': 9876543210, 'birth date': date(2001, 1, 2)},
+            {'patient name': 'Carl', 'relative': None, 'relative name': None,
+             'phone number': '12', 'birth date': date(2001, 1, 2)},
+        ]
+
+        res = self.client.post(IMPORT_PATIENT_URL, {'file': create_xlsx_file(rows)}, format='multipart')
+        res = self.client.get(import_job_url(res.data['job_id']))
+
+        self.assertEqual(res.data['status'], ImportJob.COMPLETED)
+        self.assertEqual(res.data['inserted'], 2)
+        self.assertEqual(res.data['errors'], [{'row': 4, 'reason': 'Please enter a valid phone number.'}])
+        bob = Patient.objects.get(name='Bob')
+        self.assertEqual(bob.phone_number, '9876543210')
+        self.assertEqual(bob.birth_date, date(2001, 1, 2))
+        self.assertEqual(Patient.objects.get(name='Alma').relative_name, 'Rita')
+
+    @override_settings(IMPORT_JOBS_EAGER=True)
+    def test_import_keeps_decimal_suffix_outside_phone_numbers(self):
+        upload = create_csv_file(
+            'patient name,relative,relative name,phone number,birth date\n'
+            'Alma 2.0,,Rita 3.0,9876543210.0,2015-07-23\n'
+        )
+
+        self.client.post(IMPORT_PATIENT_URL, {'file': upload}, format='multipart')
+
+        patient = Patient.objects.get()
+        self.assertEqual(patient.name, 'Alma 2.0')
+        self.assertEqual(patient.relative_name, 'Rita 3.0')
+        self.assertEqual(patient.phone_number, '9876543210')
+
+    @override_settings(IMPORT_JOBS_EAGER=True)
+    def test_import_patients_queries_independent_of_row_count(self):
+        def import_queries(first, count):
+            rows = [
+                {'patient name': f'Patient {i}', 'relative': None, 'relative name': None,
+                 'phone number': '0987654321', 'birth date': '2015-07-23'}
+                for i in range(first, first + count)
+            ]
+            upload = create_ods_file(rows)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(IMPORT_PATIENT_URL, {'file': upload}, format='multipart')
+            return len(queries)
+
+        self.assertEqual(import_queries(0, 5), import_queries(5, 100))
+        self.assertEqual(Patient.objects.count(), 105)
+
+    @override_settings(IMPORT_JOBS_EAGER=True)
+    def test_import_patients_missing_columns(self):
+        res = self._import([{'patient name': 'Alma'}])
+
+        self.assertEqual(res.data['status'], ImportJob.FAILED)
+        self.assertIn('phone number', res.data['message'])
+        self.assertEqual(Patient.objects.count(), 0)
+
+    def test_import_job_started_in_background(self):
+        with patch('patient.views.submit_import_job') as submit:
+            res = self.client.post(IMPORT_PATIENT_URL, {'file': create_ods_file([])}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        job = ImportJob.objects.get(id=res.data['job_id'])
+        submit.assert_called_once_with(job)
+        self.assertEqual(job.status, ImportJob.PENDING)
+        os.remove(job.file_path)
+
+    def test_import_job_of_other_user_not_found(self):
+        other = create_user(email='other@example.com')
+        job = ImportJob.objects.create(created_by=other, file_name='patients.ods', file_path='')
+
+        res = self.client.get(import_job_url(job.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AsyncPatientTest(TestCase):
+    def setUp(self):
+        call_command('seeder')
+        self.client = APIClient()
+        self.user = create_user(email='admin@example.com', role=Role.objects.get(name='Admin'))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        self.patients = [create_patient(name=f'patient {index}') for index in range(5)]
+
+    def test_auth_required(self):
+        self.client.credentials()
+
+        res = self.client.get(PATIENT_ASYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_list_matches_sync_view(self):
+        for params in ({}, {'name': 'patient 3'}, {'page_size': 2}):
+            sync_response = self.client.get(PATIENT_URL, params)
+            async_response = self.client.get(PATIENT_ASYNC_URL, params)
+
+            self.assertEqual(async_response.status_code, status.HTTP_200_OK)
+            # page links point back at the endpoint they came from
+            self.assertEqual(async_response.content.replace(b'async/', b''), sync_response.content)
+
+    def test_detail_matches_sync_view(self):
+        for patient_id in (self.patients[0].id, 0):
+            sync_response = self.client.get(patient_detail_url(patient_id))
+            async_response = self.client.get(reverse('patient:patient-async-detail', args=[patient_id]))
+
+            self.assertEqual(async_response.status_code, sync_response.status_code)
+            self.assertEqual(async_response.content, sync_response.content)
+
+    def test_permission_denied(self):
+        self.user.groups.clear()
+
+        res = self.client.get(PATIENT_ASYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
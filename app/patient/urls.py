@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from patient import views
+from patient import async_views, views
 
 app_name = 'patient'
 
@@ -11,5 +11,8 @@ router.register('', views.PatientViewSet)
 
 urlpatterns = [
     path('import_patient/', views.ImportAPIView.as_view(), name='import-patient'),
+    path('import_patient/<int:job_id>/', views.ImportJobAPIView.as_view(), name='import-patient-job'),
+    path('async/', async_views.patient_list, name='patient-async-list'),
+    path('async/<int:pk>/', async_views.patient_detail, name='patient-async-detail'),
     path('', include(router.urls)),
 ]
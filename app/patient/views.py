@@ -1,27 +1,44 @@
-from django.contrib.auth.models import Permission
+from django.conf import settings
 from rest_framework import viewsets, permissions, status, generics
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 
-from patient.serializers import PatientSerializer, PatientDetailSerializer, ImportPatientSerializer
+from patient.jobs import create_import_job, submit_import_job
+from patient.serializers import (
+    PatientSerializer, PatientDetailSerializer, ImportPatientSerializer, ImportJobSerializer,
+)
 
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter, OpenApiTypes
 
-from core.models import Patient
+from core.authentication import CachedTokenAuthentication
+from core.models import Patient, ImportJob
+from core.permissions import has_permission
+from core.views import ReplicaReadMixin, ValuesListMixin
+from core.search import filter_by_name, get_name_index
 
-import pandas as pd
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 
 
 def _check_permissions(request, code_name):
-    user = request.user
-    permission = Permission.objects.get(codename=code_name)
-    if not user.groups.filter(permissions=permission).exists():
+    if not has_permission(request, code_name):
         raise permissions.exceptions.PermissionDenied(f"You do not have permission to {code_name}.")
 
 
+def filter_patients(request, queryset):
+    patient_name = request.query_params.get('name', None)
+    search = request.query_params.get('q', None)
+
+    if patient_name is not None:
+        queryset = queryset.filter(name__startswith=patient_name)
+
+    if search is not None:
+        queryset = filter_by_name(queryset, search)
+
+    return queryset
+
+
 @extend_schema_view(
     list=extend_schema(
         parameters=[
@@ -30,13 +47,27 @@ def _check_permissions(request, code_name):
                 OpenApiTypes.DATE,
                 description='Filter items by patient name.'
             ),
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description='Search patients by name prefix, exact matches first.'
+            ),
+        ]
+    ),
+    typeahead=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description='Patient name prefix.'
+            ),
         ]
     )
 )
-class PatientViewSet(viewsets.ModelViewSet):
+class PatientViewSet(ReplicaReadMixin, ValuesListMixin, viewsets.ModelViewSet):
     serializer_class = PatientDetailSerializer
     queryset = Patient.objects.all().order_by('id')
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_serializer_class(self):
@@ -60,14 +91,7 @@ class PatientViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         _check_permissions(self.request, 'view_patient')
         if self.action == 'list':
-            patient_name = self.request.query_params.get('name', None)
-
-            queryset = self.queryset
-
-            if patient_name is not None:
-                queryset = queryset.filter(name__startswith=patient_name)
-
-            return queryset
+            return filter_patients(self.request, self.queryset)
         return super().get_queryset()
 
     def get_object(self):
@@ -75,11 +99,19 @@ class PatientViewSet(viewsets.ModelViewSet):
         obj = super().get_object()
         return obj
 
+    @action(detail=False, methods=['get'])
+    def typeahead(self, request):
+        _check_permissions(request, 'view_patient')
+        matches = get_name_index(Patient).search(
+            request.query_params.get('q', ''), limit=settings.NAME_SEARCH_TYPEAHEAD_LIMIT
+        )
+        return Response([{'id': pk, 'name': name} for pk, name in matches])
+
 
 class ImportAPIView(APIView):
     serializer_class = ImportPatientSerializer
     parser_classes = (MultiPartParser, FormParser)
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def post(self, request):
@@ -92,36 +124,14 @@ class ImportAPIView(APIView):
                     'message': 'Provide a valid file'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            excel_file = data.get('file')
-            df = pd.read_excel(excel_file, engine='odf')
-
-            patients = []
-            for index, row in df.iterrows():
-                name = row['patient name']
-                relative = row['relative']
-                relative_name = row['relative name']
-                phone_number = row['phone number']
-                birth_date = row['birth date']
-
-                patient = Patient.objects.filter(name__exact=name)
-                if patient.exists():
-                    continue
-
-                patient = Patient(
-                    name=name,
-                    relative=relative,
-                    relative_name=relative_name,
-                    phone_number=phone_number,
-                    birth_date=birth_date,
-                )
+            job = create_import_job(data.get('file'), request.user)
+            submit_import_job(job)
 
-                patients.append(patient)
-
-            Patient.objects.bulk_create(patients)
             return Response({
                 'status': True,
-                'message': 'Successfully imported'
-            }, status=status.HTTP_201_CREATED)
+                'message': 'Import started',
+                'job_id': job.id,
+            }, status=status.HTTP_202_ACCEPTED)
 
         except Exception as e:
             return Response({
@@ -129,3 +139,13 @@ class ImportAPIView(APIView):
                 'message': 'Something went wrong',
                 'error': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ImportJobAPIView(generics.RetrieveAPIView):
+    serializer_class = ImportJobSerializer
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    lookup_url_kwarg = 'job_id'
+
+    def get_queryset(self):
+        return ImportJob.objects.filter(created_by=self.request.user)
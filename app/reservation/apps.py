@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ReservationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reservation'
+
+    def ready(self):
+        from reservation import cache  # noqa: F401 (connects its signal receivers)
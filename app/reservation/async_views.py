@@ -0,0 +1,94 @@
+import asyncio
+import json
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import permissions
+from rest_framework.exceptions import NotFound, ParseError
+
+from core.async_views import async_api_view, json_response
+from core.permissions import has_permission
+from core.pagination import KeysetPagination
+from reservation.availability import afind_availability
+from reservation.events import hub
+from reservation.serializers import ReservationDetailSerializer
+from reservation.views import (
+    ReservationViewSet, availability_query, check_detail_permission, check_view_permission, day_occurrences,
+    day_queryset, reservation_values_serializer, with_occurrences,
+)
+
+
+@async_api_view
+async def reservation_list(request):
+    check_view_permission(request)
+
+    serializer = reservation_values_serializer(request)
+    paginator = KeysetPagination()
+    queryset = serializer.values(day_queryset(request, ReservationViewSet.queryset))
+    page = await paginator.apaginate_queryset(queryset, request)
+    occurrences = await sync_to_async(day_occurrences)(request)
+    data = with_occurrences(paginator, serializer.serialize(page), occurrences, request)
+    return json_response(paginator.get_paginated_response(data).data)
+
+
+@async_api_view
+async def reservation_detail(request, pk):
+    check_view_permission(request)
+    check_detail_permission(request)
+    reservation = await ReservationViewSet.queryset.filter(pk=pk).afirst()
+    if reservation is None:
+        raise NotFound('No Reservation matches the given query.')
+    return json_response(ReservationDetailSerializer(reservation, context={'request': request}).data)
+
+
+@async_api_view
+async def availability(request):
+    # the role cache may have to load, which is synchronous
+    params, doctors = await sync_to_async(availability_query)(request)
+    doctor_ids = [doctor_id async for doctor_id in doctors]
+    return json_response(
+        await afind_availability(doctor_ids, params['date_from'], params['date_to'], params['duration'])
+    )
+
+
+async def _event_stream(day, doctor_id):
+    subscription = hub.subscribe(day, doctor_id)
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                event = await subscription.get(settings.RESERVATION_EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                # keeps proxies from closing an idle connection
+                yield ': keep-alive\n\n'
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+
+@async_api_view(query_token=True)
+async def reservation_events(request):
+    """
+    Server-sent events for the reservations of one day (?date=, default today), optionally of one doctor.
+
+    Meant to be served by an ASGI server, where each listener holds a connection but no worker thread.
+    """
+    check_view_permission(request)
+    try:
+        day = date.fromisoformat(request.query_params['date']) if 'date' in request.query_params else date.today()
+        doctor_id = int(request.query_params['doctor']) if 'doctor' in request.query_params else None
+    except ValueError:
+        raise ParseError('Invalid date or doctor.')
+
+    if has_permission(request, 'view_his_reservations'):
+        if doctor_id not in (None, request.user.id):
+            raise permissions.exceptions.PermissionDenied('You can only follow your own reservations.')
+        doctor_id = request.user.id
+
+    response = StreamingHttpResponse(_event_stream(day, doctor_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
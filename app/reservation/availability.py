@@ -0,0 +1,122 @@
+from collections import defaultdict
+from datetime import time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import CharField
+from django.db.models.functions import Cast
+
+from core.models import Reservation, WorkingHours
+from reservation.series import pending_occurrences
+from reservation.slots import from_seconds, to_seconds
+
+
+def _default_hours():
+    return {
+        weekday: [(to_seconds(time.fromisoformat(start)), to_seconds(time.fromisoformat(end)))
+                  for start, end in intervals]
+        for weekday, intervals in settings.DEFAULT_WORKING_HOURS.items()
+    }
+
+
+def free_intervals(working, busy, duration):
+    """
+    Sweeps sorted working intervals against sorted busy intervals (seconds since midnight)
+    and returns the gaps at least duration seconds long.
+    """
+    free = []
+    position = 0
+    for work_start, work_end in working:
+        cursor = work_start
+        # busy intervals that ended before this working interval are behind the sweep
+        while position < len(busy) and busy[position][1] <= work_start:
+            position += 1
+
+        index = position
+        while index < len(busy) and busy[index][0] < work_end:
+            busy_start, busy_end = busy[index]
+            if busy_start - cursor >= duration:
+                free.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+            index += 1
+
+        if work_end - cursor >= duration:
+            free.append((cursor, work_end))
+    return free
+
+
+def _queries(doctor_ids, date_from, date_to):
+    hours = WorkingHours.objects.filter(doctor_id__in=doctor_ids).order_by(
+        'doctor', 'weekday', 'start'
+    ).values_list('doctor_id', 'weekday', 'start', 'end')
+    # dates and times are read as ISO text, parsing them into objects costs more than the sweep itself
+    reservations = Reservation.objects.filter(
+        doctor_id__in=doctor_ids, date__range=(date_from, date_to)
+    ).order_by('doctor', 'date', 'time').values_list(
+        'doctor_id', Cast('date', CharField()), Cast('time', CharField()), 'duration'
+    )
+    return hours, reservations
+
+
+def _occurrence_rows(occurrences):
+    # series occurrences not stored yet, in the reservation rows' form
+    return [
+        (occurrence.doctor_id, occurrence.date.isoformat(), occurrence.time.isoformat(), occurrence.duration)
+        for occurrence in occurrences
+    ]
+
+
+def _slots(doctor_ids, date_from, date_to, duration, hour_rows, reservation_rows):
+    hours = defaultdict(lambda: defaultdict(list))
+    for doctor_id, weekday, start, end in hour_rows:
+        hours[doctor_id][weekday].append((to_seconds(start), to_seconds(end)))
+    default_hours = _default_hours()
+
+    busy = defaultdict(list)
+    for doctor_id, day, start, reservation_duration in reservation_rows:
+        start = int(start[:2]) * 3600 + int(start[3:5]) * 60 + int(start[6:8])
+        busy[doctor_id, day].append((start, start + reservation_duration * 60))
+    # rows come sorted, the occurrences after them are not
+    for intervals in busy.values():
+        intervals.sort()
+
+    days = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+    duration = duration * 60
+
+    slots = []
+    for doctor_id in doctor_ids:
+        doctor_hours = hours.get(doctor_id) or default_hours
+        for day in days:
+            working = doctor_hours.get(day.weekday())
+            if not working:
+                continue
+            day = day.isoformat()
+            for start, end in free_intervals(working, busy.get((doctor_id, day), []), duration):
+                slots.append({
+                    'doctor': doctor_id,
+                    'date': day,
+                    'start': from_seconds(start).isoformat(),
+                    'end': from_seconds(end).isoformat(),
+                })
+    return slots
+
+
+def find_availability(doctor_ids, date_from, date_to, duration):
+    """
+    Free slots per doctor and day, the same queries whatever the number of doctors or days:
+    working hours, reservations and the series occurrences not stored yet.
+    """
+    hours, reservations = _queries(doctor_ids, date_from, date_to)
+    occurrences = pending_occurrences(date_from, date_to, doctor_ids)
+    return _slots(
+        doctor_ids, date_from, date_to, duration, list(hours), list(reservations) + _occurrence_rows(occurrences)
+    )
+
+
+async def afind_availability(doctor_ids, date_from, date_to, duration):
+    hours, reservations = _queries(doctor_ids, date_from, date_to)
+    occurrences = await sync_to_async(pending_occurrences)(date_from, date_to, doctor_ids)
+    return _slots(
+        doctor_ids, date_from, date_to, duration,
+        [row async for row in hours], [row async for row in reservations] + _occurrence_rows(occurrences),
+    )
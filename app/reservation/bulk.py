@@ -0,0 +1,115 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from rest_framework import serializers
+
+from core.models import Patient, Reservation, RoleCode, User
+from core.roles import role_cache
+from reservation.reminders import rescheduled_reminders
+from reservation.series import delete_reservations
+from reservation.slots import (
+    CONFLICT_MESSAGE, PAST_MIDNIGHT_MESSAGE, ends_by_midnight, find_batch_conflicts, lock_doctors,
+)
+
+
+def _raise_if_any(errors):
+    if any(errors):
+        raise serializers.ValidationError(errors)
+
+
+def _check_references(items, errors):
+    """Checks every patient and doctor id of the batch with one query per model."""
+    patient_ids = {item['patient_id'] for item in items if 'patient_id' in item}
+    doctor_ids = {item['doctor_id'] for item in items if 'doctor_id' in item}
+    patients = set(Patient.objects.filter(id__in=patient_ids).values_list('id', flat=True)) if patient_ids else set()
+    doctor_roles = dict(User.objects.filter(id__in=doctor_ids).values_list('id', 'role_id')) if doctor_ids else {}
+
+    for item, error in zip(items, errors):
+        if 'patient_id' in item and item['patient_id'] not in patients:
+            error['patient'] = [f'Invalid pk "{item["patient_id"]}" - object does not exist.']
+        if 'doctor_id' in item:
+            if item['doctor_id'] not in doctor_roles:
+                error['doctor'] = [f'Invalid pk "{item["doctor_id"]}" - object does not exist.']
+            elif role_cache.code_for_role(doctor_roles[item['doctor_id']]) != RoleCode.DOCTOR:
+                error['doctor'] = ['Please enter a doctor id.']
+
+
+def _write_without_conflicts(reservations, write, exclude_ids=()):
+    _raise_if_any([
+        {} if ends_by_midnight(reservation.time, reservation.duration) else {'duration': [PAST_MIDNIGHT_MESSAGE]}
+        for reservation in reservations
+    ])
+    try:
+        with transaction.atomic():
+            doctor_ids = {reservation.doctor_id for reservation in reservations}
+            lock_doctors(doctor_ids)
+            conflicts = set(find_batch_conflicts([
+                (reservation.doctor_id, reservation.date, reservation.time, reservation.duration)
+                for reservation in reservations
+            ], exclude_ids))
+            _raise_if_any([{'time': [CONFLICT_MESSAGE]} if index in conflicts else {}
+                           for index in range(len(reservations))])
+            return write()
+    except IntegrityError:
+        raise serializers.ValidationError({'time': [CONFLICT_MESSAGE]})
+
+
+def bulk_create_reservations(items):
+    """Creates the validated reservations in one transaction, or none of them."""
+    errors = [{} for _ in items]
+    _check_references(items, errors)
+    _raise_if_any(errors)
+
+    reservations = [Reservation(**item) for item in items]
+    return _write_without_conflicts(reservations, lambda: Reservation.objects.bulk_create(reservations))
+
+
+def bulk_update_reservations(items):
+    """Applies the validated partial updates, each holding the reservation id, in one transaction."""
+    ids = [item['id'] for item in items]
+    with transaction.atomic():
+        # the rows are read under lock, so an update to one field does not write back stale values of the
+        # others over a concurrent change. Doctors first, the order single bookings lock in, and with one
+        # statement ahead of any read, see lock_doctors.
+        lock_doctors(User.objects.filter(
+            Q(id__in=Reservation.objects.filter(id__in=ids).values('doctor_id'))
+            | Q(id__in={item['doctor_id'] for item in items if 'doctor_id' in item})
+        ).values('id'))
+        reservations = Reservation.objects.select_for_update().in_bulk(ids)
+
+        errors = [{} for _ in items]
+        seen = set()
+        for item, error in zip(items, errors):
+            if item['id'] not in reservations:
+                error['id'] = [f'Invalid pk "{item["id"]}" - object does not exist.']
+            elif item['id'] in seen:
+                error['id'] = ['Duplicate reservation id.']
+            seen.add(item['id'])
+        _check_references(items, errors)
+        _raise_if_any(errors)
+
+        fields = set()
+        updated = []
+        for item in items:
+            reservation = reservations[item['id']]
+            changes = {field: value for field, value in item.items() if field != 'id'}
+            changes.update(rescheduled_reminders(reservation, changes))
+            for field, value in changes.items():
+                setattr(reservation, field, value)
+                fields.add(field)
+            updated.append(reservation)
+        if not fields:
+            return updated
+
+        def write():
+            Reservation.objects.bulk_update(updated, sorted(fields))
+            return updated
+
+        return _write_without_conflicts(updated, write, exclude_ids=ids)
+
+
+def bulk_delete_reservations(ids):
+    """Deletes the reservations and returns them, with just their id, date and doctor loaded."""
+    queryset = Reservation.objects.filter(id__in=ids)
+    deleted = list(queryset.only('id', 'date', 'doctor_id'))
+    delete_reservations(queryset)
+    return deleted
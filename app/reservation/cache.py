@@ -0,0 +1,95 @@
+import hashlib
+import json
+from functools import partial
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.checks import Tags, Warning, register
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Reservation
+from core.renderers import FastJSONRenderer
+
+ALL_DAYS = 'reservation-list:generation'
+
+
+def get_list_cache():
+    alias = settings.RESERVATION_LIST_CACHE
+    return caches[alias] if alias else None
+
+
+@register(Tags.caches, deploy=True)
+def check_list_cache(app_configs, **kwargs):
+    alias = settings.RESERVATION_LIST_CACHE
+    if alias and settings.CACHES.get(alias, {}).get('BACKEND', '').endswith('.LocMemCache'):
+        return [Warning(
+            f'RESERVATION_LIST_CACHE uses the per-process cache "{alias}".',
+            hint='With several worker processes, the others keep serving a changed day for up to '
+                 'RESERVATION_LIST_CACHE_TIMEOUT seconds. Set REDIS_URL, or RESERVATION_LIST_CACHE = None.',
+            id='reservation.W001',
+        )]
+    return []
+
+
+def _day_key(day):
+    return f'{ALL_DAYS}:{day.isoformat()}'
+
+
+def _generations(cache, day):
+    keys = [ALL_DAYS, _day_key(day)]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, uuid4().hex, None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def entry_key(cache, day, scope, url):
+    """
+    Cache key of one list response. Cached responses are never deleted, invalidation replaces the
+    generation tokens the key is built from, so stale entries are just never read again and expire.
+    """
+    all_days, this_day = _generations(cache, day)
+    return f'reservation-list:{all_days}:{this_day}:{scope}:{hashlib.md5(url.encode()).hexdigest()}'
+
+
+def make_entry(data):
+    content = FastJSONRenderer().render(data)
+    return {'etag': f'"{hashlib.md5(content).hexdigest()}"', 'data': json.loads(content)}
+
+
+def _replace(keys):
+    cache = get_list_cache()
+    if cache is not None:
+        cache.set_many({key: uuid4().hex for key in keys}, None)
+
+
+def _invalidate(keys):
+    _replace(keys)
+    # once more after commit, a concurrent read may have cached the old rows under the new generation meanwhile
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(partial(_replace, keys))
+
+
+def invalidate_dates(dates):
+    keys = {_day_key(day) for day in dates if day is not None}
+    if keys:
+        _invalidate(keys)
+
+
+def invalidate_all():
+    _invalidate([ALL_DAYS])
+
+
+# Every save and delete, from the API, the admin or a shell, invalidates its day. bulk_create and
+# bulk_update send no signals, their callers invalidate the dates themselves.
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def _reservation_changed(sender, instance, **kwargs):
+    # the day the reservation moves away from changes too, loaded_date is its date when read
+    invalidate_dates({instance.date, getattr(instance, 'loaded_date', None)})
+    instance.loaded_date = instance.date
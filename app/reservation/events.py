@@ -0,0 +1,112 @@
+import asyncio
+import threading
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+from reservation.serializers import ReservationSerializer
+
+CREATED = 'created'
+UPDATED = 'updated'
+DELETED = 'deleted'
+# sent when a listener should reload its whole schedule: a series changed, or it fell behind
+REFRESH = 'refresh'
+
+
+class Subscription:
+    def __init__(self, hub, loop, day=None, doctor_id=None):
+        self.hub = hub
+        self.loop = loop
+        self.day = day
+        self.doctor_id = doctor_id
+        self.queue = asyncio.Queue(maxsize=settings.RESERVATION_EVENTS_QUEUE_SIZE)
+
+    def matches(self, event):
+        if event['type'] == REFRESH:
+            return True
+        return (
+            (self.day is None or self.day in event['dates'])
+            and (self.doctor_id is None or self.doctor_id in event['doctors'])
+        )
+
+    def put(self, event):
+        # runs on the subscriber's event loop
+        if self.queue.full():
+            # a listener this far behind reloads rather than catching up event by event
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = {'type': REFRESH, 'data': {}}
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class EventHub:
+    """
+    In-process publish/subscribe for reservation changes.
+
+    Writers publish from any thread, each subscriber receives the events matching its date and doctor
+    on its own event loop. Only listeners connected to the same process see an event.
+    """
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, day=None, doctor_id=None, loop=None):
+        subscription = Subscription(self, loop or asyncio.get_running_loop(), day, doctor_id)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.matches(event):
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.put, event)
+                except RuntimeError:
+                    # the listener's loop is closed
+                    self.unsubscribe(subscription)
+
+
+hub = EventHub()
+
+
+def _event(event_type, data, dates, doctors):
+    return {'type': event_type, 'data': data, 'dates': set(dates), 'doctors': set(doctors)}
+
+
+def publish_changes(event_type, reservations, previous=()):
+    """
+    Publishes one event per reservation once the transaction commits. previous holds the
+    (date, doctor_id) each updated reservation had before, so listeners of its old day hear about it too.
+    """
+    events = []
+    for index, reservation in enumerate(reservations):
+        dates, doctors = {reservation.date}, {reservation.doctor_id}
+        if previous:
+            dates.add(previous[index][0])
+            doctors.add(previous[index][1])
+        if event_type == DELETED:
+            data = {'id': reservation.id, 'date': reservation.date.isoformat(), 'doctor': reservation.doctor_id}
+        else:
+            data = ReservationSerializer(reservation).data
+        events.append(_event(event_type, data, dates, doctors))
+    transaction.on_commit(partial(_publish_all, events))
+
+
+def publish_refresh():
+    transaction.on_commit(partial(hub.publish, {'type': REFRESH, 'data': {}}))
+
+
+def _publish_all(events):
+    for event in events:
+        hub.publish(event)
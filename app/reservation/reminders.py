@@ -0,0 +1,232 @@
+import heapq
+import logging
+import sys
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import Reservation, ReservationSeries
+from reservation.series import get_occurrence, pending_occurrences
+from reservation.slots import store_occurrences
+
+logger = logging.getLogger(__name__)
+
+PATIENT = 'patient'
+DOCTOR = 'doctor'
+KINDS = (PATIENT, DOCTOR)
+
+# locmem backend outbox, like django.core.mail.outbox
+outbox = []
+
+
+class Reminder(namedtuple('Reminder', [
+    'due', 'reservation_id', 'kind', 'date', 'at', 'time', 'patient_name', 'patient_phone', 'doctor_name',
+    'doctor_email', 'series_id',
+], defaults=(None,))):
+    # heap order, a series occurrence not stored yet has no reservation id to break ties with
+    def __lt__(self, other):
+        return self.due < other.due
+
+    @property
+    def recipient(self):
+        return self.patient_phone if self.kind == PATIENT else self.doctor_email
+
+    @property
+    def message(self):
+        return (
+            f'Reminder: {self.patient_name} has a reservation with {self.doctor_name} '
+            f'on {self.date.isoformat()} at {self.time.strftime("%H:%M")}.'
+        )
+
+
+class ConsoleBackend:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def format(self, reminder):
+        return f'[{reminder.kind} reminder] to {reminder.recipient}: {reminder.message}\n'
+
+    def send(self, reminder):
+        self.stream.write(self.format(reminder))
+        self.stream.flush()
+
+
+class FileBackend(ConsoleBackend):
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = path or settings.REMINDER_FILE_PATH
+
+    def send(self, reminder):
+        with open(self.path, 'a', encoding='utf-8') as stream:
+            stream.write(self.format(reminder))
+
+
+class LocmemBackend:
+    def send(self, reminder):
+        outbox.append(reminder)
+
+
+def get_backend(path=None):
+    return import_string(path or settings.REMINDER_BACKEND)()
+
+
+def due_at(day, at):
+    return timezone.make_aware(datetime.combine(day, at))
+
+
+def load_reminders(start, end):
+    """
+    Unsent reminders due in [start, end], one indexed range query per kind, plus those of the
+    series occurrences not stored yet, which are stored when their reminder is claimed.
+    """
+    first_day, last_day = timezone.localtime(start).date(), timezone.localtime(end).date()
+    occurrences = pending_occurrences(first_day, last_day)
+    reminders = []
+    for kind in KINDS:
+        field = f'{kind}_reminder'
+        rows = Reservation.objects.filter(
+            date__range=(first_day, last_day),
+            **{f'{field}__isnull': False, f'{field}_sent_at__isnull': True},
+        ).values_list(
+            'id', 'date', field, 'time', 'patient__name', 'patient__phone_number', 'doctor__name', 'doctor__email'
+        )
+        for reservation_id, day, at, *details in rows:
+            due = due_at(day, at)
+            if start <= due <= end:
+                reminders.append(Reminder(due, reservation_id, kind, day, at, *details))
+        for occurrence in occurrences:
+            at = getattr(occurrence, field)
+            if at is None:
+                continue
+            due = due_at(occurrence.date, at)
+            if start <= due <= end:
+                reminders.append(Reminder(
+                    due, None, kind, occurrence.date, at, occurrence.time, occurrence.patient.name,
+                    occurrence.patient.phone_number, occurrence.doctor.name, occurrence.doctor.email,
+                    occurrence.series_id,
+                ))
+    return reminders
+
+
+def rescheduled_reminders(instance, changes):
+    """The sent_at fields to clear because changes move the reservation's date or reminder times."""
+    return {
+        f'{kind}_reminder_sent_at': None
+        for kind in KINDS
+        if any(field in changes and changes[field] != getattr(instance, field)
+               for field in ('date', f'{kind}_reminder'))
+    }
+
+
+def claim(reminder, now):
+    """
+    Marks the reminder sent unless another scheduler got to it first, or the reservation
+    was rescheduled since it was loaded. Only the scheduler whose update matched sends it.
+    """
+    field = f'{reminder.kind}_reminder'
+    if reminder.reservation_id is None:
+        return _claim_occurrence(reminder, now)
+    return Reservation.objects.filter(
+        id=reminder.reservation_id,
+        date=reminder.date,
+        **{field: reminder.at, f'{field}_sent_at__isnull': True},
+    ).update(**{f'{field}_sent_at': now}) == 1
+
+
+def _claim_occurrence(reminder, now):
+    # storing the occurrence with its reminder sent is the claim, the (series, series_date) constraint
+    # lets only one scheduler do it
+    field = f'{reminder.kind}_reminder'
+    series = ReservationSeries.objects.filter(id=reminder.series_id).first()
+    occurrence = series and get_occurrence(series, reminder.date)
+    if occurrence is None or occurrence.pk is not None or getattr(occurrence, field) != reminder.at:
+        return False
+    setattr(occurrence, f'{field}_sent_at', now)
+    try:
+        conflicts = store_occurrences([occurrence])
+    except IntegrityError:
+        return False
+    if conflicts:
+        logger.warning('Series %s occurrence on %s overlaps another reservation, its reminders are not sent',
+                       reminder.series_id, reminder.date)
+        return False
+    return True
+
+
+def release(reminder, claimed_at):
+    field = f'{reminder.kind}_reminder'
+    if reminder.reservation_id is None:
+        rows = Reservation.objects.filter(series_id=reminder.series_id, series_date=reminder.date)
+    else:
+        rows = Reservation.objects.filter(id=reminder.reservation_id)
+    rows.filter(**{f'{field}_sent_at': claimed_at}).update(**{f'{field}_sent_at': None})
+
+
+class ReminderScheduler:
+    """
+    Keeps the reminders due in the next window on a min-heap and sleeps until the earliest one.
+
+    The window is reloaded when it runs out, which also picks up reminders created or moved
+    since the last load. Reminders missed by up to max_delay, e.g. while no scheduler ran, are sent late.
+    """
+
+    def __init__(self, backend=None, window=None, max_delay=None, clock=timezone.now, retry_delay=None):
+        self.backend = backend or get_backend()
+        self.window = timedelta(seconds=window or settings.REMINDER_WINDOW)
+        self.max_delay = timedelta(seconds=settings.REMINDER_MAX_DELAY if max_delay is None else max_delay)
+        self.retry_delay = settings.REMINDER_RETRY_DELAY if retry_delay is None else retry_delay
+        self.clock = clock
+        self.heap = []
+        self.loaded_until = None
+
+    def load(self, now):
+        self.loaded_until = now + self.window
+        self.heap = load_reminders(now - self.max_delay, self.loaded_until)
+        heapq.heapify(self.heap)
+
+    def run_pending(self, now=None):
+        now = now or self.clock()
+        if self.loaded_until is None or now >= self.loaded_until:
+            self.load(now)
+
+        sent = 0
+        while self.heap and self.heap[0].due <= now:
+            reminder = heapq.heappop(self.heap)
+            if not claim(reminder, now):
+                continue
+            try:
+                self.backend.send(reminder)
+            except Exception:
+                # give the reminder back so the next window load retries it
+                logger.exception('Sending %s reminder for reservation %s failed', reminder.kind,
+                                 reminder.reservation_id)
+                release(reminder, now)
+                continue
+            sent += 1
+        return sent
+
+    def next_wakeup(self, now):
+        wakeup = self.loaded_until
+        if self.heap and self.heap[0].due < wakeup:
+            wakeup = self.heap[0].due
+        return max((wakeup - now).total_seconds(), 0)
+
+    def run(self, stop=None):
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            # like at the start of a request: drops connections past CONN_MAX_AGE or broken while asleep
+            close_old_connections()
+            try:
+                self.run_pending()
+            except DatabaseError:
+                logger.exception('Reminder scheduler database error, retrying in %s seconds', self.retry_delay)
+                # claimed reminders are in the database, reloading the window picks up where this left off
+                self.loaded_until = None
+                stop.wait(self.retry_delay)
+                continue
+            stop.wait(self.next_wakeup(self.clock()))
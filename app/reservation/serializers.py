@@ -1,12 +1,44 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.utils.functional import cached_property
 from rest_framework import serializers
-from core.models import Reservation
+from core.models import MAX_RESERVATION_DURATION, Reservation, ReservationSeries, RoleCode
+from core.roles import role_cache
+from reservation.reminders import rescheduled_reminders
+from reservation.slots import (
+    CONFLICT_MESSAGE, PAST_MIDNIGHT_MESSAGE, ends_by_midnight, find_batch_conflicts, lock_doctors,
+    save_without_conflicts,
+)
 
 
 class ReservationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Reservation
-        fields = ['id', 'patient', 'doctor', 'description', 'date', 'time']
-        read_only_fields = ['id']
+        # series and series_date address an occurrence that is not stored yet, its id is null
+        fields = ['id', 'patient', 'doctor', 'description', 'date', 'time', 'duration', 'series', 'series_date']
+        read_only_fields = ['id', 'series']
+        # slot conflicts, including the unique (doctor, date, time) constraint, are checked on save
+        validators = []
+
+    EXPANDABLE_FIELDS = ('patient', 'doctor')
+    EXPANDED_FIELDS = ('id', 'name')
+
+    @cached_property
+    def expand(self):
+        # ?expand=patient,doctor embeds the related names, the viewset queryset select_related()s them
+        request = self.context.get('request')
+        if request is None:
+            return ()
+        requested = request.query_params.get('expand', '').split(',')
+        return [field for field in self.EXPANDABLE_FIELDS if field in requested]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        for field in self.expand:
+            related = getattr(instance, field)
+            data[field] = {name: getattr(related, name) for name in self.EXPANDED_FIELDS}
+        return data
 
 
 class ReservationDetailSerializer(ReservationSerializer):
@@ -15,10 +47,151 @@ class ReservationDetailSerializer(ReservationSerializer):
         extra_kwargs = {
             'patient_reminder': {'required': False},
             'doctor_reminder': {'required': False},
-            'requirements': {'required': False}
+            'requirements': {'required': False},
+            'duration': {'required': False},
         }
 
     def validate_doctor(self, value):
-        if not value.role.name == 'Doctor':
+        if not role_cache.code_for_role(value.role_id) == RoleCode.DOCTOR:
             raise serializers.ValidationError("Please enter a doctor id.")
         return value
+
+    def _save_slot(self, save, validated_data, instance=None):
+        def current(field):
+            return validated_data.get(field, getattr(instance, field, None))
+
+        return save_without_conflicts(
+            save,
+            doctor_id=current('doctor').id,
+            day=current('date'),
+            start=current('time'),
+            duration=current('duration') or Reservation._meta.get_field('duration').default,
+            exclude_id=getattr(instance, 'id', None),
+        )
+
+    def create(self, validated_data):
+        return self._save_slot(
+            lambda: super(ReservationDetailSerializer, self).create(validated_data), validated_data
+        )
+
+    def update(self, instance, validated_data):
+        validated_data.update(rescheduled_reminders(instance, validated_data))
+        return self._save_slot(
+            lambda: super(ReservationDetailSerializer, self).update(instance, validated_data), validated_data, instance
+        )
+
+
+class ReservationBulkSerializer(ReservationDetailSerializer):
+    # doctors and patients are looked up for the whole batch at once in reservation.bulk
+    patient = serializers.IntegerField(source='patient_id')
+    doctor = serializers.IntegerField(source='doctor_id')
+
+    def validate_doctor(self, value):
+        return value
+
+
+class ReservationBulkUpdateSerializer(ReservationBulkSerializer):
+    id = serializers.IntegerField()
+
+    def validate(self, attrs):
+        if 'id' not in attrs:
+            raise serializers.ValidationError({'id': 'This field is required.'})
+        return attrs
+
+
+class ReservationBulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=settings.RESERVATION_BULK_MAX_ITEMS
+    )
+
+
+class ReservationSeriesSerializer(serializers.ModelSerializer):
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6), allow_empty=False, max_length=7
+    )
+
+    class Meta:
+        model = ReservationSeries
+        fields = [
+            'id', 'patient', 'doctor', 'description', 'requirements', 'patient_reminder', 'doctor_reminder',
+            'time', 'duration', 'weekdays', 'start_date', 'count', 'until', 'end_date', 'cancelled_dates',
+        ]
+        read_only_fields = ['id', 'end_date', 'cancelled_dates']
+        extra_kwargs = {
+            'patient_reminder': {'required': False},
+            'doctor_reminder': {'required': False},
+            'requirements': {'required': False},
+            'duration': {'required': False},
+            'count': {'min_value': 1},
+        }
+
+    def validate_doctor(self, value):
+        if not role_cache.code_for_role(value.role_id) == RoleCode.DOCTOR:
+            raise serializers.ValidationError("Please enter a doctor id.")
+        return value
+
+    def validate_weekdays(self, value):
+        return sorted(set(value))
+
+    def validate(self, attrs):
+        if (attrs.get('count') is None) == (attrs.get('until') is None):
+            raise serializers.ValidationError({'count': 'Set either count or until.'})
+        duration = attrs.get('duration') or ReservationSeries._meta.get_field('duration').default
+        if not ends_by_midnight(attrs['time'], duration):
+            raise serializers.ValidationError({'duration': PAST_MIDNIGHT_MESSAGE})
+
+        series = ReservationSeries(**attrs)
+        try:
+            # the occurrence cap, which the admin enforces too
+            series.clean()
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.message_dict)
+        if next(series.occurrence_dates(), None) is None:
+            raise serializers.ValidationError({'until': 'The series has no occurrences.'})
+        return attrs
+
+    def create(self, validated_data):
+        series = ReservationSeries(**validated_data)
+        days = list(series.occurrence_dates())
+        with transaction.atomic():
+            # the doctor's other series are checked too, stored or not
+            lock_doctors([series.doctor_id])
+            conflicts = find_batch_conflicts([(series.doctor_id, day, series.time, series.duration) for day in days])
+            if conflicts:
+                taken = ', '.join(days[index].isoformat() for index in conflicts)
+                raise serializers.ValidationError({'time': f'{CONFLICT_MESSAGE} ({taken})'})
+            series.save()
+        return series
+
+
+class DateWindowSerializer(serializers.Serializer):
+    date_from = serializers.DateField(source='date_from')
+    date_to = serializers.DateField(source='date_to', required=False)
+
+    def get_fields(self):
+        # "from" and "to" are keywords, so they are declared under other names
+        fields = super().get_fields()
+        fields['from'] = fields.pop('date_from')
+        fields['to'] = fields.pop('date_to')
+        return fields
+
+    def validate(self, attrs):
+        attrs.setdefault('date_to', attrs['date_from'])
+        days = (attrs['date_to'] - attrs['date_from']).days
+        if days < 0:
+            raise serializers.ValidationError({'to': '"to" must not be before "from".'})
+        if days >= settings.AVAILABILITY_MAX_DAYS:
+            raise serializers.ValidationError({'to': f'At most {settings.AVAILABILITY_MAX_DAYS} days at a time.'})
+        return attrs
+
+
+class AvailabilityQuerySerializer(DateWindowSerializer):
+    doctor = serializers.IntegerField(required=False)
+    duration = serializers.IntegerField(min_value=1, max_value=MAX_RESERVATION_DURATION, default=30)
+
+
+class AvailabilitySlotSerializer(serializers.Serializer):
+    doctor = serializers.IntegerField()
+    date = serializers.DateField()
+    start = serializers.TimeField()
+    end = serializers.TimeField()
@@ -0,0 +1,75 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from core.models import Reservation, ReservationSeries
+from reservation.cache import invalidate_dates
+
+
+def pending_occurrences(date_from, date_to, doctor_ids=None, series_ids=None):
+    """
+    The series occurrences in [date_from, date_to] that have no reservation row yet, as unsaved
+    reservations ordered by date and time.
+
+    Occurrences are computed whenever a window is read and only stored once one is edited, so reads
+    write nothing. A stored occurrence keeps its original date in series_date, wherever it was moved.
+    """
+    series_list = ReservationSeries.objects.select_related('patient', 'doctor').filter(
+        start_date__lte=date_to, end_date__gte=date_from
+    )
+    if doctor_ids is not None:
+        series_list = series_list.filter(doctor_id__in=doctor_ids)
+    if series_ids is not None:
+        series_list = series_list.filter(id__in=series_ids)
+    series_list = list(series_list)
+    if not series_list:
+        return []
+
+    stored = set(Reservation.objects.filter(
+        series__in=series_list, series_date__range=(date_from, date_to)
+    ).values_list('series_id', 'series_date'))
+    occurrences = []
+    for series in series_list:
+        cancelled = set(series.cancelled_dates)
+        for day in series.occurrence_dates(date_from, date_to):
+            if day.isoformat() not in cancelled and (series.id, day) not in stored:
+                occurrences.append(series.build_occurrence(day))
+    occurrences.sort(key=lambda occurrence: (occurrence.date, occurrence.time))
+    return occurrences
+
+
+def get_occurrence(series, day):
+    """The occurrence of the series originally on day, its row if it was stored, None if there is none."""
+    stored = series.occurrences.filter(series_date=day).first()
+    if stored is not None:
+        return stored
+    if day.isoformat() in series.cancelled_dates or day not in series.occurrence_dates(day, day):
+        return None
+    return series.build_occurrence(day)
+
+
+def cancel_occurrence(occurrence):
+    """Cancels a series occurrence, stored or not, so it is not shown again."""
+    if occurrence.pk is not None:
+        delete_reservations(Reservation.objects.filter(pk=occurrence.pk))
+        return
+    with transaction.atomic():
+        series = ReservationSeries.objects.select_for_update().get(pk=occurrence.series_id)
+        series.cancelled_dates = sorted({*series.cancelled_dates, occurrence.series_date.isoformat()})
+        series.save(update_fields=['cancelled_dates', 'end_date'])
+    # no reservation row changed, which is what invalidates the day otherwise
+    invalidate_dates({occurrence.date})
+
+
+def delete_reservations(queryset):
+    """Deletes reservations, cancelling the series occurrences among them so they are not shown again."""
+    with transaction.atomic():
+        cancelled = defaultdict(set)
+        for series_id, series_date in queryset.filter(series__isnull=False).values_list('series_id', 'series_date'):
+            cancelled[series_id].add(series_date.isoformat())
+
+        for series in ReservationSeries.objects.select_for_update().filter(id__in=cancelled):
+            series.cancelled_dates = sorted(set(series.cancelled_dates) | cancelled[series.id])
+            series.save(update_fields=['cancelled_dates', 'end_date'])
+
+        return queryset.delete()[0]
@@ -0,0 +1,144 @@
+from collections import defaultdict
+from datetime import time
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F
+from rest_framework import serializers
+
+from core.models import MAX_RESERVATION_DURATION, Reservation, User
+from reservation.cache import invalidate_dates
+from reservation.series import pending_occurrences
+
+DAY_SECONDS = 24 * 60 * 60
+CONFLICT_MESSAGE = 'The doctor already has a reservation at this time.'
+# conflicts are only looked up on the reservation's own day
+PAST_MIDNIGHT_MESSAGE = 'The reservation must end by midnight.'
+
+
+def to_seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def from_seconds(seconds):
+    return time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def ends_by_midnight(start, duration):
+    return to_seconds(start) + duration * 60 <= DAY_SECONDS
+
+
+def find_conflicts(doctor_id, day, start, duration, exclude_id=None):
+    """
+    Ids of the doctor's reservations overlapping [start, start + duration) on day, None for the
+    series occurrences that are not stored yet, which hold their slots all the same.
+    """
+    start = to_seconds(start)
+    end = start + duration * 60
+
+    # any overlapping reservation starts less than MAX_RESERVATION_DURATION before this one,
+    # which keeps the lookup one (date, doctor, time) index range
+    queryset = Reservation.objects.filter(doctor_id=doctor_id, date=day)
+    earliest = start - MAX_RESERVATION_DURATION * 60
+    if earliest >= 0:
+        queryset = queryset.filter(time__gt=from_seconds(earliest))
+    if end < DAY_SECONDS:
+        queryset = queryset.filter(time__lt=from_seconds(end))
+    if exclude_id is not None:
+        queryset = queryset.exclude(id=exclude_id)
+
+    booked = list(queryset.values_list('id', 'time', 'duration'))
+    booked += [
+        (None, occurrence.time, occurrence.duration) for occurrence in pending_occurrences(day, day, [doctor_id])
+    ]
+    return [
+        reservation_id
+        for reservation_id, other_time, other_duration in booked
+        if to_seconds(other_time) < end and to_seconds(other_time) + other_duration * 60 > start
+    ]
+
+
+def find_batch_conflicts(slots, exclude_ids=(), exclude_occurrences=()):
+    """
+    Indexes of the (doctor_id, day, start, duration) slots that overlap an existing reservation, a series
+    occurrence not stored yet or an earlier slot of the same batch, with the same queries for the whole batch.
+    exclude_occurrences are occurrences being stored, which must not conflict with themselves.
+    """
+    doctor_ids = {slot[0] for slot in slots}
+    days = {slot[1] for slot in slots}
+    existing = list(Reservation.objects.filter(
+        doctor_id__in=doctor_ids, date__in=days,
+    ).exclude(id__in=exclude_ids).values_list('doctor_id', 'date', 'time', 'duration'))
+    excluded = {(occurrence.series_id, occurrence.series_date) for occurrence in exclude_occurrences}
+    existing += [
+        (occurrence.doctor_id, occurrence.date, occurrence.time, occurrence.duration)
+        for occurrence in pending_occurrences(min(days), max(days), doctor_ids)
+        if occurrence.date in days and (occurrence.series_id, occurrence.series_date) not in excluded
+    ]
+
+    booked = defaultdict(list)
+    for doctor_id, day, start, duration in existing:
+        start = to_seconds(start)
+        booked[doctor_id, day].append((start, start + duration * 60))
+
+    conflicts = []
+    for index, (doctor_id, day, start, duration) in enumerate(slots):
+        start = to_seconds(start)
+        end = start + duration * 60
+        intervals = booked[doctor_id, day]
+        if any(other_start < end and start < other_end for other_start, other_end in intervals):
+            conflicts.append(index)
+        else:
+            intervals.append((start, end))
+    return conflicts
+
+
+def lock_doctors(doctor_ids):
+    """
+    Locks the doctors' rows until the transaction ends, which serializes their bookings. SQLite has no row
+    locks: a write that changes nothing takes its database write lock instead. It has to be the transaction's
+    first statement there, SQLite refuses the write lock to a transaction that has read while another writes.
+    """
+    doctors = User.objects.filter(id__in=doctor_ids)
+    if connections[router.db_for_write(User)].vendor == 'sqlite':
+        doctors.update(is_active=F('is_active'))
+    else:
+        list(doctors.select_for_update().values_list('id'))
+
+
+def save_without_conflicts(save, doctor_id, day, start, duration, exclude_id=None):
+    """
+    Runs save() only if the slot is free, atomically with the check.
+
+    Locking the doctor row serializes bookings per doctor, on SQLite all writers. The unique
+    constraint on (doctor, date, time) backs it up.
+    """
+    if not ends_by_midnight(start, duration):
+        raise serializers.ValidationError({'duration': PAST_MIDNIGHT_MESSAGE})
+    try:
+        with transaction.atomic():
+            lock_doctors([doctor_id])
+            if find_conflicts(doctor_id, day, start, duration, exclude_id):
+                raise serializers.ValidationError({'time': CONFLICT_MESSAGE})
+            return save()
+    except IntegrityError:
+        raise serializers.ValidationError({'time': CONFLICT_MESSAGE})
+
+
+def store_occurrences(occurrences):
+    """
+    Stores the series occurrences whose slots are free and returns the others, which overlap a reservation
+    and are left out. Occurrences are only stored on write paths, so reads stay read-only.
+    """
+    if not occurrences:
+        return []
+    with transaction.atomic():
+        lock_doctors({occurrence.doctor_id for occurrence in occurrences})
+        conflicts = set(find_batch_conflicts([
+            (occurrence.doctor_id, occurrence.date, occurrence.time, occurrence.duration)
+            for occurrence in occurrences
+        ], exclude_occurrences=occurrences))
+        Reservation.objects.bulk_create(
+            [occurrence for index, occurrence in enumerate(occurrences) if index not in conflicts]
+        )
+    invalidate_dates({occurrence.date for occurrence in occurrences})
+    return [occurrences[index] for index in sorted(conflicts)]
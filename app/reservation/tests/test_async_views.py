@@ -0,0 +1,115 @@
+from datetime import date, time
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Patient, Reservation, Role, User
+
+
+class AsyncReservationViewsTests(TestCase):
+    def setUp(self):
+        call_command('seeder')
+        cache.clear()
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='testpass123', name='Admin', role=Role.objects.get(name='Admin')
+        )
+        self.doctor = User.objects.create_user(
+            email='doctor@example.com', password='testpass123', name='Doctor', role=Role.objects.get(name='Doctor')
+        )
+        patient = Patient.objects.create(
+            name='patient name', relative='father', relative_name='relative', phone_number='0987654321',
+            birth_date=date(2015, 7, 23),
+        )
+        self.reservations = [
+            Reservation.objects.create(
+                patient=patient, doctor=self.doctor, date=date(2024, 7, 23), time=time(hour, 0), description='checkup'
+            )
+            for hour in range(9, 14)
+        ]
+        self.token = Token.objects.create(user=self.admin).key
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def assertSameResponse(self, sync_url, async_url, params=None):
+        sync_response = self.client.get(sync_url, params)
+        async_response = self.client.get(async_url, params)
+
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.content, sync_response.content)
+        return async_response
+
+    def test_list_matches_sync_view(self):
+        res = self.assertSameResponse(
+            reverse('reservation:reservation-list'), reverse('reservation:reservation-async-list'),
+            {'date': '2024-07-23', 'expand': 'patient,doctor'},
+        )
+
+        self.assertEqual(len(res.json()['results']), 5)
+
+    def test_list_pages(self):
+        first = self.client.get(reverse('reservation:reservation-async-list'), {'date': '2024-07-23', 'page_size': 2})
+        second = self.client.get(first.json()['next'])
+
+        self.assertEqual([item['id'] for item in first.json()['results'] + second.json()['results']],
+                         [reservation.id for reservation in self.reservations[:4]])
+
+    def test_detail_matches_sync_view(self):
+        reservation_id = self.reservations[0].id
+
+        self.assertSameResponse(
+            reverse('reservation:reservation-detail', args=[reservation_id]),
+            reverse('reservation:reservation-async-detail', args=[reservation_id]),
+        )
+        self.assertSameResponse(
+            reverse('reservation:reservation-detail', args=[0]),
+            reverse('reservation:reservation-async-detail', args=[0]),
+        )
+
+    def test_availability_matches_sync_view(self):
+        self.assertSameResponse(
+            reverse('reservation:reservation-availability'), reverse('reservation:reservation-async-availability'),
+            {'from': '2024-07-22', 'to': '2024-07-26'},
+        )
+        self.assertSameResponse(
+            reverse('reservation:reservation-availability'), reverse('reservation:reservation-async-availability'),
+            {'from': '2024-07-26', 'to': '2024-07-22'},
+        )
+
+    def test_permissions(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.doctor).key}')
+
+        self.assertSameResponse(
+            reverse('reservation:reservation-list'), reverse('reservation:reservation-async-list'),
+            {'date': '2024-07-23'},
+        )
+        self.assertSameResponse(
+            reverse('reservation:reservation-detail', args=[self.reservations[0].id]),
+            reverse('reservation:reservation-async-detail', args=[self.reservations[0].id]),
+        )
+
+    def test_authentication_required(self):
+        self.client.credentials()
+
+        res = self.client.get(reverse('reservation:reservation-async-list'))
+
+        self.assertEqual(res.status_code, 401)
+
+    def test_query_string_token_only_for_events(self):
+        self.client.credentials()
+
+        res = self.client.get(reverse('reservation:reservation-async-list'), {'token': self.token})
+
+        self.assertEqual(res.status_code, 401)
+
+    async def test_async_client(self):
+        res = await self.async_client.get(
+            reverse('reservation:reservation-async-list'), {'date': '2024-07-23'},
+            headers={'Authorization': f'Token {self.token}'},
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.json()['results']), 5)
@@ -0,0 +1,152 @@
+import asyncio
+from datetime import date
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Patient, Role, User
+from reservation.events import REFRESH, hub
+
+EVENTS_URL = reverse('reservation:reservation-events')
+RESERVATION_URL = reverse('reservation:reservation-list')
+
+
+class ReservationEventsTests(TestCase):
+    def setUp(self):
+        call_command('seeder')
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='testpass123', name='Admin', role=Role.objects.get(name='Admin')
+        )
+        self.doctor = User.objects.create_user(
+            email='doctor@example.com', password='testpass123', name='Doctor', role=Role.objects.get(name='Doctor')
+        )
+        self.patient = Patient.objects.create(
+            name='patient name', relative='father', relative_name='relative', phone_number='0987654321',
+            birth_date=date(2015, 7, 23),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.loop = asyncio.new_event_loop()
+        self.subscriptions = []
+
+    def tearDown(self):
+        for subscription in self.subscriptions:
+            hub.unsubscribe(subscription)
+        self.loop.close()
+
+    def subscribe(self, **params):
+        subscription = hub.subscribe(loop=self.loop, **params)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def received(self, subscription):
+        # delivery goes through the subscriber's loop
+        self.loop.run_until_complete(asyncio.sleep(0))
+        events = []
+        while not subscription.queue.empty():
+            events.append(subscription.queue.get_nowait())
+        return events
+
+    def book(self, **params):
+        payload = {
+            'patient': self.patient.id, 'doctor': self.doctor.id, 'date': '2024-07-23', 'time': '10:00',
+            'description': 'checkup',
+        }
+        payload.update(params)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(RESERVATION_URL, payload).data
+
+    def test_writes_are_published_by_day_and_doctor(self):
+        same_day = self.subscribe(day=date(2024, 7, 23))
+        same_doctor = self.subscribe(day=date(2024, 7, 23), doctor_id=self.doctor.id)
+        other_doctor = self.subscribe(day=date(2024, 7, 23), doctor_id=self.admin.id)
+        other_day = self.subscribe(day=date(2024, 7, 24))
+
+        reservation = self.book()
+
+        self.assertEqual([(event['type'], event['data']['id']) for event in self.received(same_day)],
+                         [('created', reservation['id'])])
+        self.assertEqual(len(self.received(same_doctor)), 1)
+        self.assertEqual(self.received(other_doctor), [])
+        self.assertEqual(self.received(other_day), [])
+
+    def test_moved_reservation_reaches_both_days(self):
+        reservation = self.book()
+        old_day = self.subscribe(day=date(2024, 7, 23))
+        new_day = self.subscribe(day=date(2024, 7, 24))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('reservation:reservation-detail', args=[reservation['id']]),
+                              {'date': '2024-07-24'})
+
+        self.assertEqual([event['data']['date'] for event in self.received(old_day)], ['2024-07-24'])
+        self.assertEqual(len(self.received(new_day)), 1)
+
+    def test_delete_is_published(self):
+        reservation = self.book()
+        subscription = self.subscribe(day=date(2024, 7, 23))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('reservation:reservation-detail', args=[reservation['id']]))
+
+        self.assertEqual([(event['type'], event['data']['id']) for event in self.received(subscription)],
+                         [('deleted', reservation['id'])])
+
+    @override_settings(RESERVATION_EVENTS_QUEUE_SIZE=2)
+    def test_slow_listener_is_told_to_refresh(self):
+        subscription = self.subscribe(day=date(2024, 7, 23))
+
+        for hour in (9, 10, 11):
+            self.book(time=f'{hour}:00')
+
+        self.assertEqual([event['type'] for event in self.received(subscription)], [REFRESH])
+
+
+class ReservationEventStreamTests(TestCase):
+    def setUp(self):
+        call_command('seeder')
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='testpass123', name='Admin', role=Role.objects.get(name='Admin')
+        )
+        self.doctor = User.objects.create_user(
+            email='doctor@example.com', password='testpass123', name='Doctor', role=Role.objects.get(name='Doctor')
+        )
+        self.admin_token = Token.objects.create(user=self.admin).key
+        self.doctor_token = Token.objects.create(user=self.doctor).key
+
+    async def test_authentication_required(self):
+        res = await self.async_client.get(EVENTS_URL)
+
+        self.assertEqual(res.status_code, 401)
+
+    async def test_doctor_follows_only_own_reservations(self):
+        res = await self.async_client.get(
+            EVENTS_URL, {'doctor': self.admin.id}, headers={'Authorization': f'Token {self.doctor_token}'}
+        )
+
+        self.assertEqual(res.status_code, 403)
+
+    async def test_stream(self):
+        res = await self.async_client.get(EVENTS_URL, {'date': '2024-07-23', 'token': self.admin_token})
+        stream = aiter(res.streaming_content)
+
+        self.assertEqual(res['Content-Type'], 'text/event-stream')
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+
+        hub.publish({'type': 'created', 'data': {'id': 1}, 'dates': {date(2024, 7, 23)}, 'doctors': {2}})
+        hub.publish({'type': 'created', 'data': {'id': 2}, 'dates': {date(2024, 7, 24)}, 'doctors': {2}})
+        hub.publish({'type': 'deleted', 'data': {'id': 1}, 'dates': {date(2024, 7, 23)}, 'doctors': {2}})
+
+        self.assertEqual(await asyncio.wait_for(anext(stream), 1), b'event: created\ndata: {"id": 1}\n\n')
+        self.assertEqual(await asyncio.wait_for(anext(stream), 1), b'event: deleted\ndata: {"id": 1}\n\n')
+
+        # the ASGI handler cancels the streaming task when the client disconnects
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertEqual(hub._subscriptions, set())
@@ -0,0 +1,145 @@
+from datetime import date
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Patient, Reservation, Role, User
+
+RESERVATION_URL = reverse('reservation:reservation-list')
+BULK_URL = reverse('reservation:reservation-bulk')
+SERIES_URL = reverse('reservation:reservationseries-list')
+DAY = {'date': '2024-07-23'}
+
+
+# off by default, it is only turned on with a cache shared by the processes
+@override_settings(RESERVATION_LIST_CACHE='default')
+class ReservationListCacheTests(TestCase):
+    def setUp(self):
+        call_command('seeder')
+        cache.clear()
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='testpass123', name='Admin', role=Role.objects.get(name='Admin')
+        )
+        self.client.force_authenticate(self.admin)
+        self.doctor = User.objects.create_user(
+            email='doctor@example.com', password='testpass123', name='Doctor', role=Role.objects.get(name='Doctor')
+        )
+        self.patient = Patient.objects.create(
+            name='patient name', relative='father', relative_name='relative', phone_number='0987654321',
+            birth_date=date(2015, 7, 23),
+        )
+
+    def book(self, **params):
+        payload = {
+            'patient': self.patient.id, 'doctor': self.doctor.id, 'date': '2024-07-23', 'time': '10:00',
+            'description': 'checkup',
+        }
+        payload.update(params)
+        res = self.client.post(RESERVATION_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data
+
+    def times(self, params=DAY):
+        return [item['time'] for item in self.client.get(RESERVATION_URL, params).data['results']]
+
+    def test_cached_poll_runs_no_queries(self):
+        self.book()
+        first = self.client.get(RESERVATION_URL, DAY)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(RESERVATION_URL, DAY)
+
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_if_none_match(self):
+        etag = self.client.get(RESERVATION_URL, DAY)['ETag']
+
+        unchanged = self.client.get(RESERVATION_URL, DAY, HTTP_IF_NONE_MATCH=etag)
+        self.book()
+        changed = self.client.get(RESERVATION_URL, DAY, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(unchanged.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(unchanged.content, b'')
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_writes_invalidate(self):
+        reservation = self.book()
+        self.assertEqual(self.times(), ['10:00:00'])
+
+        self.client.patch(reverse('reservation:reservation-detail', args=[reservation['id']]), {'time': '11:00'})
+        self.assertEqual(self.times(), ['11:00:00'])
+
+        self.client.patch(reverse('reservation:reservation-detail', args=[reservation['id']]), {'date': '2024-07-24'})
+        self.assertEqual(self.times(), [])
+        self.assertEqual(self.times({'date': '2024-07-24'}), ['11:00:00'])
+
+        self.client.delete(reverse('reservation:reservation-detail', args=[reservation['id']]))
+        self.assertEqual(self.times({'date': '2024-07-24'}), [])
+
+    def test_writes_outside_the_api_invalidate(self):
+        reservation = Reservation.objects.get(id=self.book()['id'])
+        self.assertEqual(self.times(), ['10:00:00'])
+
+        # as the admin or a shell would, the day it moves away from is known without reading it again
+        reservation.date = date(2024, 7, 24)
+        with self.assertNumQueries(1):
+            reservation.save()
+        self.assertEqual(self.times(), [])
+        self.assertEqual(self.times({'date': '2024-07-24'}), ['10:00:00'])
+
+        reservation.delete()
+        self.assertEqual(self.times({'date': '2024-07-24'}), [])
+
+    def test_bulk_writes_invalidate(self):
+        self.assertEqual(self.times(), [])
+
+        created = self.client.post(BULK_URL, [
+            {'patient': self.patient.id, 'doctor': self.doctor.id, 'date': '2024-07-23', 'time': f'{hour}:00',
+             'description': 'checkup'}
+            for hour in (9, 10)
+        ], format='json').data
+        self.assertEqual(self.times(), ['09:00:00', '10:00:00'])
+
+        self.client.patch(BULK_URL, [{'id': created[0]['id'], 'time': '08:00'}], format='json')
+        self.assertEqual(self.times(), ['08:00:00', '10:00:00'])
+
+        self.client.delete(BULK_URL, {'ids': [created[1]['id']]}, format='json')
+        self.assertEqual(self.times(), ['08:00:00'])
+
+    def test_new_series_invalidates(self):
+        self.assertEqual(self.times(), [])
+
+        self.client.post(SERIES_URL, {
+            'patient': self.patient.id, 'doctor': self.doctor.id, 'description': 'physiotherapy', 'time': '12:00',
+            'weekdays': [1], 'start_date': '2024-07-01', 'count': 5,
+        }, format='json')
+
+        self.assertEqual(self.times(), ['12:00:00'])
+
+    def test_scopes_are_cached_separately(self):
+        other_doctor = User.objects.create_user(
+            email='doctor2@example.com', password='testpass123', name='Doctor 2', role=Role.objects.get(name='Doctor')
+        )
+        self.book()
+        self.book(doctor=other_doctor.id)
+        self.assertEqual(len(self.times()), 2)
+
+        self.client.force_authenticate(self.doctor)
+
+        self.assertEqual([item['doctor'] for item in self.client.get(RESERVATION_URL, DAY).data['results']],
+                         [self.doctor.id])
+
+    def test_permission_checked_on_cached_response(self):
+        self.client.get(RESERVATION_URL, DAY)
+        self.admin.groups.clear()
+
+        res = self.client.get(RESERVATION_URL, DAY)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
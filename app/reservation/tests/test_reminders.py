@@ -0,0 +1,164 @@
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from threading import Event
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Patient, Reservation, ReservationSeries, Role, User
+from reservation import reminders
+from reservation.reminders import LocmemBackend, ReminderScheduler
+
+DAY = date(2024, 7, 23)
+
+
+def at(hour, minute=0):
+    return timezone.make_aware(datetime.combine(DAY, time(hour, minute)))
+
+
+class FailingBackend:
+    def send(self, reminder):
+        raise ConnectionError('gateway down')
+
+
+class ReminderSchedulerTests(TestCase):
+    def setUp(self):
+        call_command('seeder')
+        self.doctor = User.objects.create_user(
+            email='doctor@example.com', password='testpass123', name='Doctor', role=Role.objects.get(name='Doctor')
+        )
+        self.patient = Patient.objects.create(
+            name='patient name', relative='father', relative_name='relative', phone_number='0987654321',
+            birth_date=date(2015, 7, 23),
+        )
+        self.reservation = Reservation.objects.create(
+            patient=self.patient, doctor=self.doctor, date=DAY, time=time(15, 0), description='checkup',
+            patient_reminder=time(10, 0), doctor_reminder=time(14, 30),
+        )
+        reminders.outbox.clear()
+
+    def scheduler(self, **params):
+        return ReminderScheduler(backend=LocmemBackend(), window=3600, **params)
+
+    def test_sends_due_reminders_once(self):
+        scheduler = self.scheduler()
+
+        self.assertEqual(scheduler.run_pending(at(9, 0)), 0)
+        self.assertEqual(scheduler.next_wakeup(at(9, 0)), 3600)
+        self.assertEqual(scheduler.run_pending(at(10, 0)), 1)
+        self.assertEqual(scheduler.run_pending(at(10, 30)), 0)
+
+        self.assertEqual([(reminder.kind, reminder.recipient) for reminder in reminders.outbox],
+                         [('patient', '0987654321')])
+        self.assertIn('2024-07-23 at 15:00', reminders.outbox[0].message)
+        self.reservation.refresh_from_db()
+        self.assertEqual(self.reservation.patient_reminder_sent_at, at(10, 0))
+        self.assertIsNone(self.reservation.doctor_reminder_sent_at)
+
+    def test_wakes_up_at_next_reminder(self):
+        scheduler = self.scheduler()
+        scheduler.run_pending(at(14, 0))
+
+        self.assertEqual(scheduler.next_wakeup(at(14, 0)), 30 * 60)
+
+    def test_concurrent_schedulers_send_once(self):
+        first, second = self.scheduler(), self.scheduler()
+        first.load(at(9, 30))
+        second.load(at(9, 30))
+
+        sent = first.run_pending(at(10, 0)) + second.run_pending(at(10, 0))
+
+        self.assertEqual(sent, 1)
+        self.assertEqual(len(reminders.outbox), 1)
+
+    def test_rescheduled_after_load(self):
+        scheduler = self.scheduler()
+        scheduler.load(at(9, 30))
+        Reservation.objects.filter(id=self.reservation.id).update(patient_reminder=time(11, 0))
+
+        self.assertEqual(scheduler.run_pending(at(10, 0)), 0)
+        self.assertEqual(scheduler.run_pending(at(11, 0)), 1)
+
+    def test_missed_reminders(self):
+        self.assertEqual(self.scheduler(max_delay=3600).run_pending(at(10, 30)), 1)
+        self.assertEqual(self.scheduler(max_delay=60).run_pending(at(15, 0)), 0)
+
+    def test_failed_send_is_retried(self):
+        with self.assertLogs('reservation.reminders', 'ERROR'):
+            self.assertEqual(ReminderScheduler(backend=FailingBackend(), window=3600).run_pending(at(10, 0)), 0)
+
+        self.reservation.refresh_from_db()
+        self.assertIsNone(self.reservation.patient_reminder_sent_at)
+        self.assertEqual(self.scheduler().run_pending(at(10, 1)), 1)
+
+    def test_series_occurrence_stored_when_claimed(self):
+        series = ReservationSeries.objects.create(
+            patient=self.patient, doctor=self.doctor, description='physiotherapy', time=time(11, 0),
+            weekdays=[DAY.weekday()], start_date=DAY, count=2, patient_reminder=time(10, 0),
+        )
+        first, second = self.scheduler(), self.scheduler()
+        first.load(at(9, 30))
+        second.load(at(9, 30))
+
+        sent = first.run_pending(at(10, 0)) + second.run_pending(at(10, 0))
+
+        self.assertEqual(sent, 2)
+        self.assertEqual(sorted(reminder.time for reminder in reminders.outbox), [time(11, 0), time(15, 0)])
+        occurrence = Reservation.objects.get(series=series)
+        self.assertEqual((occurrence.series_date, occurrence.patient_reminder_sent_at), (DAY, at(10, 0)))
+
+    def test_run_survives_database_errors(self):
+        stop = Event()
+        scheduler = self.scheduler(clock=lambda: at(10, 0), retry_delay=0)
+        run_pending = scheduler.run_pending
+        calls = []
+
+        def flaky_run_pending():
+            calls.append(1)
+            if len(calls) == 1:
+                raise OperationalError('server closed the connection unexpectedly')
+            stop.set()
+            return run_pending()
+
+        scheduler.run_pending = flaky_run_pending
+        # the test case's connection is inside its transaction, which would count as unusable
+        with mock.patch.object(reminders, 'close_old_connections') as close_old_connections, \
+                self.assertLogs('reservation.reminders', 'ERROR'):
+            scheduler.run(stop)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(close_old_connections.call_count, 2)
+        self.assertEqual(len(reminders.outbox), 1)
+
+    def test_rescheduling_resets_sent_reminder(self):
+        self.assertEqual(self.scheduler(max_delay=24 * 3600).run_pending(at(14, 30)), 2)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(
+            email='admin@example.com', password='testpass123', name='Admin', role=Role.objects.get(name='Admin')
+        ))
+
+        res = client.patch(reverse('reservation:reservation-detail', args=[self.reservation.id]),
+                           {'date': DAY + timedelta(days=1)})
+
+        self.assertEqual(res.status_code, 200)
+        self.reservation.refresh_from_db()
+        self.assertIsNone(self.reservation.patient_reminder_sent_at)
+        self.assertIsNone(self.reservation.doctor_reminder_sent_at)
+
+    @override_settings(REMINDER_BACKEND='reservation.reminders.LocmemBackend')
+    def test_send_reminders_once(self):
+        Reservation.objects.create(
+            patient=self.patient, doctor=self.doctor, date=timezone.localdate(), time=time(23, 59),
+            description='checkup', patient_reminder=timezone.localtime().time(),
+        )
+        out = StringIO()
+
+        call_command('send_reminders', '--once', stdout=out)
+
+        self.assertIn('1 reminders sent', out.getvalue())
+        self.assertEqual(len(reminders.outbox), 1)
@@ -1,7 +1,17 @@
-from datetime import date, time
-
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from base64 import b64encode
+from datetime import date, time, timedelta
+from unittest import mock
+
+from django.core.cache import cache
 from django.core.management import call_command
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -9,10 +19,14 @@ from rest_framework.test import APIClient
 
 from django.contrib.auth import get_user_model
 
-from core.models import Role, User, Patient, Reservation
+from core.models import Role, User, Patient, Reservation, ReservationSeries, WorkingHours
+from reservation import bulk
 from reservation.serializers import ReservationSerializer, ReservationDetailSerializer
 
 RESERVATION_URL = reverse('reservation:reservation-list')
+AVAILABILITY_URL = reverse('reservation:reservation-availability')
+BULK_URL = reverse('reservation:reservation-bulk')
+SERIES_URL = reverse('reservation:reservationseries-list')
 
 
 def reservation_detail_url(reservation_id):
@@ -76,6 +90,7 @@ class PublicReservationAPITests(TestCase):
 class PrivateReservationAPITests(TestCase):
     def setUp(self):
         call_command('seeder')
+        cache.clear()
         self.client = APIClient()
         self.admin = create_user(
             email='admin@example.com',
@@ -115,6 +130,25 @@ class PrivateReservationAPITests(TestCase):
             else:
                 self.assertEqual(payload[key], serializer.data[key])
 
+    def test_create_reservation_without_role_or_group_queries(self):
+        def payload(hour):
+            return {
+                'patient': self.patient.id,
+                'doctor': self.doctor.id,
+                'date': date(2024, 7, 23),
+                'time': time(hour, 0),
+                'description': 'checkup',
+            }
+        self.client.post(RESERVATION_URL, payload(9))
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(RESERVATION_URL, payload(10))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('"core_role"', sql)
+        self.assertNotIn('"auth_group"', sql)
+
     def test_create_reservation_user_is_not_doctor(self):
         payload = {
             "patient": self.patient.id,
@@ -153,6 +187,186 @@ class PrivateReservationAPITests(TestCase):
             else:
                 self.assertEqual(payload[key], serializer.data[key])
 
+    def _booking_payload(self, **params):
+        payload = {
+            'patient': self.patient.id,
+            'doctor': self.doctor.id,
+            'date': date(2024, 7, 23),
+            'time': time(15, 0),
+            'duration': 30,
+            'description': 'checkup',
+        }
+        payload.update(params)
+        return payload
+
+    def test_create_reservation_slot_taken(self):
+        create_reservation(date=date(2024, 7, 23), time=time(15, 0), doctor=self.doctor, patient=self.patient)
+
+        res = self.client.post(RESERVATION_URL, self._booking_payload())
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('time', res.data)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_create_reservation_overlapping_duration(self):
+        create_reservation(
+            date=date(2024, 7, 23), time=time(14, 0), duration=90, doctor=self.doctor, patient=self.patient
+        )
+
+        overlapping = self.client.post(RESERVATION_URL, self._booking_payload(time=time(15, 0)))
+        after = self.client.post(RESERVATION_URL, self._booking_payload(time=time(15, 30)))
+        before = self.client.post(RESERVATION_URL, self._booking_payload(time=time(13, 30)))
+        overlapping_start = self.client.post(RESERVATION_URL, self._booking_payload(time=time(13, 45)))
+
+        self.assertEqual(overlapping.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(after.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(before.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(overlapping_start.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reservation_must_end_by_midnight(self):
+        def book(day, start, duration=30):
+            return self.client.post(RESERVATION_URL, self._booking_payload(date=day, time=start, duration=duration))
+
+        late = book(date(2030, 1, 1), time(23, 0), 240)
+        next_day = book(date(2030, 1, 2), time(1, 0))
+        last_hour = book(date(2030, 1, 1), time(23, 0), 60)
+        extended = self.client.patch(reservation_detail_url(last_hour.data['id']), {'duration': 61})
+        bulk = self.client.post(BULK_URL, [self._booking_payload(time=time(22, 0), duration=180)], format='json')
+
+        self.assertEqual(late.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('duration', late.data)
+        self.assertEqual(next_day.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(last_hour.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(extended.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(bulk.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('duration', bulk.data[0])
+        self.assertEqual(Reservation.objects.count(), 2)
+
+    def test_same_slot_other_doctor_allowed(self):
+        other_doctor = create_user(email='doctor2@example.com', role=Role.objects.get(name='Doctor'))
+        create_reservation(date=date(2024, 7, 23), time=time(15, 0), doctor=other_doctor, patient=self.patient)
+
+        res = self.client.post(RESERVATION_URL, self._booking_payload())
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_update_reservation_into_taken_slot(self):
+        create_reservation(date=date(2024, 7, 23), time=time(15, 0), doctor=self.doctor, patient=self.patient)
+        reservation = create_reservation(
+            date=date(2024, 7, 23), time=time(16, 0), doctor=self.doctor, patient=self.patient
+        )
+
+        extended = self.client.patch(reservation_detail_url(reservation.id), {'duration': 60})
+        moved = self.client.patch(reservation_detail_url(reservation.id), {'time': time(15, 15)})
+
+        self.assertEqual(extended.status_code, status.HTTP_200_OK)
+        self.assertEqual(moved.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_availability_default_working_hours(self):
+        # 2024-07-23 is a Tuesday, 2024-07-27 a Saturday
+        create_reservation(date=date(2024, 7, 23), time=time(10, 0), duration=60, doctor=self.doctor)
+        create_reservation(date=date(2024, 7, 23), time=time(11, 0), duration=30, doctor=self.doctor)
+        create_reservation(date=date(2024, 7, 23), time=time(16, 45), duration=15, doctor=self.doctor)
+
+        res = self.client.get(AVAILABILITY_URL, {
+            'doctor': self.doctor.id, 'from': '2024-07-23', 'to': '2024-07-27', 'duration': 30,
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        day = [slot for slot in res.data if slot['date'] == '2024-07-23']
+        self.assertEqual(day, [
+            {'doctor': self.doctor.id, 'date': '2024-07-23', 'start': '09:00:00', 'end': '10:00:00'},
+            {'doctor': self.doctor.id, 'date': '2024-07-23', 'start': '11:30:00', 'end': '16:45:00'},
+        ])
+        self.assertEqual(sorted({slot['date'] for slot in res.data}), [
+            '2024-07-23', '2024-07-24', '2024-07-25', '2024-07-26',
+        ])
+
+    def test_availability_working_hours_and_duration(self):
+        WorkingHours.objects.create(doctor=self.doctor, weekday=1, start=time(8, 0), end=time(10, 0))
+        WorkingHours.objects.create(doctor=self.doctor, weekday=1, start=time(14, 0), end=time(15, 0))
+        create_reservation(date=date(2024, 7, 23), time=time(8, 30), duration=60, doctor=self.doctor)
+
+        res = self.client.get(AVAILABILITY_URL, {
+            'doctor': self.doctor.id, 'from': '2024-07-23', 'duration': 45,
+        })
+
+        self.assertEqual(res.data, [
+            {'doctor': self.doctor.id, 'date': '2024-07-23', 'start': '14:00:00', 'end': '15:00:00'},
+        ])
+
+    def test_availability_all_doctors_constant_queries(self):
+        for i in range(5):
+            create_user(email=f'doctor{i}@example.com', role=Role.objects.get(name='Doctor'))
+        self.client.get(AVAILABILITY_URL, {'from': '2024-07-22', 'to': '2024-08-04'})
+
+        # doctors, working hours, reservations, series occurrences
+        with self.assertNumQueries(4):
+            res = self.client.get(AVAILABILITY_URL, {'from': '2024-07-22', 'to': '2024-08-04'})
+
+        self.assertEqual(len({slot['doctor'] for slot in res.data}), 6)
+
+    def test_availability_doctor_sees_only_own(self):
+        other_doctor = create_user(email='doctor2@example.com', role=Role.objects.get(name='Doctor'))
+        self.client.force_authenticate(self.doctor)
+
+        own = self.client.get(AVAILABILITY_URL, {'from': '2024-07-23'})
+        other = self.client.get(AVAILABILITY_URL, {'from': '2024-07-23', 'doctor': other_doctor.id})
+
+        self.assertEqual({slot['doctor'] for slot in own.data}, {self.doctor.id})
+        self.assertEqual(other.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_availability_invalid_range(self):
+        res = self.client.get(AVAILABILITY_URL, {'from': '2024-07-23', 'to': '2024-07-01'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('to', res.data)
+
+    def test_list_reservations_expanded(self):
+        other_patient = create_patient(name='other patient')
+        for hour in range(8, 14):
+            create_reservation(date=date(2022, 5, 17), time=time(hour, 0), doctor=self.doctor, patient=other_patient)
+        self.client.get(RESERVATION_URL, {'date': date(2022, 5, 17)})
+
+        # series occurrences, reservations with their patients and doctors
+        with self.assertNumQueries(2):
+            res = self.client.get(RESERVATION_URL, {'date': date(2022, 5, 17), 'expand': 'patient,doctor'})
+
+        self.assertEqual(len(res.data['results']), 6)
+        self.assertEqual(res.data['results'][0]['patient'], {'id': other_patient.id, 'name': 'other patient'})
+        self.assertEqual(res.data['results'][0]['doctor'], {'id': self.doctor.id, 'name': 'Doctor'})
+
+    def test_reservation_details_expanded(self):
+        reservation = create_reservation(date=date(2022, 5, 17), doctor=self.doctor, patient=self.patient)
+        self.client.get(reservation_detail_url(reservation.id))
+
+        with self.assertNumQueries(1):
+            res = self.client.get(reservation_detail_url(reservation.id), {'expand': 'patient'})
+
+        self.assertEqual(res.data['patient'], {'id': self.patient.id, 'name': self.patient.name})
+        self.assertEqual(res.data['doctor'], self.doctor.id)
+
+    def test_admin_reservation_changelist_constant_queries(self):
+        superuser = create_user(email='superuser@example.com', is_staff=True, is_superuser=True)
+        self.client.force_login(superuser)
+        url = reverse('admin:core_reservation_changelist')
+
+        def changelist_queries():
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        for hour in range(8, 11):
+            create_reservation(date=date(2022, 5, 17), time=time(hour, 0), doctor=self.doctor, patient=self.patient)
+        few = changelist_queries()
+
+        for hour in range(11, 18):
+            patient = create_patient(name=f'patient {hour}')
+            create_reservation(date=date(2022, 5, 17), time=time(hour, 0), doctor=self.doctor, patient=patient)
+
+        self.assertEqual(changelist_queries(), few)
+
     def test_get_all_doctors_day_reservations(self):
         other_doctor = create_user(email='doctor2@example.com', role=Role.objects.get(name='Doctor'))
         reservation1 = create_reservation(date=date(2022, 5, 17), doctor=self.doctor, patient=self.patient)
@@ -162,15 +376,15 @@ class PrivateReservationAPITests(TestCase):
         res = self.client.get(RESERVATION_URL, {'date': date(2022, 5, 17)})
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 2)
+        self.assertEqual(len(res.data['results']), 2)
 
         serializer1 = ReservationSerializer(reservation1)
         serializer2 = ReservationSerializer(reservation2)
         serializer3 = ReservationSerializer(reservation3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_get_my_day_reservations(self):
         other_doctor = create_user(email='doctor2@example.com', role=Role.objects.get(name='Doctor'))
@@ -184,26 +398,64 @@ class PrivateReservationAPITests(TestCase):
         res = self.client.get(RESERVATION_URL, {'date': date(2022, 5, 17)})
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
 
         serializer1 = ReservationSerializer(reservation1)
         serializer2 = ReservationSerializer(reservation2)
         serializer3 = ReservationSerializer(reservation3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_get_doctors_reservations(self):
         other_doctor = create_user(email='doctor2@example.com', role=Role.objects.get(name='Doctor'))
 
         create_reservation(date=date(2022, 5, 17), doctor=self.doctor, patient=self.patient)
         create_reservation(date=date(2022, 5, 17), doctor=other_doctor, patient=self.patient)
-        create_reservation(date=date(2022, 5, 17), doctor=self.doctor, patient=self.patient)
+        create_reservation(date=date(2022, 5, 17), time=time(16, 0), doctor=self.doctor, patient=self.patient)
 
         res = self.client.get(RESERVATION_URL, {'date': date(2022, 5, 17), 'doctor': self.doctor.id})
-        self.assertEqual(len(res.data), 2)
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_cursor_with_wrong_value_types(self):
+        for position in (['notadate', 'x', 1], ['x', 1], ['10:00', 'x']):
+            cursor = b64encode(json.dumps({'p': position, 'r': 0}).encode()).decode()
+            res = self.client.get(RESERVATION_URL, {'cursor': cursor})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_through_day_reservations(self):
+        doctors = [self.doctor] + [
+            create_user(email=f'doctor{i}@example.com', role=Role.objects.get(name='Doctor'))
+            for i in range(1, 10)
+        ]
+        Reservation.objects.bulk_create([
+            Reservation(
+                patient=self.patient,
+                doctor=doctor,
+                date=date(2022, 5, 17),
+                time=time(minute // 60, minute % 60),
+                description='checkup',
+            )
+            for doctor in doctors
+            for minute in range(1000)
+        ])
+        create_reservation(date=date(2022, 5, 18), doctor=self.doctor, patient=self.patient)
+        expected_ids = list(
+            Reservation.objects.filter(date=date(2022, 5, 17)).order_by('time', 'id').values_list('id', flat=True)
+        )
 
+        ids = []
+        res = self.client.get(RESERVATION_URL, {'date': date(2022, 5, 17), 'page_size': 1000})
+        while True:
+            ids.extend(reservation['id'] for reservation in res.data['results'])
+            if res.data['next'] is None:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(len(ids), 10000)
+        self.assertEqual(ids, expected_ids)
 
     def test_get_reservation_details(self):
         reservation = create_reservation(date=date(2022, 5, 17), doctor=self.doctor)
@@ -259,3 +511,384 @@ class PrivateReservationAPITests(TestCase):
         res = self.client.patch(reservation_detail_url(reservation.id), {'date': date(2022, 5, 23)})
 
         self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bulk_create_reservations(self):
+        payload = [self._booking_payload(date=date(2024, 7, 1 + day)) for day in range(20)]
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 20)
+        self.assertEqual(Reservation.objects.filter(id__in=[item['id'] for item in res.data]).count(), 20)
+        self.assertEqual(sum('INSERT' in query['sql'] for query in queries), 1)
+        self.assertLess(len(queries), 10)
+
+    def test_bulk_create_rejects_whole_batch(self):
+        create_reservation(date=date(2024, 7, 23), time=time(15, 0), doctor=self.doctor, patient=self.patient)
+        payload = [
+            self._booking_payload(date=date(2024, 7, 22)),
+            self._booking_payload(doctor=self.admin.id),
+            self._booking_payload(patient=0),
+            self._booking_payload(),
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('doctor', res.data[1])
+        self.assertIn('patient', res.data[2])
+        self.assertEqual(Reservation.objects.count(), 1)
+
+        payload = [self._booking_payload(date=date(2024, 7, 22)), self._booking_payload()]
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('time', res.data[1])
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_bulk_create_conflicts_within_batch(self):
+        payload = [self._booking_payload(duration=60), self._booking_payload(time=time(15, 30))]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('time', res.data[1])
+        self.assertEqual(Reservation.objects.count(), 0)
+
+    def test_bulk_update_reservations(self):
+        first = create_reservation(date=date(2024, 7, 23), time=time(9, 0), doctor=self.doctor, patient=self.patient)
+        second = create_reservation(date=date(2024, 7, 23), time=time(10, 0), doctor=self.doctor, patient=self.patient)
+
+        res = self.client.patch(BULK_URL, [
+            {'id': first.id, 'duration': 60},
+            {'id': second.id, 'time': '11:00', 'description': 'moved'},
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.duration, 60)
+        self.assertEqual((second.time, second.description), (time(11, 0), 'moved'))
+
+    def test_bulk_update_keeps_concurrent_changes(self):
+        first = create_reservation(date=date(2024, 7, 23), time=time(9, 0), doctor=self.doctor, patient=self.patient)
+        second = create_reservation(date=date(2024, 7, 23), time=time(10, 0), doctor=self.doctor, patient=self.patient)
+        lock_doctors = bulk.lock_doctors
+
+        def change_then_lock(doctor_ids):
+            # a single reservation update that committed while the batch was on its way
+            Reservation.objects.filter(id=first.id).update(description='changed elsewhere')
+            lock_doctors(doctor_ids)
+
+        with mock.patch.object(bulk, 'lock_doctors', change_then_lock):
+            res = self.client.patch(BULK_URL, [
+                {'id': first.id, 'time': '09:30'},
+                {'id': second.id, 'description': 'moved'},
+            ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        first.refresh_from_db()
+        self.assertEqual((first.time, first.description), (time(9, 30), 'changed elsewhere'))
+
+    def test_bulk_update_into_taken_slot(self):
+        create_reservation(date=date(2024, 7, 23), time=time(15, 0), doctor=self.doctor, patient=self.patient)
+        reservation = create_reservation(
+            date=date(2024, 7, 23), time=time(16, 0), doctor=self.doctor, patient=self.patient
+        )
+
+        res = self.client.patch(BULK_URL, [{'id': reservation.id, 'time': '15:15'}, {'id': 0}], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data[1])
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.time, time(16, 0))
+
+    def test_bulk_delete_reservations(self):
+        kept = create_reservation(date=date(2024, 7, 23), time=time(9, 0), doctor=self.doctor)
+        deleted = [
+            create_reservation(date=date(2024, 7, 23), time=time(hour, 0), doctor=self.doctor).id
+            for hour in (10, 11)
+        ]
+
+        res = self.client.delete(BULK_URL, {'ids': deleted}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(Reservation.objects.values_list('id', flat=True)), [kept.id])
+
+    def test_bulk_permission_denied(self):
+        user = create_user(email='nobody@example.com', role=Role.objects.get(name='Receptionist'))
+        user.groups.clear()
+        self.client.force_authenticate(user)
+
+        res = self.client.post(BULK_URL, [self._booking_payload()], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Reservation.objects.count(), 0)
+
+    @override_settings(RESERVATION_LIST_CACHE=None)
+    def test_list_reservations_no_permission_queries_after_warm_up(self):
+        create_reservation(date=date(2022, 5, 17), doctor=self.doctor, patient=self.patient)
+        self.client.get(RESERVATION_URL, {'date': date(2022, 5, 17)})
+
+        # series occurrences, reservations
+        with self.assertNumQueries(2):
+            res = self.client.get(RESERVATION_URL, {'date': date(2022, 5, 17)})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+
+class ReservationSeriesAPITests(TestCase):
+    def setUp(self):
+        call_command('seeder')
+        cache.clear()
+        self.client = APIClient()
+        self.admin = create_user(email='admin@example.com', role=Role.objects.get(name='Admin'), name='Admin')
+        self.client.force_authenticate(self.admin)
+        self.patient = create_patient()
+        self.doctor = create_user(email='doctor@example.com', role=Role.objects.get(name='Doctor'), name='Doctor')
+
+    def _create_series(self, **params):
+        # Mondays and Wednesdays from Monday 2024-07-22
+        payload = {
+            'patient': self.patient.id,
+            'doctor': self.doctor.id,
+            'description': 'physiotherapy',
+            'time': '10:00',
+            'weekdays': [0, 2],
+            'start_date': '2024-07-22',
+            'count': 4,
+        }
+        payload.update(params)
+        return self.client.post(SERIES_URL, payload, format='json')
+
+    def _day(self, day):
+        return self.client.get(RESERVATION_URL, {'date': day}).data['results']
+
+    def test_create_series_is_not_materialized(self):
+        res = self._create_series()
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['end_date'], '2024-07-31')
+        self.assertEqual(Reservation.objects.count(), 0)
+
+    def _occurrence_url(self, series_id, day):
+        return reverse('reservation:reservationseries-occurrence', args=[series_id, day])
+
+    def test_reads_show_occurrences_without_storing_them(self):
+        series_id = self._create_series().data['id']
+        create_reservation(date=date(2024, 7, 24), time=time(9, 0), doctor=self.doctor, patient=self.patient)
+
+        self.assertEqual(self._day('2024-07-23'), [])
+        day = self._day('2024-07-24')
+        self.client.get(AVAILABILITY_URL, {'from': '2024-07-22', 'to': '2024-07-31', 'doctor': self.doctor.id})
+        self.client.get(f'{SERIES_URL}{series_id}/occurrences/', {'from': '2024-07-01', 'to': '2024-07-31'})
+        after_end = self._day('2024-08-05')
+
+        self.assertEqual(
+            [(item['id'] is None, item['time']) for item in day], [(False, '09:00:00'), (True, '10:00:00')]
+        )
+        self.assertEqual((day[1]['series'], day[1]['series_date']), (series_id, '2024-07-24'))
+        self.assertEqual(after_end, [])
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_occurrences_merged_into_pages(self):
+        self._create_series()
+        for hour in (8, 9, 11, 12):
+            create_reservation(date=date(2024, 7, 24), time=time(hour, 0), doctor=self.doctor, patient=self.patient)
+
+        times = []
+        res = self.client.get(RESERVATION_URL, {'date': '2024-07-24', 'page_size': 2})
+        while True:
+            times.append([item['time'][:2] for item in res.data['results']])
+            if res.data['next'] is None:
+                break
+            res = self.client.get(res.data['next'])
+        back = self.client.get(res.data['previous']).data['results']
+
+        # on the page of the first row after it
+        self.assertEqual(times, [['08', '09'], ['10', '11', '12']])
+        self.assertEqual([item['time'][:2] for item in back], ['08', '09'])
+
+    def test_cancel_occurrence(self):
+        series_id = self._create_series().data['id']
+
+        res = self.client.delete(self._occurrence_url(series_id, '2024-07-24'))
+        again = self.client.delete(self._occurrence_url(series_id, '2024-07-24'))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(again.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self._day('2024-07-24'), [])
+        self.assertEqual(self.client.get(f'{SERIES_URL}{series_id}/').data['cancelled_dates'], ['2024-07-24'])
+        self.assertEqual(Reservation.objects.count(), 0)
+
+    def test_move_occurrence(self):
+        series_id = self._create_series().data['id']
+
+        res = self.client.patch(self._occurrence_url(series_id, '2024-07-24'), {'date': '2024-07-25', 'time': '11:00'})
+        again = self.client.patch(self._occurrence_url(series_id, '2024-07-24'), {'time': '12:00'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._day('2024-07-24'), [])
+        self.assertEqual([item['time'] for item in self._day('2024-07-25')], ['12:00:00'])
+        self.assertEqual(
+            list(Reservation.objects.values_list('id', 'series_date')), [(res.data['id'], date(2024, 7, 24))]
+        )
+
+    def test_move_occurrence_into_taken_slot(self):
+        series_id = self._create_series().data['id']
+        create_reservation(date=date(2024, 7, 25), time=time(11, 0), doctor=self.doctor, patient=self.patient)
+
+        res = self.client.patch(self._occurrence_url(series_id, '2024-07-24'), {'date': '2024-07-25', 'time': '11:00'})
+        no_occurrence = self.client.patch(self._occurrence_url(series_id, '2024-07-23'), {'time': '11:00'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('time', res.data)
+        self.assertEqual(no_occurrence.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_booking_into_unexpanded_occurrence(self):
+        self._create_series()
+
+        res = self.client.post(RESERVATION_URL, {
+            'patient': self.patient.id,
+            'doctor': self.doctor.id,
+            'date': '2024-07-29',
+            'time': '10:15',
+            'description': 'checkup',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('time', res.data)
+
+    def test_create_series_conflicting(self):
+        create_reservation(date=date(2024, 7, 29), time=time(10, 0), doctor=self.doctor, patient=self.patient)
+        self._create_series(time='09:00', count=10)
+
+        res = self._create_series()
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('2024-07-29', str(res.data['time']))
+        self.assertEqual(ReservationSeries.objects.count(), 1)
+
+    def test_create_series_invalid(self):
+        past_midnight = self._create_series(time='23:30', duration=45)
+        neither = self._create_series(count=None)
+        both = self._create_series(until='2024-08-30')
+        empty = self._create_series(count=None, until='2024-07-23', weekdays=[4])
+        weekday = self._create_series(weekdays=[7])
+
+        for res in (past_midnight, neither, both, empty, weekday):
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ReservationSeries.objects.count(), 0)
+
+    def test_availability_includes_series(self):
+        self._create_series(until='2024-12-31', count=None)
+
+        res = self.client.get(AVAILABILITY_URL, {'from': '2024-09-02', 'doctor': self.doctor.id})
+
+        self.assertEqual(
+            [(slot['start'], slot['end']) for slot in res.data],
+            [('09:00:00', '10:00:00'), ('10:30:00', '17:00:00')],
+        )
+
+    def test_series_occurrences(self):
+        series_id = self._create_series().data['id']
+
+        res = self.client.get(f'{SERIES_URL}{series_id}/occurrences/', {'from': '2024-07-01', 'to': '2024-07-31'})
+
+        self.assertEqual([item['date'] for item in res.data], ['2024-07-22', '2024-07-24', '2024-07-29', '2024-07-31'])
+
+    def test_delete_series_keeps_past_occurrences(self):
+        today = date.today()
+        series_id = self._create_series(start_date=(today - timedelta(days=14)).isoformat(), weekdays=list(range(7)),
+                                        count=30).data['id']
+        self.client.patch(self._occurrence_url(series_id, today.isoformat()), {'time': '11:00'})
+
+        res = self.client.delete(f'{SERIES_URL}{series_id}/')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Reservation.objects.count(), 14)
+        self.assertFalse(Reservation.objects.filter(date__gte=today).exists())
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # threads get connections of their own, which need a database file to share; the suite's
+        # in-memory database is copied to one for these tests only and put back afterwards
+        cls.memory_connection = None
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            cls.tmp_dir = tempfile.TemporaryDirectory()
+            path = os.path.join(cls.tmp_dir.name, 'db.sqlite3')
+            connection.ensure_connection()
+            target = sqlite3.connect(path)
+            connection.connection.backup(target)
+            target.close()
+            cls.memory_name = connection.settings_dict['NAME']
+            cls.memory_connection, connection.connection = connection.connection, None
+            connection.settings_dict['NAME'] = path
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.memory_connection is not None:
+            connection.close()
+            connection.settings_dict['NAME'] = cls.memory_name
+            connection.connection = cls.memory_connection
+            cls.tmp_dir.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        call_command('seeder')
+        self.receptionist = create_user(
+            email='receptionist@example.com',
+            role=Role.objects.get(name='Receptionist'),
+        )
+        self.doctor = create_user(email='doctor@example.com', role=Role.objects.get(name='Doctor'))
+        self.patient = create_patient()
+
+    def _book_concurrently(self, times):
+        barrier = threading.Barrier(len(times))
+        statuses = []
+
+        def book(start):
+            client = APIClient()
+            client.force_authenticate(self.receptionist)
+            try:
+                barrier.wait()
+                res = client.post(RESERVATION_URL, {
+                    'patient': self.patient.id,
+                    'doctor': self.doctor.id,
+                    'date': date(2024, 7, 23),
+                    'time': start,
+                    'duration': 30,
+                    'description': 'checkup',
+                })
+                statuses.append(res.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(start,)) for start in times]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
+
+    def test_concurrent_bookings_of_the_same_slot(self):
+        statuses = self._book_concurrently([time(15, 0)] * 8)
+
+        self.assertEqual(statuses.count(status.HTTP_201_CREATED), 1)
+        self.assertEqual(statuses.count(status.HTTP_400_BAD_REQUEST), 7)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_concurrent_bookings_of_overlapping_slots(self):
+        statuses = self._book_concurrently([time(15, minute) for minute in range(0, 16, 2)])
+
+        self.assertEqual(statuses.count(status.HTTP_201_CREATED), 1)
+        self.assertEqual(Reservation.objects.count(), 1)
@@ -1,13 +1,20 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from . import views
+from . import async_views, views
 
 app_name = 'reservation'
 
 router = DefaultRouter()
+# registered first, the reservation detail route would otherwise take "series" for a pk
+router.register('series', views.ReservationSeriesViewSet)
 router.register('', views.ReservationViewSet)
 
 urlpatterns = [
+    # before the router, whose reservation detail route would take "events" or "async" for a pk
+    path('events/', async_views.reservation_events, name='reservation-events'),
+    path('async/', async_views.reservation_list, name='reservation-async-list'),
+    path('async/availability/', async_views.availability, name='reservation-async-availability'),
+    path('async/<int:pk>/', async_views.reservation_detail, name='reservation-async-detail'),
     path('', include(router.urls)),
 ]
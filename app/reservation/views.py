@@ -1,21 +1,139 @@
-from datetime import date
+import logging
+from datetime import date, timedelta
 
-from django.contrib.auth.models import Permission
-from rest_framework import viewsets, permissions
-from rest_framework.authentication import TokenAuthentication
+from django.conf import settings
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import mixins, viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
 
-from core.models import Reservation
-from reservation.serializers import ReservationSerializer, ReservationDetailSerializer
+from core.authentication import CachedTokenAuthentication
+from core.models import Reservation, ReservationSeries, RoleCode, User
+from core.permissions import has_permission
+from core.serializers import values_serializer
+from core.views import ReplicaReadMixin, ValuesListMixin
+from core.roles import role_cache
+from core.routers import use_replica
+from reservation.availability import find_availability
+from reservation.cache import entry_key, get_list_cache, invalidate_all, invalidate_dates, make_entry
+from reservation.events import CREATED, DELETED, UPDATED, publish_changes, publish_refresh
+from reservation.bulk import bulk_create_reservations, bulk_delete_reservations, bulk_update_reservations
+from reservation.series import cancel_occurrence, delete_reservations, get_occurrence, pending_occurrences
+from reservation.slots import lock_doctors, store_occurrences
+from reservation.serializers import (
+    ReservationSerializer, ReservationDetailSerializer, AvailabilityQuerySerializer, AvailabilitySlotSerializer,
+    ReservationBulkSerializer, ReservationBulkUpdateSerializer, ReservationBulkDeleteSerializer,
+    ReservationSeriesSerializer, DateWindowSerializer,
+)
 
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter, OpenApiTypes
 
+logger = logging.getLogger(__name__)
+
 
 def _check_permissions(request, code_name):
-    user = request.user
-    permission = Permission.objects.get(codename=code_name)
-    if not user.groups.filter(permissions=permission).exists():
-        return False
-    return True
+    return has_permission(request, code_name)
+
+
+def check_view_permission(request):
+    if not (_check_permissions(request, 'view_reservation') or _check_permissions(request, 'view_his_reservations')):
+        raise permissions.exceptions.PermissionDenied("You do not have permission to view_reservations.")
+
+
+def check_detail_permission(request):
+    if not _check_permissions(request, 'view_reservation') or _check_permissions(request, 'view_his_reservations'):
+        raise permissions.exceptions.PermissionDenied("You do not have permission to view_reservation.")
+
+
+def day_queryset(request, queryset):
+    """The list filters: one day (default today), optionally one doctor, only their own for doctors."""
+    reservation_date = request.query_params.get('date', None)
+    doctor_id = request.query_params.get('doctor', None)
+
+    if reservation_date is not None:
+        queryset = queryset.filter(date__exact=reservation_date)
+    else:
+        queryset = queryset.filter(date__exact=date.today())
+
+    if doctor_id is not None:
+        queryset = queryset.filter(doctor_id=doctor_id)
+
+    if _check_permissions(request, 'view_his_reservations'):
+        queryset = queryset.filter(doctor=request.user.id)
+
+    return queryset
+
+
+def day_occurrences(request):
+    """The day list's series occurrences that are not stored yet, with day_queryset's filters."""
+    try:
+        reservation_date = request.query_params.get('date', None)
+        day = date.fromisoformat(reservation_date) if reservation_date is not None else date.today()
+        doctor_ids = [int(request.query_params['doctor'])] if 'doctor' in request.query_params else None
+    except ValueError:
+        return []
+    if _check_permissions(request, 'view_his_reservations'):
+        doctor_ids = [request.user.id]
+    return pending_occurrences(day, day, doctor_ids)
+
+
+def with_occurrences(paginator, data, occurrences, request):
+    """
+    The serialized page of a day list with the occurrences that fall on it, each before the rows at
+    its date and time. Pages hold a few more items than the page size when occurrences join them.
+    """
+    occurrences = [
+        occurrence for occurrence in occurrences if paginator.page_includes((occurrence.date, occurrence.time))
+    ]
+    if not occurrences:
+        return data
+    pending = list(zip(
+        [(occurrence.date, occurrence.time) for occurrence in occurrences],
+        ReservationSerializer(occurrences, many=True, context={'request': request}).data,
+    ))
+    merged = []
+    for row, item in zip(paginator.page, data):
+        position = tuple(paginator.ordering_values(row)[:2])
+        while pending and pending[0][0] <= position:
+            merged.append(pending.pop(0)[1])
+        merged.append(item)
+    merged.extend(item for _, item in pending)
+    return merged
+
+
+def availability_query(request):
+    """Validated availability parameters and a queryset of the doctor ids they cover."""
+    if _check_permissions(request, 'view_his_reservations'):
+        own = True
+    elif _check_permissions(request, 'view_reservation'):
+        own = False
+    else:
+        raise permissions.exceptions.PermissionDenied("You do not have permission to view_reservations.")
+
+    query = AvailabilityQuerySerializer(data={
+        'from': date.today().isoformat(),
+        **request.query_params.dict(),
+    })
+    query.is_valid(raise_exception=True)
+    params = query.validated_data
+
+    doctors = User.objects.filter(role_id=role_cache.role_id_for_code(RoleCode.DOCTOR))
+    if own:
+        if params.get('doctor', request.user.id) != request.user.id:
+            raise permissions.exceptions.PermissionDenied("You can only view your own availability.")
+        doctors = doctors.filter(id=request.user.id)
+    elif 'doctor' in params:
+        doctors = doctors.filter(id=params['doctor'])
+    return params, doctors.order_by('id').values_list('id', flat=True)
+
+
+def reservation_values_serializer(request):
+    expand = ReservationSerializer(context={'request': request}).expand
+    return values_serializer(
+        ReservationSerializer, tuple((field, ReservationSerializer.EXPANDED_FIELDS) for field in expand)
+    )
 
 
 @extend_schema_view(
@@ -31,60 +149,96 @@ def _check_permissions(request, code_name):
                 OpenApiTypes.STR,
                 description='Filter items by doctor id.'
             ),
+            OpenApiParameter(
+                'expand',
+                OpenApiTypes.STR,
+                description='Comma separated related objects to embed: patient, doctor.'
+            ),
         ]
+    ),
+    retrieve=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'expand',
+                OpenApiTypes.STR,
+                description='Comma separated related objects to embed: patient, doctor.'
+            ),
+        ]
+    ),
+    availability=extend_schema(
+        parameters=[AvailabilityQuerySerializer],
+        responses=AvailabilitySlotSerializer(many=True),
     )
 )
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(ReplicaReadMixin, ValuesListMixin, viewsets.ModelViewSet):
     serializer_class = ReservationDetailSerializer
-    queryset = Reservation.objects.all().order_by('id')
-    authentication_classes = (TokenAuthentication,)
+    queryset = Reservation.objects.select_related(
+        'patient', 'doctor', 'doctor__role'
+    ).order_by('date', 'time', 'id')
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
+    replica_actions = ('list', 'retrieve', 'availability')
 
     def perform_create(self, serializer):
         if not _check_permissions(self.request, 'add_reservation'):
             raise permissions.exceptions.PermissionDenied("You do not have permission to add_reservation.")
-        serializer.save()
+        publish_changes(CREATED, [serializer.save()])
 
     def perform_update(self, serializer):
         if not _check_permissions(self.request, 'change_reservation'):
             raise permissions.exceptions.PermissionDenied("You do not have permission to change_reservation.")
-        serializer.save()
+        previous = [(serializer.instance.date, serializer.instance.doctor_id)]
+        publish_changes(UPDATED, [serializer.save()], previous)
 
     def perform_destroy(self, instance):
         if not _check_permissions(self.request, 'delete_reservation'):
             raise permissions.exceptions.PermissionDenied("You do not have permission to delete_reservation.")
-        instance.delete()
+        # a deleted series occurrence is recorded as cancelled, so it is not shown again
+        delete_reservations(Reservation.objects.filter(id=instance.id))
+        publish_changes(DELETED, [instance])
 
-    def get_queryset(self):
-        if _check_permissions(self.request, 'view_reservation') or _check_permissions(self.request,
-                                                                                      'view_his_reservations'):
-            if self.action == 'list':
-                reservation_date = self.request.query_params.get('date', None)
-                doctor_id = self.request.query_params.get('doctor', None)
-                queryset = self.queryset
-
-                if reservation_date is not None:
-                    queryset = queryset.filter(date__exact=reservation_date)
-                else:
-                    queryset = queryset.filter(date__exact=date.today())
-
-                if doctor_id is not None:
-                    queryset = queryset.filter(doctor_id=doctor_id)
-
-                if _check_permissions(self.request, 'view_his_reservations'):
-                    queryset = queryset.filter(doctor=self.request.user.id)
-
-                return queryset
-            else:
-                return super().get_queryset()
+    def list(self, request, *args, **kwargs):
+        cache = get_list_cache()
+        try:
+            day = date.fromisoformat(request.query_params['date']) if 'date' in request.query_params else date.today()
+        except ValueError:
+            day = None
+        if cache is None or day is None:
+            return super().list(request, *args, **kwargs)
+
+        if _check_permissions(request, 'view_his_reservations'):
+            scope = request.user.id
+        elif _check_permissions(request, 'view_reservation'):
+            scope = 'all'
         else:
             raise permissions.exceptions.PermissionDenied("You do not have permission to view_reservations.")
 
-    def get_object(self):
-        if not _check_permissions(self.request, 'view_reservation') or _check_permissions(self.request,
-                                                                                          'view_his_reservations'):
-            raise permissions.exceptions.PermissionDenied("You do not have permission to view_reservation.")
+        key = entry_key(cache, day, scope, request.build_absolute_uri())
+        entry = cache.get(key)
+        if entry is None:
+            # built from the primary, a lagging replica would keep the old rows cached after invalidation
+            with use_replica(False):
+                entry = make_entry(super().list(request, *args, **kwargs).data)
+            cache.set(key, entry, settings.RESERVATION_LIST_CACHE_TIMEOUT)
+
+        etags = parse_etags(request.headers.get('If-None-Match', ''))
+        if entry['etag'] in etags or '*' in etags:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': entry['etag']})
+        return Response(entry['data'], headers={'ETag': entry['etag']})
+
+    def get_queryset(self):
+        check_view_permission(self.request)
+        if self.action == 'list':
+            return day_queryset(self.request, self.queryset)
+        return super().get_queryset()
 
+    def get_paginated_response(self, data):
+        if self.action == 'list':
+            data = with_occurrences(self.paginator, data, day_occurrences(self.request), self.request)
+        return super().get_paginated_response(data)
+
+    def get_object(self):
+        check_detail_permission(self.request)
         obj = super().get_object()
         return obj
 
@@ -93,3 +247,173 @@ class ReservationViewSet(viewsets.ModelViewSet):
             return ReservationSerializer
 
         return self.serializer_class
+
+    def get_values_serializer(self):
+        return reservation_values_serializer(self.request)
+
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        params, doctors = availability_query(request)
+        doctor_ids = list(doctors)
+        slots = find_availability(doctor_ids, params['date_from'], params['date_to'], params['duration'])
+        return Response(slots)
+
+    @extend_schema(
+        methods=['POST'],
+        request=ReservationBulkSerializer(many=True),
+        responses={201: ReservationDetailSerializer(many=True)},
+    )
+    @extend_schema(
+        methods=['PATCH'],
+        request=ReservationBulkUpdateSerializer(many=True),
+        responses=ReservationDetailSerializer(many=True),
+    )
+    @extend_schema(methods=['DELETE'], request=ReservationBulkDeleteSerializer, responses={204: None})
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        code_name = {'POST': 'add_reservation', 'PATCH': 'change_reservation', 'DELETE': 'delete_reservation'}[
+            request.method
+        ]
+        if not _check_permissions(request, code_name):
+            raise permissions.exceptions.PermissionDenied(f"You do not have permission to {code_name}.")
+
+        if request.method == 'DELETE':
+            serializer = ReservationBulkDeleteSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            publish_changes(DELETED, bulk_delete_reservations(serializer.validated_data['ids']))
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        if request.method == 'POST':
+            serializer = ReservationBulkSerializer(
+                data=request.data, many=True, allow_empty=False, max_length=settings.RESERVATION_BULK_MAX_ITEMS
+            )
+            serializer.is_valid(raise_exception=True)
+            reservations = bulk_create_reservations(serializer.validated_data)
+            # bulk_create sends no post_save, which invalidates the list cache of single writes
+            invalidate_dates({reservation.date for reservation in reservations})
+            publish_changes(CREATED, reservations)
+            response_status = status.HTTP_201_CREATED
+        else:
+            serializer = ReservationBulkUpdateSerializer(
+                data=request.data, many=True, partial=True, allow_empty=False,
+                max_length=settings.RESERVATION_BULK_MAX_ITEMS,
+            )
+            serializer.is_valid(raise_exception=True)
+            previous = {
+                reservation_id: (reservation_date, doctor_id)
+                for reservation_id, reservation_date, doctor_id in Reservation.objects.filter(
+                    id__in=[item['id'] for item in serializer.validated_data]
+                ).values_list('id', 'date', 'doctor_id')
+            }
+            reservations = bulk_update_reservations(serializer.validated_data)
+            invalidate_dates({reservation.date for reservation in reservations} | {day for day, _ in previous.values()})
+            publish_changes(UPDATED, reservations, [previous[reservation.id] for reservation in reservations])
+            response_status = status.HTTP_200_OK
+
+        return Response(ReservationDetailSerializer(reservations, many=True).data, status=response_status)
+
+
+@extend_schema_view(
+    occurrences=extend_schema(
+        parameters=[DateWindowSerializer],
+        responses=ReservationSerializer(many=True),
+    ),
+    occurrence=extend_schema(
+        request=ReservationDetailSerializer,
+        responses=ReservationDetailSerializer,
+    ),
+)
+class ReservationSeriesViewSet(mixins.CreateModelMixin,
+                               mixins.RetrieveModelMixin,
+                               mixins.DestroyModelMixin,
+                               mixins.ListModelMixin,
+                               viewsets.GenericViewSet):
+    serializer_class = ReservationSeriesSerializer
+    queryset = ReservationSeries.objects.order_by('id')
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def perform_create(self, serializer):
+        if not _check_permissions(self.request, 'add_reservation'):
+            raise permissions.exceptions.PermissionDenied("You do not have permission to add_reservation.")
+        serializer.save()
+        # its occurrences are computed when their days are read, every cached day may miss them
+        invalidate_all()
+        publish_refresh()
+
+    def perform_destroy(self, instance):
+        if not _check_permissions(self.request, 'delete_reservation'):
+            raise permissions.exceptions.PermissionDenied("You do not have permission to delete_reservation.")
+        with transaction.atomic():
+            lock_doctors([instance.doctor_id])
+            # past occurrences stay as plain reservations, the ones never stored are stored now
+            past = pending_occurrences(instance.start_date, date.today() - timedelta(days=1), series_ids=[instance.id])
+            for occurrence in store_occurrences(past):
+                logger.warning('Series %s occurrence on %s overlaps another reservation, not kept',
+                               instance.id, occurrence.date)
+            Reservation.objects.filter(series=instance, date__gte=date.today()).delete()
+            instance.delete()
+        invalidate_all()
+        publish_refresh()
+
+    def get_queryset(self):
+        if _check_permissions(self.request, 'view_his_reservations'):
+            return self.queryset.filter(doctor=self.request.user.id)
+        if _check_permissions(self.request, 'view_reservation'):
+            return self.queryset
+        raise permissions.exceptions.PermissionDenied("You do not have permission to view_reservations.")
+
+    @action(detail=True, methods=['get'])
+    def occurrences(self, request, pk=None):
+        series = self.get_object()
+        query = DateWindowSerializer(data={
+            'from': date.today().isoformat(),
+            **request.query_params.dict(),
+        })
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        # occurrences come back as reservations, the ones not stored yet without an id
+        occurrences = list(series.occurrences.filter(date__range=(params['date_from'], params['date_to'])))
+        occurrences += pending_occurrences(params['date_from'], params['date_to'], series_ids=[series.id])
+        occurrences.sort(key=lambda occurrence: (occurrence.date, occurrence.time, occurrence.id or 0))
+        return Response(ReservationSerializer(occurrences, many=True).data)
+
+    @action(detail=True, methods=['patch', 'delete'], url_path=r'occurrences/(?P<day>\d{4}-\d{2}-\d{2})',
+            url_name='occurrence')
+    def occurrence(self, request, pk=None, day=None):
+        """
+        Moves, edits or cancels one occurrence, by its original date. A PATCH stores the occurrence as a
+        reservation, which from then on is also reachable by its id.
+        """
+        code_name = 'change_reservation' if request.method == 'PATCH' else 'delete_reservation'
+        if not _check_permissions(request, code_name):
+            raise permissions.exceptions.PermissionDenied(f"You do not have permission to {code_name}.")
+        series = self.get_object()
+        try:
+            day = date.fromisoformat(day)
+        except ValueError:
+            raise NotFound('The series has no occurrence on this date.')
+
+        with transaction.atomic():
+            # the doctor lock serializes this with bookings and other edits of the occurrence
+            lock_doctors([series.doctor_id])
+            occurrence = get_occurrence(series, day)
+            if occurrence is None:
+                raise NotFound('The series has no occurrence on this date.')
+
+            if request.method == 'DELETE':
+                cancel_occurrence(occurrence)
+                publish_changes(DELETED, [occurrence])
+                return Response(status=status.HTTP_204_NO_CONTENT)
+
+            previous = [(occurrence.date, occurrence.doctor_id)]
+            serializer = ReservationDetailSerializer(occurrence, data=request.data, partial=True,
+                                                     context={'request': request})
+            serializer.is_valid(raise_exception=True)
+            # stored in this transaction, the update's conflict check rolls it back with the update
+            if occurrence.pk is None:
+                occurrence.save()
+            publish_changes(UPDATED, [serializer.save()], previous)
+        return Response(serializer.data)
+
@@ -25,6 +25,7 @@ class UserSerializer(serializers.ModelSerializer):
         user = super().update(instance, validated_data)
         if password:
             user.set_password(password)
+            # saving the new password signs the user out everywhere, see core.authentication
             user.save()
         return user
 
@@ -48,6 +49,8 @@ class AuthTokenSerializer(serializers.Serializer):
         style={'input_type': 'password'},
         trim_whitespace=False
     )
+    # replace the current token even if it has not expired, e.g. when it may have leaked
+    rotate = serializers.BooleanField(required=False, default=False)
 
     def validate(self, attrs):
         email = attrs.get('email')
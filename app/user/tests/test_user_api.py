@@ -1,19 +1,28 @@
-from django.test import TestCase
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APIRequestFactory
 
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
 from user.serializers import UserSerializer, UserDetailSerializer
 
+from core.authentication import CachedTokenAuthentication
+from core.hashers import FastPBKDF2PasswordHasher
 from core.models import Role
 from django.core.management import call_command
 
 
 USERS_URL = reverse('user:user-list')
 TOKEN_URL = reverse('user:user-token')
+LOGOUT_URL = reverse('user:user-logout')
 
 
 def user_detail_url(user_id):
@@ -38,6 +47,8 @@ class PublicUserTests(TestCase):
     def setUp(self):
         self.client = APIClient()
         call_command('seeder')
+        # login throttling counts in the default cache
+        cache.clear()
 
     def test_crud_users_auth_required(self):
         res = self.client.get(USERS_URL)
@@ -182,13 +193,13 @@ class PrivateUserTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         # 3 Users (the Client User, the New User and the Admin)
-        self.assertEqual(len(res.data), 3)
+        self.assertEqual(len(res.data['results']), 3)
 
         serializer1 = UserSerializer(self.user)
         serializer2 = UserSerializer(user2)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
 
     def test_get_users_based_on_role_id(self):
         doctor1 = create_user(email='doctor@example.com', role=Role.objects.get(name='Doctor'))
@@ -199,18 +210,18 @@ class PrivateUserTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
-        self.assertEqual(len(res.data), 2)
+        self.assertEqual(len(res.data['results']), 2)
 
         doctor1_serializer = UserSerializer(doctor1)
         doctor2_serializer = UserSerializer(doctor2)
         admin1_serializer = UserSerializer(self.user)
         admin2_serializer = UserSerializer(admin2)
 
-        self.assertIn(doctor1_serializer.data, res.data)
-        self.assertIn(doctor2_serializer.data, res.data)
+        self.assertIn(doctor1_serializer.data, res.data['results'])
+        self.assertIn(doctor2_serializer.data, res.data['results'])
 
-        self.assertNotIn(admin1_serializer.data, res.data)
-        self.assertNotIn(admin2_serializer.data, res.data)
+        self.assertNotIn(admin1_serializer.data, res.data['results'])
+        self.assertNotIn(admin2_serializer.data, res.data['results'])
 
     def test_get_users_name_starts_with_x(self):
         create_user(email='doctor@example.com', role=Role.objects.get(name='Doctor'), name='Lara')
@@ -219,7 +230,17 @@ class PrivateUserTests(TestCase):
         res = self.client.get(USERS_URL, {'name': 'La'})
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 2)
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_search_users_by_name_prefix(self):
+        lara = create_user(email='doctor@example.com', role=Role.objects.get(name='Doctor'), name='Lara')
+        laman = create_user(email='receptionist@example.com', role=Role.objects.get(name='Receptionist'), name='Laman')
+
+        res = self.client.get(USERS_URL, {'q': 'lara'})
+        self.assertEqual([user['id'] for user in res.data['results']], [lara.id])
+
+        res = self.client.get(USERS_URL, {'q': 'LA'})
+        self.assertEqual([user['id'] for user in res.data['results']], [lara.id, laman.id])
 
     def test_get_my_profile(self):
         res = self.client.get(user_detail_url(self.user.id))
@@ -328,3 +349,194 @@ class PrivateUserTests(TestCase):
         res = self.client.get(user_detail_url(user.id))
 
         self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TokenAuthenticationTests(TestCase):
+    def setUp(self):
+        call_command('seeder')
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(email='admin@example.com', role=Role.objects.get(name='Admin'))
+
+    def login(self, **params):
+        res = self.client.post(TOKEN_URL, {'email': 'admin@example.com', 'password': 'testpass123', **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data['token']
+
+    def get_profile(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        res = self.client.get(user_detail_url(self.user.id))
+        self.client.credentials()
+        return res
+
+    def test_cached_token_resolved_without_queries(self):
+        token = self.login()
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {token}')
+        CachedTokenAuthentication().authenticate(request)
+
+        with self.assertNumQueries(0):
+            user, auth = CachedTokenAuthentication().authenticate(request)
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(auth.key, token)
+        self.assertIn('view_user', request._group_codenames)
+
+    def test_login_returns_same_token_until_expiry(self):
+        token = self.login()
+
+        self.assertEqual(self.login(), token)
+        self.assertEqual(self.get_profile(token).status_code, status.HTTP_200_OK)
+
+    @override_settings(AUTH_TOKEN_EXPIRY=60)
+    def test_expired_token_rejected_and_replaced(self):
+        token = self.login()
+        Token.objects.filter(key=token).update(created=timezone.now() - timedelta(minutes=2))
+
+        res = self.get_profile(token)
+        new_token = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(str(res.data['detail']), 'Token has expired.')
+        self.assertNotEqual(new_token, token)
+        self.assertEqual(self.get_profile(new_token).status_code, status.HTTP_200_OK)
+
+    def test_rotate(self):
+        token = self.login()
+        self.get_profile(token)
+
+        new_token = self.login(rotate=True)
+
+        self.assertNotEqual(new_token, token)
+        self.assertEqual(self.get_profile(token).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get_profile(new_token).status_code, status.HTTP_200_OK)
+
+    def test_logout(self):
+        token = self.login()
+        self.get_profile(token)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        res = self.client.post(LOGOUT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_profile(token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_signs_out(self):
+        token = self.login()
+        self.get_profile(token)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        self.client.patch(user_detail_url(self.user.id), {'password': 'newpass123'})
+
+        self.assertEqual(self.get_profile(token).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertNotEqual(self.login(password='newpass123'), token)
+
+    def test_password_change_outside_the_api_signs_out(self):
+        token = self.login()
+        self.get_profile(token)
+
+        self.user.set_password('newpass123')
+        self.user.save()
+
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertEqual(self.get_profile(token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_other_changes_keep_the_token(self):
+        token = self.login()
+
+        self.user.name = 'Renamed'
+        # without reading the stored password to compare
+        with self.assertNumQueries(1):
+            self.user.save(update_fields=['name'])
+
+        self.assertEqual(self.get_profile(token).status_code, status.HTTP_200_OK)
+
+    def test_deactivated_user_rejected(self):
+        token = self.login()
+        self.get_profile(token)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.get_profile(token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates})
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        call_command('seeder')
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user()
+
+    def login(self, email='test@example.com', password='testpass123', ip='127.0.0.1'):
+        return self.client.post(TOKEN_URL, {'email': email, 'password': password}, REMOTE_ADDR=ip)
+
+    @throttle_rates(login_email='2/min')
+    def test_throttled_per_email(self):
+        self.login(password='wrong')
+        self.login(password='wrong', ip='10.0.0.2')
+
+        res = self.login(ip='10.0.0.3')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.login(email='Other@example.com').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.login(email=' TEST@example.com').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @throttle_rates(login_email='2/min')
+    def test_list_body(self):
+        res = self.client.post(TOKEN_URL, [{'email': 'test@example.com'}], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @throttle_rates(login_ip='2/min')
+    def test_throttled_per_ip(self):
+        self.login(email='a@example.com')
+        self.login(email='b@example.com')
+
+        res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.login(ip='10.0.0.2').status_code, status.HTTP_200_OK)
+
+    @throttle_rates(login_ip='2/min')
+    def test_forwarded_for_header_does_not_change_the_address(self):
+        for spoofed in ('10.0.0.2', '10.0.0.3'):
+            self.client.post(TOKEN_URL, {'email': 'a@example.com'}, HTTP_X_FORWARDED_FOR=spoofed)
+
+        res = self.client.post(TOKEN_URL, {'email': 'a@example.com'}, HTTP_X_FORWARDED_FOR='10.0.0.4')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_forwarded_for_address_behind_a_proxy(self):
+        rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'login_ip': '2/min'}, 'NUM_PROXIES': 1}
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            # the proxy appends the address it sees to whatever the client sent
+            for spoofed in ('10.0.0.2', '10.0.0.3'):
+                self.client.post(TOKEN_URL, {'email': 'a@example.com'}, HTTP_X_FORWARDED_FOR=f'{spoofed}, 10.0.0.9')
+
+            throttled = self.client.post(
+                TOKEN_URL, {'email': 'a@example.com'}, HTTP_X_FORWARDED_FOR='10.0.0.4, 10.0.0.9'
+            )
+            other = self.client.post(TOKEN_URL, {'email': 'a@example.com'}, HTTP_X_FORWARDED_FOR='10.0.0.8')
+
+        self.assertEqual(throttled.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_password_rehashed_with_current_profile(self):
+        self.assertNotIn(f'${FastPBKDF2PasswordHasher.iterations}$', self.user.password)
+        token = Token.objects.create(user=self.user)
+
+        fast = settings.PASSWORD_HASHER_PROFILES['fast']
+        hashers = [fast] + [hasher for hasher in settings.PASSWORD_HASHERS if hasher != fast]
+        with self.settings(PASSWORD_HASHERS=hashers):
+            res = self.login()
+
+        self.user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(f'${FastPBKDF2PasswordHasher.iterations}$', self.user.password)
+        self.assertTrue(self.user.check_password('testpass123'))
+        # same password, the other sessions stay signed in
+        self.assertTrue(Token.objects.filter(key=token.key).exists())
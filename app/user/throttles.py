@@ -0,0 +1,31 @@
+from collections.abc import Mapping
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginRateThrottle(SimpleRateThrottle):
+    def get_rate(self):
+        # looked up per request rather than at import, so the rates follow settings overrides
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+
+class LoginIPRateThrottle(LoginRateThrottle):
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginEmailRateThrottle(LoginRateThrottle):
+    """Limits attempts on one account however many addresses they come from."""
+    scope = 'login_email'
+
+    def get_cache_key(self, request, view):
+        # a JSON body can be a list, left to the serializer to reject
+        if not isinstance(request.data, Mapping):
+            return None
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email.strip():
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': email.strip().lower()}
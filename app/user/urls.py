@@ -10,6 +10,7 @@ router.register('', views.UserViewSet)
 
 urlpatterns = [
     path('create_token/', views.CreateTokenView.as_view(), name='user-token'),
+    path('logout/', views.LogoutView.as_view(), name='user-logout'),
     path('', include(router.urls)),
 
 ]
@@ -1,13 +1,22 @@
-from django.contrib.auth.models import Permission
-from rest_framework import viewsets, permissions
-from rest_framework.authentication import TokenAuthentication
+from django.conf import settings
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
 
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
+from core.authentication import CachedTokenAuthentication, rotate_token, token_expires_at
 from core.models import User
+from core.permissions import has_permission
+from core.views import ReplicaReadMixin, ValuesListMixin
+from core.roles import role_cache
+from core.search import filter_by_name, get_name_index
 from user.serializers import UserSerializer, UserDetailSerializer, AuthTokenSerializer
+from user.throttles import LoginEmailRateThrottle, LoginIPRateThrottle
 
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter, OpenApiTypes
 
@@ -15,12 +24,28 @@ from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiPara
 class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    # every attempt runs the password hasher, which is deliberately slow
+    throttle_classes = (LoginIPRateThrottle, LoginEmailRateThrottle)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = rotate_token(serializer.validated_data['user'], force=serializer.validated_data['rotate'])
+        return Response({'token': token.key, 'expires': token_expires_at(token.created)})
+
+
+class LogoutView(APIView):
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    @extend_schema(request=None, responses={204: None})
+    def post(self, request):
+        Token.objects.filter(key=request.auth.key).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 def _check_permissions(request, code_name):
-    user = request.user
-    permission = Permission.objects.get(codename=code_name)
-    if not user.groups.filter(permissions=permission).exists():
+    if not has_permission(request, code_name):
         raise permissions.exceptions.PermissionDenied(f"You do not have permission to {code_name}.")
 
 
@@ -37,13 +62,27 @@ def _check_permissions(request, code_name):
                     OpenApiTypes.STR,
                     description='Filter items by user name.'
             ),
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description='Search users by name prefix, exact matches first.'
+            ),
+        ]
+    ),
+    typeahead=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description='User name prefix.'
+            ),
         ]
     )
 )
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ReplicaReadMixin, ValuesListMixin, viewsets.ModelViewSet):
     serializer_class = UserDetailSerializer
     queryset = User.objects.all().order_by('id')
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_serializer_class(self):
@@ -70,15 +109,19 @@ class UserViewSet(viewsets.ModelViewSet):
         if self.action == 'list':
             role_name = self.request.query_params.get('role', None)
             user_name = self.request.query_params.get('name', None)
+            search = self.request.query_params.get('q', None)
 
             queryset = self.queryset
 
             if role_name is not None:
-                queryset = queryset.filter(role__name=role_name)
+                queryset = queryset.filter(role_id=role_cache.role_id_for_name(role_name))
 
             if user_name is not None:
                 queryset = queryset.filter(name__startswith=user_name)
 
+            if search is not None:
+                queryset = filter_by_name(queryset, search)
+
             return queryset
 
         return super().get_queryset()
@@ -87,3 +130,11 @@ class UserViewSet(viewsets.ModelViewSet):
         _check_permissions(self.request, 'view_user')
         obj = super().get_object()
         return obj
+
+    @action(detail=False, methods=['get'])
+    def typeahead(self, request):
+        _check_permissions(request, 'view_user')
+        matches = get_name_index(User).search(
+            request.query_params.get('q', ''), limit=settings.NAME_SEARCH_TYPEAHEAD_LIMIT
+        )
+        return Response([{'id': pk, 'name': name} for pk, name in matches])